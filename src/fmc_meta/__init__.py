@@ -1,14 +1,65 @@
 import dataclasses
-from typing import Optional, List, Tuple, Dict
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
 from abc import ABC, abstractmethod
-import multiprocessing
+import atexit
 import functools
+import os
+from os import path
+import threading
 import subprocess
 import re
-
-from pydantic import BaseModel, Field
-
-_pool: multiprocessing.Pool = None  # type: ignore
+import time
+
+from fmc_meta.cache import STOPPED, FinishCache, NissyCache
+from fmc_meta.moves import (
+    encode,
+    decode,
+    invert_codes,
+    cancellation,
+    NO_MOVE,
+    QUARTER_TURN_CODES,
+)
+from fmc_meta.profiling import Profiler, ProfiledTask, children_cpu_time
+from fmc_meta import profiling
+from fmc_meta.backend import (
+    SolverBackend,
+    SubprocessBackend,
+    SessionBackend,
+    find_nissy,
+)
+from fmc_meta.session import NissySessionPool
+from fmc_meta.dedupe import Deduplicated, dr_search_key, finish_search_key
+
+if TYPE_CHECKING:
+    from fmc_meta.execution import ExecutionContext
+    from fmc_meta.models import MoveCountHistogram, SolutionSet, StageBudget, Budget
+
+# The pydantic models are only imported when first used, as are multiprocessing
+# and NumPy, so that the command line starts quickly
+_MODELS = {"MoveCountHistogram", "SolutionSet", "StageBudget", "Budget"}
+
+# Execution context running the tasks of attempts, see context()
+_pool: Optional["ExecutionContext"] = None
+_cache: Optional[NissyCache] = None
+_finish_cache: Optional[FinishCache] = None
+_backend: Optional[SolverBackend] = None
+_profiler: Optional[Profiler] = None
+
+# EO steps, one per axis
+EO_AXES = ["eofb", "eorl", "eoud"]
 
 inverse = {
     "U": "U'",
@@ -26,76 +77,125 @@ inverse = {
 }
 
 
+def cache_dir() -> str:
+    """The user's cache directory for fmc-meta, following XDG_CACHE_HOME"""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or path.expanduser("~/.cache")
+    return path.join(cache_home, "fmc-meta")
+
+
 def invert(moves: List[str]) -> List[str]:
     return [inverse.get(m, m) for m in reversed(moves)]
 
 
-class Step(BaseModel):
-    name: str
-    moves: List[str] = Field(default_factory=list)  # on normal
-    moves_on_inverse: List[str] = Field(default_factory=list)
-    previous: Optional["Step"] = None
+class Step:
+    """
+    A step of a solution, applied after its previous step.
+    Moves are stored encoded (see fmc_meta.moves), and move counts are computed once,
+    when the step is created, so candidate steps are cheap to hold and to sort.
+    Converts to and from a dict when used as a field of a pydantic model.
+    """
+
+    __slots__ = (
+        "name",
+        "codes",
+        "codes_on_inverse",
+        "previous",
+        "move_count",
+        "cumulative_move_count",
+        "last_on_normal",
+        "last_on_inverse",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        moves: Optional[List[str]] = None,  # on normal
+        moves_on_inverse: Optional[List[str]] = None,
+        previous: Optional["Step"] = None,
+    ):
+        self._init(name, encode(moves or []), encode(moves_on_inverse or []), previous)
+
+    @classmethod
+    def from_codes(
+        cls,
+        name: str,
+        codes: bytes,
+        codes_on_inverse: bytes = b"",
+        previous: Optional["Step"] = None,
+    ) -> "Step":
+        step = cls.__new__(cls)
+        step._init(name, codes, codes_on_inverse, previous)
+        return step
+
+    def _init(
+        self,
+        name: str,
+        codes: bytes,
+        codes_on_inverse: bytes,
+        previous: Optional["Step"],
+    ):
+        self.name = name
+        self.codes = codes
+        self.codes_on_inverse = codes_on_inverse
+        self.previous = previous
+
+        if previous is None:
+            self.move_count = len(codes) + len(codes_on_inverse)
+            self.cumulative_move_count = 0
+            self.last_on_normal = self.last_on_inverse = NO_MOVE
+            return
+
+        count = move_count_after(previous, codes, codes_on_inverse)
+        last_on_normal = previous.last_on_normal
+        last_on_inverse = previous.last_on_inverse
+        self.move_count = count
+        self.cumulative_move_count = previous.cumulative_move_count + count
+
+        # Last moves on each side, for cancellations with the next step
+        if self.cumulative_move_count == 0:
+            self.last_on_normal = self.last_on_inverse = NO_MOVE
+        else:
+            self.last_on_normal = codes[-1] if codes else last_on_normal
+            self.last_on_inverse = (
+                codes_on_inverse[-1] if codes_on_inverse else last_on_inverse
+            )
 
     @property
-    def all_moves(self) -> List[str]:
-        prev_moves = self.previous.all_moves if self.previous else []
-        moves = invert(self.moves_on_inverse) + prev_moves + self.moves
-        return moves
+    def moves(self) -> List[str]:
+        return decode(self.codes)
 
-    def on_inverse(self) -> "Step":
-        return Step(
-            name="inverse",
-            moves=invert(self.all_moves),
-            moves_on_inverse=[],
-            previous=None,
-        )
+    @property
+    def moves_on_inverse(self) -> List[str]:
+        return decode(self.codes_on_inverse)
 
     @property
-    def cumulative_move_count(self) -> int:
-        if self.previous is None:
-            return 0
-        return self.previous.cumulative_move_count + self.move_count
+    def all_codes(self) -> bytes:
+        on_inverse = []
+        on_normal = []
+        s: Optional[Step] = self
+        while s:
+            on_inverse.append(invert_codes(s.codes_on_inverse))
+            on_normal.append(s.codes)
+            s = s.previous
+        return b"".join(on_inverse) + b"".join(reversed(on_normal))
 
     @property
-    def move_count(self):
-        count = len(self.moves) + len(self.moves_on_inverse)
-
-        # Check for cancellations (but not against scramble)
-        def cancellation(a: str, b: str):
-            if a[0] == b[0]:
-                if inverse.get(a, a) == b:
-                    return 2
-                else:
-                    return 1
-            return 0
-
-        latest = self.previous
-        last_move_on_normal = ""
-        last_move_on_inverse = ""
-        while latest.cumulative_move_count:  # not the scramble
-            if latest.moves and not last_move_on_normal:
-                last_move_on_normal = latest.moves[-1]
-            if latest.moves_on_inverse and not last_move_on_inverse:
-                last_move_on_inverse = latest.moves_on_inverse[-1]
-            if last_move_on_inverse and last_move_on_normal:
-                break
-            latest = latest.previous
-        if last_move_on_normal and self.moves:
-            count -= cancellation(self.moves[0], last_move_on_normal)
-        if last_move_on_inverse and self.moves_on_inverse:
-            count -= cancellation(self.moves_on_inverse[0], last_move_on_inverse)
-        if last_move_on_inverse and self.moves:
-            count -= cancellation(self.moves[-1], last_move_on_inverse)
+    def all_moves(self) -> List[str]:
+        return decode(self.all_codes)
 
-        return count
+    def on_inverse(self) -> "Step":
+        return Step.from_codes(
+            name="inverse",
+            codes=invert_codes(self.all_codes),
+        )
 
     @property
     def qt_count(self) -> int:
-        return sum(1 for m in self.moves if not "2" in m)
+        return sum(1 for c in self.codes if c in QUARTER_TURN_CODES)
 
     @property
     def includes_niss(self) -> bool:
-        return len(self.moves) > 0 and len(self.moves_on_inverse) > 0
+        return len(self.codes) > 0 and len(self.codes_on_inverse) > 0
 
     @property
     def requires_niss(self) -> bool:
@@ -104,7 +204,7 @@ class Step(BaseModel):
         elif self.previous.includes_niss:
             return False
         else:
-            return not (len(self.moves) > 0 ^ len(self.previous.moves) > 0)
+            return not (len(self.codes) > 0 ^ len(self.previous.codes) > 0)
 
     def from_beginning(self) -> List["Step"]:
         steps = []
@@ -118,7 +218,7 @@ class Step(BaseModel):
     def __str__(self):
         normal_moves = " ".join(self.moves)
         inverse_moves = (
-            f"({' '.join(self.moves_on_inverse)})" if self.moves_on_inverse else ""
+            f"({' '.join(self.moves_on_inverse)})" if self.codes_on_inverse else ""
         )
         if normal_moves and inverse_moves:
             return " ".join((normal_moves, inverse_moves))
@@ -127,20 +227,81 @@ class Step(BaseModel):
         else:
             return inverse_moves
 
+    def __repr__(self):
+        return (
+            f"Step(name={self.name!r}, moves={self.moves!r}, "
+            f"moves_on_inverse={self.moves_on_inverse!r}, previous={self.previous!r})"
+        )
 
-class MoveCountHistogram(BaseModel):
-    steps: List[Step]
+    def __eq__(self, other):
+        if not isinstance(other, Step):
+            return NotImplemented
+        return (
+            self.name == other.name
+            and self.codes == other.codes
+            and self.codes_on_inverse == other.codes_on_inverse
+            and self.previous == other.previous
+        )
 
-    @property
-    def counts(self) -> List[Tuple[int, int]]:
-        count: Dict[int, int] = {}
-        for s in self.steps:
-            count[s.cumulative_move_count] = count.get(s.cumulative_move_count, 0) + 1
-        rows = sorted(list(count.items()))
-        return rows
+    __hash__ = None  # type: ignore[assignment]
+
+    def __reduce__(self):
+        return (
+            Step.from_codes,
+            (self.name, self.codes, self.codes_on_inverse, self.previous),
+        )
+
+    def to_dict(self) -> Dict:
+        return dict(
+            name=self.name,
+            moves=self.moves,
+            moves_on_inverse=self.moves_on_inverse,
+            previous=self.previous.to_dict() if self.previous else None,
+        )
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "Step":
+        previous = d.get("previous")
+        return cls(
+            name=d["name"],
+            moves=d.get("moves"),
+            moves_on_inverse=d.get("moves_on_inverse"),
+            previous=cls.from_dict(previous) if previous else None,
+        )
+
+    @classmethod
+    def _validate(cls, value) -> "Step":
+        if isinstance(value, Step):
+            return value
+        if isinstance(value, dict):
+            return cls.from_dict(value)
+        raise ValueError(f"Can't convert {type(value).__name__} to Step")
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source, handler):
+        from pydantic_core import core_schema
+
+        return core_schema.no_info_plain_validator_function(
+            cls._validate,
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                lambda s: s.to_dict()
+            ),
+        )
 
-    def __str__(self):
-        return " ".join(f"{n}x{m}-moves" for m, n in self.counts)
+
+def move_count_after(previous: Step, codes: bytes, codes_on_inverse: bytes) -> int:
+    """Move count of a step following previous, without building the step"""
+    count = len(codes) + len(codes_on_inverse)
+    # Check for cancellations (but not against scramble)
+    last_on_normal = previous.last_on_normal
+    last_on_inverse = previous.last_on_inverse
+    if last_on_normal != NO_MOVE and codes:
+        count -= cancellation(codes[0], last_on_normal)
+    if last_on_inverse != NO_MOVE and codes_on_inverse:
+        count -= cancellation(codes_on_inverse[0], last_on_inverse)
+    if last_on_inverse != NO_MOVE and codes:
+        count -= cancellation(codes[-1], last_on_inverse)
+    return count
 
 
 class EOStrategy(ABC):
@@ -150,20 +311,36 @@ class EOStrategy(ABC):
         pass
 
     def find_eos(self, scramble: Step) -> List[Step]:
-        eos = [
-            s
-            for scramble_to_eos in _pool.map(  # type: ignore[attr-defined]
-                functools.partial(self.find_eos_on_axis, scramble=scramble),
-                ["eofb", "eorl", "eoud"],
-            )
-            for s in scramble_to_eos
-        ]
+        start = time.time()
+        found = self.eos_on_axes(EO_AXES, scramble)
+        eos = [s for scramble_to_eos in found for s in scramble_to_eos]
+        from fmc_meta.models import MoveCountHistogram
+
         print(f"Found EOs: {MoveCountHistogram(steps=eos)}")
-        eos = self.select_eos(eos)
-        return eos
+        selected = self.select_eos(eos)
+        record_stage("eo", start, found=len(eos), kept=len(selected))
+        return selected
+
+    def eos_on_axes(self, axes: List[str], scramble: Step) -> List[List[Step]]:
+        """The EOs found on each axis"""
+        if not axes:
+            return []
+        if getattr(self, "fan_out", False):
+            return run_plans(
+                "eo", [self.plan_eos_on_axis(axis, scramble) for axis in axes]
+            )
+        return context().map(
+            _task("eo", functools.partial(self.find_eos_on_axis, scramble=scramble)),
+            axes,
+        )
 
-    @abstractmethod
     def find_eos_on_axis(self, axis_step: str, scramble: Step) -> List[Step]:
+        return run_plan(self.plan_eos_on_axis(axis_step, scramble))
+
+    @abstractmethod
+    def plan_eos_on_axis(
+        self, axis_step: str, scramble: Step
+    ) -> "SearchPlan[List[Step]]":
         pass
 
     @abstractmethod
@@ -177,14 +354,34 @@ class DRStrategy(ABC):
         pass
 
     def find_drs(self, eos: List[Step]) -> List[Step]:
-        drs = [
-            s for eo_to_drs in _pool.map(self.find_drs_for_eo, eos) for s in eo_to_drs  # type: ignore[attr-defined]
-        ]
+        start = time.time()
+        found, saved = self.drs_of_eos(eos)
+        drs = [s for eo_to_drs in found for s in eo_to_drs]
+        from fmc_meta.models import MoveCountHistogram
+
         print(f"Found DRs: {MoveCountHistogram(steps=drs)}")
-        return self.select_drs(drs)
+        selected = self.select_drs(drs)
+        record_stage("dr", start, found=len(drs), kept=len(selected), saved=saved)
+        return selected
+
+    def drs_of_eos(self, eos: List[Step]) -> Tuple[List[List[Step]], int]:
+        """The DRs found on each EO, and the searches saved on equivalent EOs"""
+        unique = Deduplicated(eos, dr_search_key)
+        if unique.saved:
+            print(f"Skipping {unique.saved} DR searches on EOs equivalent to others")
+        if not unique.unique:
+            found = []
+        elif getattr(self, "fan_out", False):
+            found = run_plans("dr", [self.plan_drs_for_eo(eo) for eo in unique.unique])
+        else:
+            found = context().map(_task("dr", self.find_drs_for_eo), unique.unique)
+        return unique.expand(found), unique.saved
 
-    @abstractmethod
     def find_drs_for_eo(self, eo: Step) -> List[Step]:
+        return run_plan(self.plan_drs_for_eo(eo))
+
+    @abstractmethod
+    def plan_drs_for_eo(self, eo: Step) -> "SearchPlan[List[Step]]":
         pass
 
     @abstractmethod
@@ -192,66 +389,557 @@ class DRStrategy(ABC):
         pass
 
 
+class FinishBound:
+    """
+    The best n finish totals found so far, shared by all tasks of the
+    execution context
+    """
+
+    def __init__(self, n: int, shared: bool = True):
+        """If shared is false, the totals are only used in this process"""
+        self.n = n
+        if shared:
+            self.totals, self.lock = context().shared()
+        else:
+            self.totals = []
+            self.lock = threading.Lock()
+
+    def max_total(self) -> Optional[int]:
+        """Finishes with a larger total can't make the top n"""
+        totals = list(self.totals)
+        return totals[-1] if len(totals) >= self.n else None
+
+    def offer(self, total: int):
+        with self.lock:
+            totals = sorted(list(self.totals) + [total])[: self.n]
+            self.totals[:] = totals
+
+
 class FinishStrategy(ABC):
     @abstractmethod
     def description(self):
         pass
 
-    def drs_to_finishes(self, drs: List[Step]) -> List[Step]:
-        finishes = [
-            s
-            for finishes in _pool.map(  # type: ignore[attr-defined]
-                self.dr_to_finish, drs
-            )
-            for s in finishes
-        ]
+    def drs_to_finishes(self, drs: List[Step], top: Optional[int] = None) -> List[Step]:
+        """
+        If top is given, searches that can't improve on the best top finishes
+        found so far are skipped or shortened. The first top finishes returned
+        are the same as without it, but later ones may be missing.
+        """
+        start = time.time()
+        found, saved = self.finishes_of_drs(
+            drs, None if top is None else FinishBound(top)
+        )
+        finishes = [s for dr_finishes in found for s in dr_finishes]
         finishes.sort(key=lambda s: s.cumulative_move_count)
-        s = self.dr_to_finish(drs[0])
+        record_stage(
+            "finish",
+            start,
+            found=len(finishes),
+            kept=len(finishes),
+            saved=saved,
+        )
         return finishes
 
+    def finishes_of_drs(
+        self, drs: List[Step], bound: Optional[FinishBound] = None
+    ) -> Tuple[List[List[Step]], int]:
+        """
+        The finishes found on each DR, within the bound if given, and the
+        searches saved on equivalent DRs
+        """
+        if bound is None:
+            dr_to_finish = self.dr_to_finish
+        else:
+            dr_to_finish = functools.partial(self._dr_to_finish_within, bound)
+        unique = Deduplicated(drs, finish_search_key)
+        if unique.saved:
+            print(
+                f"Skipping {unique.saved} finish searches on DRs equivalent to others"
+            )
+        found = (
+            context().map(_task("finish", dr_to_finish), unique.unique)
+            if unique.unique
+            else []
+        )
+        return unique.expand(found), unique.saved
+
+    def _dr_to_finish_within(self, bound: FinishBound, dr: Step) -> List[Step]:
+        finishes = self.dr_to_finish(dr, max_total=bound.max_total())
+        for f in finishes:
+            bound.offer(f.cumulative_move_count)
+        return finishes
+
+    def dr_to_finish(self, dr: Step, max_total: Optional[int] = None) -> List[Step]:
+        return run_plan(self.plan_dr_to_finish(dr, max_total))
+
     @abstractmethod
-    def dr_to_finish(self, dr: Step) -> List[Step]:
+    def plan_dr_to_finish(
+        self, dr: Step, max_total: Optional[int] = None
+    ) -> "SearchPlan[List[Step]]":
+        """
+        If max_total is given, finishes with a larger cumulative move count
+        don't need to be found, and an empty list may be returned instead.
+        """
         pass
 
 
+def max_finish_length(dr: Step, max_total: Optional[int]) -> Optional[int]:
+    """
+    Longest finish that can have a cumulative move count of at most max_total,
+    allowing for cancellations at both ends
+    """
+    if max_total is None:
+        return None
+    return max_total - dr.cumulative_move_count + 4
+
+
+@dataclasses.dataclass(frozen=True)
+class Search:
+    """A nissy search needed by a search plan"""
+
+    step_name: str
+    scramble: Step
+    args: Tuple = ()
+    accept: Optional[Callable[[bytes, bytes], bool]] = None
+    limit: Optional[int] = None
+    # Stops the search early, see SolutionReader
+    until: Optional[Callable[[bytes, bytes], bool]] = None
+
+
+T = TypeVar("T")
+
+# The nissy searches needed to compute a result, independent of how they are run.
+# Each search yielded is sent back its solutions, as from nissy_solutions(), and
+# each list of searches, which don't depend on each other, a list of their
+# solutions
+SearchPlan = Generator[Union[Search, List[Search]], Any, T]
+
+
+def run_search(search: Search) -> List[Tuple[bytes, bytes]]:
+    return nissy_solutions(
+        search.step_name,
+        search.scramble,
+        *search.args,
+        accept=search.accept,
+        limit=search.limit,
+        until=search.until,
+    )
+
+
+def run_plan(plan: SearchPlan[T]) -> T:
+    """Result of a search plan, running its searches one at a time"""
+    try:
+        search = next(plan)
+        while True:
+            if isinstance(search, list):
+                search = plan.send([run_search(s) for s in search])
+            else:
+                search = plan.send(run_search(search))
+    except StopIteration as e:
+        return e.value
+
+
+def run_plans(
+    stage: str, plans: List[SearchPlan[T]], batch_size: Optional[int] = None
+) -> List[T]:
+    """
+    Results of search plans of a stage, running every search they need next
+    as its own task of the execution context: the searches of a plan run at
+    the same time as each other, and as those of the other plans, rather than
+    one after another in a task per plan.
+    If batch_size is given, each task instead runs up to batch_size searches
+    in a single round trip to the solver, see run_searches().
+    """
+    results: List[Any] = [None] * len(plans)
+    waiting: Dict[int, Union[Search, List[Search]]] = {}
+
+    def advance(i: int, solutions: Any):
+        try:
+            waiting[i] = plans[i].send(solutions)
+        except StopIteration as e:
+            results[i] = e.value
+
+    for i in range(len(plans)):
+        advance(i, None)
+    while waiting:
+        batches = list(waiting.items())
+        waiting.clear()
+        searches = [
+            s
+            for _, batch in batches
+            for s in (batch if isinstance(batch, list) else [batch])
+        ]
+        if batch_size is None:
+            found = iter(context().map(_task(stage, run_search), searches))
+        else:
+            batched = context().map(
+                _task(stage, run_searches),
+                [
+                    searches[i : i + batch_size]
+                    for i in range(0, len(searches), batch_size)
+                ],
+            )
+            found = iter([solutions for batch in batched for solutions in batch])
+        for i, batch in batches:
+            if isinstance(batch, list):
+                advance(i, [next(found) for _ in batch])
+            else:
+                advance(i, next(found))
+    return results
+
+
 @dataclasses.dataclass
 class Meta:
     eo: EOStrategy
     dr: DRStrategy
     finish: FinishStrategy
+    budget: "Budget" = dataclasses.field(default_factory=lambda: _models().Budget())
+
+
+def _task(stage: str, fn: Callable) -> Callable:
+    """fn as a pool task of a stage, recording its timing if profiling"""
+    return ProfiledTask(_profiler, stage, fn) if _profiler else fn
+
+
+def record_stage(stage: str, start: float, found: int, kept: int, saved: int = 0):
+    """saved is the number of searches skipped on candidates equivalent to others"""
+    if _profiler:
+        _profiler.record(
+            type="stage",
+            stage=stage,
+            wall=time.time() - start,
+            found=found,
+            kept=kept,
+            saved=saved,
+        )
+
+
+def _models():
+    from fmc_meta import models
+
+    return models
+
+
+def __getattr__(name: str):
+    # nissy is only looked for when first needed, so that the package can be
+    # used without it, e.g. to replay recorded output
+    if name == "NISSY_PATH":
+        return find_nissy()
+    if name in _MODELS:
+        return getattr(_models(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
+def context() -> "ExecutionContext":
+    """
+    The execution context tasks run in. Unless one is set with use_context(),
+    a process pool with a worker per core is started on first use, and closed
+    when Python exits.
+    """
+    global _pool
+    if _pool is None:
+        from fmc_meta.execution import create_context
 
-NISSY_PATH = subprocess.check_output(["which", "nissy"], encoding="UTF8").strip()
+        _pool = create_context("process")
+        atexit.register(_pool.close)
+    return _pool
 
 
-def nissy(step_name: str, scramble: Step, *args) -> List[Step]:
-    cmd = (
-        [NISSY_PATH, "solve", step_name, "-p"]
-        + list(str(a) for a in args)
-        + [" ".join(scramble.all_moves)]
+def use_context(context: "ExecutionContext") -> "ExecutionContext":
+    """Run tasks in context until it is closed"""
+    global _pool
+    _pool = context
+    return context
+
+
+def backend() -> SolverBackend:
+    global _backend
+    if _backend is None:
+        _backend = SubprocessBackend(find_nissy())
+    return _backend
+
+
+def streaming() -> bool:
+    """Whether searches stopped early save the rest of their time"""
+    return _backend is None or _backend.streams
+
+
+def use_sessions(size: int = 1):
+    """
+    Run searches on long-lived nissy sessions instead of a new process per search.
+    Each process gets up to size sessions, which are started on first use.
+    """
+    global _backend
+    _backend = SessionBackend(NissySessionPool(find_nissy(), size=size))
+
+
+def stream_nissy(step_name: str, moves: List[str], args: List[str]) -> Iterator[str]:
+    """
+    Lines of nissy output, as nissy prints them.
+    Closing the iterator early stops the search.
+    """
+    return backend().stream(step_name, moves, args)
+
+
+def run_nissy(step_name: str, moves: List[str], args: List[str]) -> str:
+    return "".join(stream_nissy(step_name, moves, args))
+
+
+def parse_solution(line: str) -> Tuple[bytes, bytes]:
+    """Move codes on normal and on inverse of a line of nissy output"""
+    n_i_moves: Tuple = ([], [])  # (normal,inverse)
+    toggle = 0
+    for move in re.split("[() ]", line):
+        if move == "":  # Open or close parenthesis
+            toggle = 1 - toggle
+        else:
+            n_i_moves[toggle].append(move)
+    return encode(n_i_moves[0]), encode(n_i_moves[1])
+
+
+class SolutionReader:
+    """
+    Solutions parsed from nissy output fed to it line by line.
+    Solutions are only kept if accept(codes, codes_on_inverse) is true,
+    up to limit of them. If keep_output is true, all of the output is kept.
+    The output stops at the first solution for which until(codes,
+    codes_on_inverse) is true, which isn't kept as a solution. The output kept
+    then ends with its line, and stored_output marks it as stopped.
+    """
+
+    def __init__(
+        self,
+        accept: Optional[Callable[[bytes, bytes], bool]] = None,
+        limit: Optional[int] = None,
+        keep_output: bool = False,
+        until: Optional[Callable[[bytes, bytes], bool]] = None,
+    ):
+        self.accept = accept
+        self.limit = limit
+        self.keep_output = keep_output
+        self.until = until
+        self.lines: List[str] = []
+        self.solutions: List[Tuple[bytes, bytes]] = []
+        # Number of solutions parsed, whether accepted or not
+        self.returned = 0
+        self.stopped = False
+
+    @property
+    def full(self) -> bool:
+        return self.limit is not None and len(self.solutions) >= self.limit
+
+    @property
+    def output(self) -> str:
+        return "".join(self.lines)
+
+    @property
+    def stored_output(self) -> str:
+        """The output kept, to cache or record"""
+        return self.output + f"{STOPPED}\n" if self.stopped else self.output
+
+    def feed(self, line: str) -> bool:
+        """Whether more output is needed after this line"""
+        if self.keep_output:
+            self.lines.append(line)
+        if self.full:
+            return self.keep_output  # Only reading the rest of the output to store it
+        line = line.strip()
+        if line:
+            # An empty move list means this is a skip-step
+            solution = parse_solution(line)
+            if self.until is not None and self.until(*solution):
+                self.stopped = True
+                return False
+            self.returned += 1
+            if self.accept is None or self.accept(*solution):
+                self.solutions.append(solution)
+        return self.keep_output or not self.full
+
+    def read(self, lines: Iterable[str]) -> bool:
+        """
+        Feeds lines until no more are needed. False if they are the output of
+        a stopped search, which stopped before this one would.
+        """
+        for line in lines:
+            if line.rstrip("\n") == STOPPED:
+                return False
+            if not self.feed(line):
+                break
+        return True
+
+
+def _stopped_early(step_name: str, moves: List[str], args: List[str]) -> Exception:
+    return Exception(
+        f"nissy output for {step_name} {' '.join(args)} on {' '.join(moves)} "
+        "was recorded from a search that stopped before this one"
     )
-    p = subprocess.run(
-        cmd, encoding="UTF8", stdout=subprocess.PIPE, stderr=subprocess.PIPE
+
+
+def nissy_solutions(
+    step_name: str,
+    scramble: Step,
+    *args,
+    accept: Optional[Callable[[bytes, bytes], bool]] = None,
+    limit: Optional[int] = None,
+    until: Optional[Callable[[bytes, bytes], bool]] = None,
+) -> List[Tuple[bytes, bytes]]:
+    """
+    Move codes on normal and on inverse of each solution found by nissy,
+    parsed as nissy prints them.
+    Solutions are only kept if accept(codes, codes_on_inverse) is true,
+    and the search stops after limit solutions have been kept. When caching or
+    recording, the output is still read to the end so that it can be stored.
+    The search also stops at the first solution for which until(codes,
+    codes_on_inverse) is true. What it printed up to there is cached and
+    recorded, marked as stopped, and only used by searches that stop within it.
+    """
+    moves = scramble.all_moves
+    str_args = list(str(a) for a in args)
+    start = time.time()
+    cpu_start = children_cpu_time()
+    reader = SolutionReader(accept, limit, until=until)
+    output = _cache.get(step_name, str_args, moves) if _cache else None
+    if output is not None and not reader.read(output.splitlines()):
+        # Cached from a search that stopped too early for this one
+        reader = SolutionReader(accept, limit, until=until)
+        output = None
+    finish_cached = _finish_cache is not None and _finish_cache.handles(
+        step_name, str_args
+    )
+    if output is None and finish_cached:
+        output = _finish_cache.get(step_name, str_args, scramble.all_codes)  # type: ignore[union-attr]
+        if output is not None:
+            reader.read(output.splitlines())
+    # nissy is only needed if the search isn't cached
+    solver = backend() if output is None else _backend
+    try:
+        if output is not None:
+            if solver:
+                solver.searched(step_name, moves, str_args, output)
+        else:
+            keep_output = (
+                _cache is not None or finish_cached or solver.needs_full_output  # type: ignore[union-attr]
+            )
+            reader = SolutionReader(accept, limit, keep_output, until)
+            lines = solver.stream(step_name, moves, str_args)  # type: ignore[union-attr]
+            try:
+                complete = reader.read(lines)
+            finally:
+                if isinstance(lines, Generator):
+                    lines.close()
+            if not complete:
+                raise _stopped_early(step_name, moves, str_args)
+            if keep_output:
+                stored = reader.stored_output
+                if _cache:
+                    _cache.put(step_name, str_args, moves, stored)
+                # Only whole outputs are relabeled for symmetric DRs
+                if finish_cached and not reader.stopped:
+                    _finish_cache.put(step_name, str_args, scramble.all_codes, stored)  # type: ignore[union-attr]
+                solver.searched(step_name, moves, str_args, stored)  # type: ignore[union-attr]
+    finally:
+        if _profiler:
+            _profiler.record(
+                type="nissy",
+                stage=profiling.current_stage(),
+                step=step_name,
+                args=str_args,
+                wall=time.time() - start,
+                # Other threads' nissy processes would be counted too
+                subprocess=(
+                    children_cpu_time() - cpu_start
+                    if solver
+                    and output is None
+                    and solver.runs_subprocesses
+                    and (_pool is None or _pool.kind != "thread")
+                    else None
+                ),
+                cached=output is not None,
+                returned=reader.returned,
+                accepted=len(reader.solutions),
+            )
+    return reader.solutions
+
+
+def run_searches(searches: List[Search]) -> List[List[Tuple[bytes, bytes]]]:
+    """
+    Solutions of each search, as from run_search(), with all of the searches
+    that aren't cached sent to the solver backend at once, so that starting
+    nissy and loading its tables is paid once for all of them.
+    Searches always read their whole output, which is cached and recorded.
+    """
+    requests = [
+        (s.step_name, s.scramble.all_moves, [str(a) for a in s.args]) for s in searches
+    ]
+    outputs: List[Optional[str]] = []
+    readers: List[SolutionReader] = []
+    for search, (step_name, moves, args) in zip(searches, requests):
+        reader = SolutionReader(search.accept, search.limit, until=search.until)
+        output = _cache.get(step_name, args, moves) if _cache else None
+        if output is not None and not reader.read(output.splitlines()):
+            # Cached from a search that stopped too early for this one
+            reader = SolutionReader(search.accept, search.limit, until=search.until)
+            output = None
+        if output is None and _finish_cache and _finish_cache.handles(step_name, args):
+            output = _finish_cache.get(step_name, args, search.scramble.all_codes)
+            if output is not None:
+                reader.read(output.splitlines())
+        readers.append(reader)
+        outputs.append(output)
+    missing = [i for i, output in enumerate(outputs) if output is None]
+    ran = set(missing)
+    start = time.time()
+    solver = backend() if missing else _backend
+    for i, output in zip(missing, solver.solve_many([requests[i] for i in missing])):  # type: ignore[union-attr]
+        outputs[i] = output
+        step_name, moves, args = requests[i]
+        if not readers[i].read(output.splitlines()):
+            raise _stopped_early(step_name, moves, args)
+        if _cache:
+            _cache.put(step_name, args, moves, output)
+        if _finish_cache and _finish_cache.handles(step_name, args):
+            _finish_cache.put(step_name, args, searches[i].scramble.all_codes, output)
+    # The round trip's time, shared by the searches that ran
+    wall = (time.time() - start) / max(len(missing), 1)
+
+    for i, (reader, output) in enumerate(zip(readers, outputs)):
+        step_name, moves, args = requests[i]
+        if solver:
+            solver.searched(step_name, moves, args, output)  # type: ignore[arg-type]
+        if _profiler:
+            _profiler.record(
+                type="nissy",
+                stage=profiling.current_stage(),
+                step=step_name,
+                args=args,
+                wall=wall if i in ran else 0,
+                subprocess=None,
+                cached=i not in ran,
+                returned=reader.returned,
+                accepted=len(reader.solutions),
+            )
+    return [reader.solutions for reader in readers]
+
+
+def to_steps(
+    step_name: str, previous: Step, solutions: List[Tuple[bytes, bytes]]
+) -> List[Step]:
+    return [
+        Step.from_codes(step_name, normal, inverse, previous=previous)
+        for normal, inverse in solutions
+    ]
+
+
+def nissy(
+    step_name: str,
+    scramble: Step,
+    *args,
+    accept: Optional[Callable[[bytes, bytes], bool]] = None,
+    limit: Optional[int] = None,
+) -> List[Step]:
+    return to_steps(
+        step_name,
+        scramble,
+        nissy_solutions(step_name, scramble, *args, accept=accept, limit=limit),
     )
-    if p.stderr:
-        raise Exception(p.stderr)
-    steps = []
-    for line in p.stdout.strip().split("\n"):
-        if not line:
-            continue  # No solution
-        n_i_moves: Tuple = ([], [])  # (normal,inverse)
-        toggle = 0
-        for move in re.split("[() ]", line):
-            if move == "":  # Open or close parenthesis
-                toggle = 1 - toggle
-            else:
-                n_i_moves[toggle].append(move)
-        # Empty move list means this is a skip-step
-        step = Step(
-            name=step_name,
-            moves=n_i_moves[0],
-            moves_on_inverse=n_i_moves[1],
-            previous=scramble,
-        )
-        steps.append(step)
-    return steps
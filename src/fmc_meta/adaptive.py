@@ -0,0 +1,261 @@
+from typing import Callable, Dict, Hashable, List, Optional, Set, Tuple
+import functools
+import os
+import time
+
+import fmc_meta
+from fmc_meta import (
+    EO_AXES,
+    Step,
+    Meta,
+    MoveCountHistogram,
+    FinishBound,
+    FinishStrategy,
+    SearchPlan,
+    T,
+    record_stage,
+    run_plan,
+)
+from fmc_meta.dedupe import Deduplicated, dr_search_key, finish_search_key
+
+# Number of finishes whose totals decide whether a candidate can still help,
+# if no top is given
+DEFAULT_TOP = 3
+# Candidates expanded at a time by strategies that aren't adaptive,
+# when the stage has a budget to check
+BUDGET_BATCH = os.cpu_count() or 1
+# Most moves a step can save by cancelling with the steps before it,
+# as allowed for by max_finish_length
+MAX_CANCELLATION = 4
+
+
+def is_adaptive(meta: Meta) -> bool:
+    """Whether the meta's attempts are run by an AdaptiveAttempt"""
+    return (
+        getattr(meta.eo, "adaptive", False)
+        or getattr(meta.dr, "adaptive", False)
+        or meta.budget.is_set()
+    )
+
+
+def in_order(strategy, select: str, steps: List[Step]) -> List[Step]:
+    """All of the steps, in the order the strategy's select method picks them"""
+    return getattr(strategy.model_copy(update={"retain": len(steps)}), select)(steps)
+
+
+class Counted(list):
+    """Steps found by a search plan, with the number of searches it ran"""
+
+    searches = 0
+
+
+def counting(plan: SearchPlan[T]) -> SearchPlan[Tuple[T, int]]:
+    """A search plan's result, and the number of searches it ran"""
+    searches = 0
+    try:
+        search = next(plan)
+        while True:
+            searches += len(search) if isinstance(search, list) else 1
+            search = plan.send((yield search))
+    except StopIteration as e:
+        return e.value, searches
+
+
+def _run_counted(plan: Callable[..., SearchPlan[List[Step]]], *args) -> Counted:
+    steps, searches = run_plan(counting(plan(*args)))
+    result = Counted(steps)
+    result.searches = searches
+    return result
+
+
+def _finish_counted(finish: FinishStrategy, bound: FinishBound, dr: Step) -> Counted:
+    result = _run_counted(finish.plan_dr_to_finish, dr, bound.max_total())
+    for f in result:
+        bound.offer(f.cumulative_move_count)
+    return result
+
+
+class AdaptiveAttempt:
+    """
+    Runs an attempt expanding candidates best first, in rounds: the DRs of the
+    next batch of EOs, then the finishes of the next batch of the best DRs
+    found so far. For strategies with adaptive set, a batch is retain
+    candidates in the order the strategy selects them. Other strategies expand
+    what they select, in one batch, or in batches of BUDGET_BATCH if the next
+    stage has a budget.
+    A DR strategy that isn't adaptive selects from the DRs of every EO, so its
+    DRs are only finished once the EOs are expanded, and an adaptive EO
+    strategy, with no finishes to stop it, then selects retain EOs as usual.
+    Candidates are no longer expanded once they can't beat the top finishes
+    found so far. DR searches stop when the meta's DR budget runs out, and the
+    attempt stops when the finish or total budget runs out, returning the best
+    finishes found so far. Budgets are checked before each batch, so a batch
+    can overrun them.
+    """
+
+    def __init__(self, meta: Meta, scramble: Step, top: Optional[int] = None):
+        self.meta = meta
+        self.scramble = scramble
+        self.top = top or DEFAULT_TOP
+        self.bound = FinishBound(self.top)
+        self.searches = 0
+        self.stage_searches: Dict[str, int] = {"dr": 0, "finish": 0}
+        self.stage_seconds: Dict[str, float] = {"dr": 0, "finish": 0}
+        self.saved: Dict[str, int] = {"dr": 0, "finish": 0}
+        self.used_up: Set[str] = set()
+
+    def _budget_left(self, stage: str) -> bool:
+        """Whether the stage's budget and the total budget both have some left"""
+        budget = self.meta.budget
+        for name, limit, seconds, searches in (
+            (
+                stage,
+                getattr(budget, stage),
+                self.stage_seconds[stage],
+                self.stage_searches[stage],
+            ),
+            ("total", budget.total, time.time() - self.start, self.searches),
+        ):
+            if (limit.seconds is not None and seconds >= limit.seconds) or (
+                limit.searches is not None and searches >= limit.searches
+            ):
+                if name not in self.used_up:
+                    print(f"Used up the {name} budget of {limit.description()}")
+                    self.used_up.add(name)
+                return False
+        return True
+
+    def _batch_size(
+        self, strategy, adaptive: bool, stage: str, order: List[Step]
+    ) -> int:
+        """Number of candidates to expand in each batch of a stage's searches"""
+        if adaptive:
+            return strategy.retain
+        if getattr(self.meta.budget, stage).is_set() or self.meta.budget.total.is_set():
+            return BUDGET_BATCH
+        return max(len(order), 1)
+
+    def _can_improve(self, step: Step, steps_left: int) -> bool:
+        """Whether finishing the step can make the top finishes"""
+        max_total = self.bound.max_total()
+        lowest = step.cumulative_move_count - MAX_CANCELLATION * steps_left
+        return max_total is None or lowest <= max_total
+
+    def _map(
+        self,
+        stage: str,
+        fn: Callable[[Step], Counted],
+        steps: List[Step],
+        key: Callable[[Step], Hashable],
+    ) -> List[List[Step]]:
+        start = time.time()
+        unique = Deduplicated(steps, key)
+        found = fmc_meta.context().map(fmc_meta._task(stage, fn), unique.unique)
+        searches = sum(r.searches for r in found)
+        self.searches += searches
+        self.stage_searches[stage] += searches
+        self.stage_seconds[stage] += time.time() - start
+        self.saved[stage] += unique.saved
+        return unique.expand(found)
+
+    def _next(self, order: List[Step], start: int, n: int, steps_left: int):
+        """Up to n candidates from order[start:] that can still improve, and where to continue"""
+        batch: List[Step] = []
+        while start < len(order) and len(batch) < n:
+            if self._can_improve(order[start], steps_left):
+                batch.append(order[start])
+            start += 1
+        return batch, start
+
+    def run(self) -> Tuple[List[Step], List[Step], List[Step]]:
+        self.start = time.time()
+        meta = self.meta
+        found = fmc_meta.context().map(
+            fmc_meta._task(
+                "eo",
+                functools.partial(
+                    _run_counted,
+                    functools.partial(meta.eo.plan_eos_on_axis, scramble=self.scramble),
+                ),
+            ),
+            EO_AXES,
+        )
+        self.searches += sum(r.searches for r in found)
+        all_eos = [s for axis_eos in found for s in axis_eos]
+        print(f"Found EOs: {MoveCountHistogram(steps=all_eos)}")
+        adaptive_dr = getattr(meta.dr, "adaptive", False)
+        adaptive_eo = adaptive_dr and getattr(meta.eo, "adaptive", False)
+        if adaptive_eo:
+            eo_order = in_order(meta.eo, "select_eos", all_eos)
+        else:
+            eo_order = meta.eo.select_eos(all_eos)
+        eo_batch = self._batch_size(meta.eo, adaptive_eo, "dr", eo_order)
+        record_stage("eo", self.start, found=len(all_eos), kept=len(eo_order))
+
+        eos: List[Step] = []
+        found_drs: List[Step] = []
+        drs: List[Step] = []
+        finished: Set[int] = set()
+        finishes: List[Step] = []
+        next_eo = 0
+        find_drs = functools.partial(_run_counted, meta.dr.plan_drs_for_eo)
+        find_finishes = functools.partial(_finish_counted, meta.finish, self.bound)
+        # DRs are only worth finding while they can be finished
+        while self._budget_left("finish"):
+            batch: List[Step] = []
+            if self._budget_left("dr"):
+                batch, next_eo = self._next(eo_order, next_eo, eo_batch, 2)
+            if batch:
+                print(
+                    f"Looking for DRs on {len(batch)} EOs: {MoveCountHistogram(steps=batch)}"
+                )
+                for eo_drs in self._map("dr", find_drs, batch, dr_search_key):
+                    found_drs.extend(eo_drs)
+                eos.extend(batch)
+                if not adaptive_dr:
+                    continue
+
+            if adaptive_dr:
+                dr_order = in_order(meta.dr, "select_drs", found_drs)
+            else:
+                dr_order = meta.dr.select_drs(found_drs)
+            pending = [dr for dr in dr_order if id(dr) not in finished]
+            dr_batch, _ = self._next(
+                pending,
+                0,
+                self._batch_size(meta.dr, adaptive_dr, "finish", dr_order),
+                1,
+            )
+            if dr_batch:
+                print(
+                    f"Looking for finishes on {len(dr_batch)} DRs: "
+                    f"{MoveCountHistogram(steps=dr_batch)}"
+                )
+                for dr, dr_finishes in zip(
+                    dr_batch,
+                    self._map("finish", find_finishes, dr_batch, finish_search_key),
+                ):
+                    finished.add(id(dr))
+                    finishes.extend(dr_finishes)
+                drs.extend(dr_batch)
+
+            if not batch and not dr_batch:
+                if not self.used_up and (len(eos) < len(eo_order) or pending):
+                    print(f"Stopping: no candidate left can beat the top {self.top}")
+                break
+        record_stage(
+            "dr",
+            self.start,
+            found=len(found_drs),
+            kept=len(drs),
+            saved=self.saved["dr"],
+        )
+        finishes.sort(key=lambda s: s.cumulative_move_count)
+        record_stage(
+            "finish",
+            self.start,
+            found=len(finishes),
+            kept=len(finishes),
+            saved=self.saved["finish"],
+        )
+        return eos, drs, finishes
@@ -0,0 +1,261 @@
+from typing import Awaitable, Generator, List, Optional, Tuple, TypeVar
+import asyncio
+import os
+import tempfile
+import time
+
+import fmc_meta
+from fmc_meta import (
+    EO_AXES,
+    FinishBound,
+    Meta,
+    Search,
+    SearchPlan,
+    SolutionReader,
+    SolutionSet,
+    Step,
+    _stopped_early,
+)
+from fmc_meta.adaptive import is_adaptive
+from fmc_meta.backend import SolverBackend, find_nissy
+from fmc_meta.cache import FinishCache, NissyCache
+from fmc_meta.dedupe import Deduplicated, dr_search_key, finish_search_key
+
+T = TypeVar("T")
+
+
+class AsyncNissy:
+    """
+    Runs the searches of search plans as asyncio subprocesses, at most
+    processes of them at a time. One instance can be shared by any number
+    of concurrent attempts on the same event loop.
+    With a backend, such as a ReplayBackend or RecordingBackend, searches run
+    on it in the loop's default executor instead, and are only stopped once
+    they return. Searches are looked up in cache and finish_cache first, and
+    recorded as nissy events by fmc_meta._profiler.
+    """
+
+    def __init__(
+        self,
+        processes: Optional[int] = None,
+        nissy_path: Optional[str] = None,
+        cache: Optional[NissyCache] = None,
+        finish_cache: Optional[FinishCache] = None,
+        backend: Optional[SolverBackend] = None,
+    ):
+        self.processes = processes or os.cpu_count() or 1
+        self.backend = backend
+        self.nissy_path = nissy_path or (None if backend else find_nissy())
+        self.cache = cache
+        self.finish_cache = finish_cache
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # A semaphore can only be used on one event loop
+        if self._loop is not asyncio.get_running_loop():
+            self._loop = asyncio.get_running_loop()
+            self._semaphore = asyncio.Semaphore(self.processes)
+        return self._semaphore  # type: ignore[return-value]
+
+    async def solutions(
+        self, search: Search, stage: Optional[str] = None
+    ) -> List[Tuple[bytes, bytes]]:
+        """As from fmc_meta.nissy_solutions(). Cancelling kills the search."""
+        moves = search.scramble.all_moves
+        args = [str(a) for a in search.args]
+        start = time.time()
+        reader = SolutionReader(search.accept, search.limit, until=search.until)
+        output = self.cache.get(search.step_name, args, moves) if self.cache else None
+        if output is not None and not reader.read(output.splitlines()):
+            # Cached from a search that stopped too early for this one
+            reader = SolutionReader(search.accept, search.limit, until=search.until)
+            output = None
+        finish_cached = self.finish_cache is not None and self.finish_cache.handles(
+            search.step_name, args
+        )
+        if output is None and finish_cached:
+            output = self.finish_cache.get(search.step_name, args, search.scramble.all_codes)  # type: ignore[union-attr]
+            if output is not None:
+                reader.read(output.splitlines())
+        if output is not None:
+            if self.backend:
+                self.backend.searched(search.step_name, moves, args, output)
+        else:
+            keep_output = (
+                self.cache is not None
+                or finish_cached
+                or (self.backend is not None and self.backend.needs_full_output)
+            )
+            reader = SolutionReader(
+                search.accept, search.limit, keep_output, until=search.until
+            )
+            async with self.semaphore:
+                if self.backend:
+                    complete = await asyncio.get_running_loop().run_in_executor(
+                        None, self._run_backend, search.step_name, moves, args, reader
+                    )
+                else:
+                    complete = await self._run_nissy(
+                        search.step_name, moves, args, reader
+                    )
+            if not complete:
+                raise _stopped_early(search.step_name, moves, args)
+            if keep_output:
+                stored = reader.stored_output
+                if self.cache:
+                    self.cache.put(search.step_name, args, moves, stored)
+                # Only whole outputs are relabeled for symmetric DRs
+                if finish_cached and not reader.stopped:
+                    self.finish_cache.put(search.step_name, args, search.scramble.all_codes, stored)  # type: ignore[union-attr]
+                if self.backend:
+                    self.backend.searched(search.step_name, moves, args, stored)
+        if fmc_meta._profiler:
+            fmc_meta._profiler.record(
+                type="nissy",
+                stage=stage,
+                step=search.step_name,
+                args=args,
+                wall=time.time() - start,
+                subprocess=None,
+                cached=output is not None,
+                returned=reader.returned,
+                accepted=len(reader.solutions),
+            )
+        return reader.solutions
+
+    def _run_backend(
+        self, step_name: str, moves: List[str], args: List[str], reader: SolutionReader
+    ) -> bool:
+        """Feeds the output of a search on the backend to reader"""
+        lines = self.backend.stream(step_name, moves, args)  # type: ignore[union-attr]
+        try:
+            return reader.read(lines)
+        finally:
+            if isinstance(lines, Generator):
+                lines.close()
+
+    async def _run_nissy(
+        self, step_name: str, moves: List[str], args: List[str], reader: SolutionReader
+    ) -> bool:
+        """Feeds the output of a nissy subprocess to reader, as SolutionReader.read()"""
+        # stderr goes to a file, so that nissy never waits on a full stderr pipe
+        # while we wait on its stdout
+        with tempfile.TemporaryFile() as errors:
+            process = await asyncio.create_subprocess_exec(
+                self.nissy_path,  # type: ignore[arg-type]
+                "solve",
+                step_name,
+                "-p",
+                *args,
+                " ".join(moves),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=errors,
+            )
+            try:
+                async for raw in process.stdout:  # type: ignore[union-attr]
+                    if not reader.feed(raw.decode("UTF8")):
+                        return True
+                await process.wait()
+                errors.seek(0)
+                stderr = errors.read()
+                if stderr:
+                    raise Exception(stderr.decode("UTF8"))
+                return True
+            finally:
+                if process.returncode is None:
+                    try:
+                        process.kill()
+                    except ProcessLookupError:
+                        pass
+                # Also closes the pipes
+                await process.communicate()
+
+    async def run(self, plan: SearchPlan[T], stage: Optional[str] = None) -> T:
+        """Result of a search plan"""
+        try:
+            search = next(plan)
+            while True:
+                if isinstance(search, list):
+                    found = await asyncio.gather(
+                        *(self.solutions(s, stage) for s in search)
+                    )
+                    search = plan.send(list(found))
+                else:
+                    search = plan.send(await self.solutions(search, stage))
+        except StopIteration as e:
+            return e.value
+
+
+async def _all(awaitables: List[Awaitable[T]]) -> List[T]:
+    """
+    Results of all the awaitables. If one fails or this is cancelled,
+    the others are cancelled too, so that no searches are left running.
+    """
+    tasks = [asyncio.ensure_future(a) for a in awaitables]
+    try:
+        return await asyncio.gather(*tasks)
+    except asyncio.CancelledError:
+        # gather() has cancelled the tasks. Wait for them to clean up
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    except BaseException:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def _attempt(
+    meta: Meta, scramble: Step, nissy: AsyncNissy, top: Optional[int]
+) -> SolutionSet:
+    found = await _all(
+        [nissy.run(meta.eo.plan_eos_on_axis(axis, scramble), "eo") for axis in EO_AXES]
+    )
+    eos = meta.eo.select_eos([s for axis_eos in found for s in axis_eos])
+
+    unique = Deduplicated(eos, dr_search_key)
+    found = await _all(
+        [nissy.run(meta.dr.plan_drs_for_eo(eo), "dr") for eo in unique.unique]
+    )
+    drs = meta.dr.select_drs([s for eo_drs in unique.expand(found) for s in eo_drs])
+
+    bound = FinishBound(top, shared=False) if top is not None else None
+
+    async def dr_to_finish(dr: Step) -> List[Step]:
+        if bound is None:
+            return await nissy.run(meta.finish.plan_dr_to_finish(dr), "finish")
+        finishes = await nissy.run(
+            meta.finish.plan_dr_to_finish(dr, max_total=bound.max_total()), "finish"
+        )
+        for f in finishes:
+            bound.offer(f.cumulative_move_count)
+        return finishes
+
+    unique = Deduplicated(drs, finish_search_key)
+    found = await _all([dr_to_finish(dr) for dr in unique.unique])
+    finishes = [s for dr_finishes in unique.expand(found) for s in dr_finishes]
+    finishes.sort(key=lambda s: s.cumulative_move_count)
+    return SolutionSet(scramble=scramble, eos=eos, drs=drs, finishes=finishes)
+
+
+async def attempt(
+    meta: Meta,
+    scramble_moves: List[str],
+    nissy: AsyncNissy,
+    top: Optional[int] = None,
+    timeout: Optional[float] = None,
+) -> SolutionSet:
+    """
+    The same solutions as fmc_meta.main.attempt(), without printing progress.
+    If top is given, only the first top finishes are guaranteed to be found.
+    Raises asyncio.TimeoutError if the attempt takes longer than timeout seconds.
+    Searches still running when the attempt is cancelled or times out are killed.
+    Metas with adaptive strategies or a budget, which main.attempt() runs as an
+    AdaptiveAttempt, raise ValueError.
+    """
+    if is_adaptive(meta):
+        raise ValueError("Async attempts can't use adaptive strategies or budgets")
+    scramble = Step(name="scramble", moves=scramble_moves)
+    return await asyncio.wait_for(_attempt(meta, scramble, nissy, top), timeout)
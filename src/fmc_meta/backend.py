@@ -0,0 +1,204 @@
+from typing import Iterator, List, Optional, Tuple
+from abc import ABC, abstractmethod
+import functools
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import zlib
+
+from fmc_meta.cache import LocalConnections, NissyCache, replaces
+from fmc_meta.session import NissySession, NissySessionPool
+
+# Step name, moves and arguments of a search
+SearchRequest = Tuple[str, List[str], List[str]]
+
+
+@functools.lru_cache(maxsize=None)
+def find_nissy() -> str:
+    path = shutil.which("nissy")
+    if path is None:
+        raise Exception("nissy not found. Install it so that `which nissy` runs")
+    return path
+
+
+class SolverBackend(ABC):
+    """Runs the searches of fmc_meta.nissy()"""
+
+    # Whether searches are finished subprocesses of the calling process,
+    # so that their CPU time can be measured
+    runs_subprocesses = False
+    # Whether the whole output of each search is needed, even once the
+    # caller has all the solutions it wants
+    needs_full_output = False
+    # Whether stream() yields lines as they are found, so that stopping a
+    # search early saves the rest of it
+    streams = True
+
+    @abstractmethod
+    def stream(
+        self, step_name: str, moves: List[str], args: List[str]
+    ) -> Iterator[str]:
+        """
+        Lines of nissy output, as nissy prints them.
+        Closing the iterator early stops the search.
+        """
+        pass
+
+    def solve_many(self, searches: List[SearchRequest]) -> List[str]:
+        """
+        Whole output of each of many searches, for backends that can run them
+        in a single round trip. By default, they run one after another.
+        """
+        return ["".join(self.stream(*search)) for search in searches]
+
+    def searched(self, step_name: str, moves: List[str], args: List[str], output: str):
+        """Called with the whole output of every search, including cached ones"""
+        pass
+
+
+class SubprocessBackend(SolverBackend):
+    """A new nissy process for each search"""
+
+    runs_subprocesses = True
+
+    def __init__(self, nissy_path: str):
+        self.nissy_path = nissy_path
+
+    def stream(
+        self, step_name: str, moves: List[str], args: List[str]
+    ) -> Iterator[str]:
+        cmd = [self.nissy_path, "solve", step_name, "-p"] + args + [" ".join(moves)]
+        # stderr goes to a file, so that nissy never waits on a full stderr pipe
+        # while we wait on its stdout
+        with tempfile.TemporaryFile(mode="w+", encoding="UTF8") as errors:
+            p = subprocess.Popen(
+                cmd, encoding="UTF8", stdout=subprocess.PIPE, stderr=errors
+            )
+            try:
+                yield from p.stdout  # type: ignore[misc]
+                p.wait()
+                errors.seek(0)
+                stderr = errors.read()
+                if stderr:
+                    raise Exception(stderr)
+            finally:
+                if p.poll() is None:
+                    p.kill()
+                p.wait()
+                p.stdout.close()  # type: ignore[union-attr]
+
+    def solve_many(self, searches: List[SearchRequest]) -> List[str]:
+        """All of the searches on one nissy shell, which loads its tables once"""
+        session = NissySession(self.nissy_path)
+        try:
+            return session.solve_many(searches)
+        finally:
+            session.close()
+
+
+class SessionBackend(SolverBackend):
+    """
+    Long-lived nissy sessions. A session returns the whole output of a search,
+    so searches can't be stopped early.
+    """
+
+    streams = False
+
+    def __init__(self, sessions: NissySessionPool):
+        self.sessions = sessions
+
+    def stream(
+        self, step_name: str, moves: List[str], args: List[str]
+    ) -> Iterator[str]:
+        output = self.sessions.solve(step_name, moves, args)
+        return iter(output.splitlines(keepends=True))
+
+    def solve_many(self, searches: List[SearchRequest]) -> List[str]:
+        return self.sessions.solve_many(searches)
+
+
+class NissyArchive:
+    """
+    Recorded nissy output, keyed as in NissyCache and compressed, without eviction.
+    Recordings from all processes writing to the same file are combined.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connections = LocalConnections(path, self._create)
+
+    @staticmethod
+    def _create(conn: sqlite3.Connection):
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS outputs (key TEXT PRIMARY KEY, output BLOB)"
+        )
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        return self._connections.get()
+
+    def get(self, step_name: str, args, moves: List[str]) -> Optional[str]:
+        row = self.conn.execute(
+            "SELECT output FROM outputs WHERE key = ?",
+            (NissyCache.key(step_name, args, moves),),
+        ).fetchone()
+        return zlib.decompress(row[0]).decode("UTF8") if row else None
+
+    def put(self, step_name: str, args, moves: List[str], output: str):
+        key = NissyCache.key(step_name, args, moves)
+        with self.conn as conn:
+            row = conn.execute(
+                "SELECT output FROM outputs WHERE key = ?", (key,)
+            ).fetchone()
+            stored = zlib.decompress(row[0]).decode("UTF8") if row else None
+            if replaces(output, stored):
+                conn.execute(
+                    "INSERT OR REPLACE INTO outputs VALUES (?, ?)",
+                    (key, zlib.compress(output.encode("UTF8"))),
+                )
+
+    def __len__(self):
+        (count,) = self.conn.execute("SELECT COUNT(*) FROM outputs").fetchone()
+        return count
+
+
+class RecordingBackend(SolverBackend):
+    """Runs searches on another backend, recording their output in an archive"""
+
+    needs_full_output = True
+
+    def __init__(self, backend: SolverBackend, archive: NissyArchive):
+        self.backend = backend
+        self.archive = archive
+        self.runs_subprocesses = backend.runs_subprocesses
+        self.streams = backend.streams
+
+    def stream(
+        self, step_name: str, moves: List[str], args: List[str]
+    ) -> Iterator[str]:
+        return self.backend.stream(step_name, moves, args)
+
+    def solve_many(self, searches: List[SearchRequest]) -> List[str]:
+        return self.backend.solve_many(searches)
+
+    def searched(self, step_name: str, moves: List[str], args: List[str], output: str):
+        self.archive.put(step_name, args, moves, output)
+
+
+class ReplayBackend(SolverBackend):
+    """Output recorded by a RecordingBackend. Searches that weren't recorded fail."""
+
+    def __init__(self, archive: NissyArchive):
+        self.archive = archive
+
+    def stream(
+        self, step_name: str, moves: List[str], args: List[str]
+    ) -> Iterator[str]:
+        output = self.archive.get(step_name, args, moves)
+        if output is None:
+            raise Exception(
+                f"No recorded nissy output for {step_name} {' '.join(args)} "
+                f"on {' '.join(moves)}"
+            )
+        return iter(output.splitlines(keepends=True))
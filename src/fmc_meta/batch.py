@@ -0,0 +1,265 @@
+from typing import Dict, Iterator, List, Optional, Tuple
+import dataclasses
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+import fmc_meta
+from fmc_meta import EO_AXES, Meta, Step, record_stage, run_plans
+from fmc_meta.dedupe import Deduplicated, dr_search_key, finish_search_key
+from fmc_meta.execution import InlineContext
+
+
+@dataclasses.dataclass(frozen=True)
+class Job:
+    index: int
+    scramble: str
+    meta: str
+
+
+def read_scrambles(path: str) -> List[str]:
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def generate_scrambles(n: int, path: str) -> List[str]:
+    scrambles = [
+        subprocess.check_output(["nissy", "scramble"], encoding="UTF8").strip()
+        for _ in range(n)
+    ]
+    with open(path, "w") as f:
+        f.writelines(f"{s}\n" for s in scrambles)
+    return scrambles
+
+
+class Checkpoint:
+    """
+    Append-only record of finished jobs, one JSON object per line,
+    so that an interrupted batch can resume where it left off
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.scores: Dict[Tuple[int, str], List[int]] = {}
+        self.scrambles: Dict[int, str] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                lines = f.readlines()
+            for line in lines:
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Partially-written line from an interrupted run
+                self.scores[(row["index"], row["meta"])] = row["scores"]
+                self.scrambles[row["index"]] = row["scramble"]
+            if lines and not lines[-1].endswith("\n"):
+                with open(path, "a") as f:
+                    f.write("\n")
+
+    def check_scrambles(self, scrambles: List[str]):
+        for index, scramble in self.scrambles.items():
+            if index < len(scrambles) and scrambles[index] != scramble:
+                raise Exception(
+                    f"Checkpoint {self.path} has a different scramble #{index}: {scramble}"
+                )
+
+    def is_done(self, job: Job) -> bool:
+        return (job.index, job.meta) in self.scores
+
+    def record(self, job: Job, scores: List[int]):
+        self.scores[(job.index, job.meta)] = scores
+        with open(self.path, "a") as f:
+            f.write(
+                json.dumps(
+                    dict(
+                        index=job.index,
+                        scramble=job.scramble,
+                        meta=job.meta,
+                        scores=scores,
+                    )
+                )
+                + "\n"
+            )
+
+
+_metas: Dict[str, Meta] = {}
+_top: Optional[int] = None
+_pipelined = False
+
+
+def _init_worker(metas: Dict[str, Meta], top: Optional[int], pipelined: bool):
+    global _metas, _top, _pipelined
+    _metas = metas
+    _top = top
+    _pipelined = pipelined
+    # Each worker runs the searches of its attempts one after another
+    fmc_meta.use_context(InlineContext())
+    # Progress is reported by the parent
+    sys.stdout = open(os.devnull, "w")
+
+
+def _run_job(job: Job) -> Tuple[Job, List[int]]:
+    from fmc_meta.main import attempt
+
+    solutions = attempt(_metas[job.meta], job.scramble.split(" "), _pipelined, top=_top)
+    return job, [f.cumulative_move_count for f in solutions.finishes[:3]]
+
+
+def run_jobs(
+    jobs: List[Job],
+    metas: Dict[str, Meta],
+    processes: int,
+    pipelined: bool = False,
+    top: Optional[int] = None,
+) -> Iterator[Tuple[Job, List[int]]]:
+    """
+    Run each job as a whole attempt in a pool of processes, yielding results in
+    order of completion. With a single process, jobs run one after another,
+    each using the execution context for its own stages.
+    """
+    if processes == 1:
+        from fmc_meta.main import attempt
+
+        for job in jobs:
+            solutions = attempt(
+                metas[job.meta], job.scramble.split(" "), pipelined, top
+            )
+            yield job, [f.cumulative_move_count for f in solutions.finishes[:3]]
+        return
+    with multiprocessing.Pool(
+        processes=processes,
+        initializer=_init_worker,
+        initargs=(metas, top, pipelined),
+    ) as pool:
+        yield from pool.imap_unordered(_run_job, jobs)
+
+
+def _by_scramble(
+    steps: List[List[Step]], owners: List[int], n: int
+) -> List[List[Step]]:
+    """Steps found from candidates of many scrambles, grouped by scramble"""
+    grouped: List[List[Step]] = [[] for _ in range(n)]
+    for found, owner in zip(steps, owners):
+        grouped[owner].extend(found)
+    return grouped
+
+
+def solve_batched(
+    meta: Meta, scrambles: List[Step], batch_size: int
+) -> List[Tuple[List[Step], List[Step], List[Step]]]:
+    """
+    EOs, DRs and finishes of each scramble, running each stage for all of the
+    scrambles at once: the searches of all of their candidates are sent to
+    the solver in batches of up to batch_size, see fmc_meta.run_searches().
+    Each scramble's candidates are selected on their own, as in an attempt.
+    """
+    n = len(scrambles)
+    start = time.time()
+    found = run_plans(
+        "eo",
+        [meta.eo.plan_eos_on_axis(axis, s) for s in scrambles for axis in EO_AXES],
+        batch_size,
+    )
+    eos = [
+        meta.eo.select_eos(found_eos)
+        for found_eos in _by_scramble(found, [i for i in range(n) for _ in EO_AXES], n)
+    ]
+    record_stage("eo", start, found=sum(len(f) for f in found), kept=sum(map(len, eos)))
+
+    start = time.time()
+    candidates = [eo for scramble_eos in eos for eo in scramble_eos]
+    owners = [i for i, scramble_eos in enumerate(eos) for _ in scramble_eos]
+    unique = Deduplicated(candidates, dr_search_key)
+    found = unique.expand(
+        run_plans(
+            "dr", [meta.dr.plan_drs_for_eo(eo) for eo in unique.unique], batch_size
+        )
+    )
+    drs = [meta.dr.select_drs(d) for d in _by_scramble(found, owners, n)]
+    record_stage(
+        "dr",
+        start,
+        found=sum(len(f) for f in found),
+        kept=sum(map(len, drs)),
+        saved=unique.saved,
+    )
+
+    start = time.time()
+    candidates = [dr for scramble_drs in drs for dr in scramble_drs]
+    owners = [i for i, scramble_drs in enumerate(drs) for _ in scramble_drs]
+    unique = Deduplicated(candidates, finish_search_key)
+    found = unique.expand(
+        run_plans(
+            "finish",
+            [meta.finish.plan_dr_to_finish(dr) for dr in unique.unique],
+            batch_size,
+        )
+    )
+    finishes = _by_scramble(found, owners, n)
+    for f in finishes:
+        f.sort(key=lambda s: s.cumulative_move_count)
+    total = sum(map(len, finishes))
+    record_stage("finish", start, found=total, kept=total, saved=unique.saved)
+    return list(zip(eos, drs, finishes))
+
+
+def run_batched(
+    jobs: List[Job], metas: Dict[str, Meta], batch_size: int
+) -> Iterator[Tuple[Job, List[int]]]:
+    """Run the jobs of each meta together with solve_batched()"""
+    for name, meta in metas.items():
+        meta_jobs = [job for job in jobs if job.meta == name]
+        if not meta_jobs:
+            continue
+        scrambles = [
+            Step(name="scramble", moves=job.scramble.split(" ")) for job in meta_jobs
+        ]
+        for job, (_, _, finishes) in zip(
+            meta_jobs, solve_batched(meta, scrambles, batch_size)
+        ):
+            yield job, [f.cumulative_move_count for f in finishes[:3]]
+
+
+def winners(
+    scores1: List[int], scores2: List[int], meta1: str, meta2: str
+) -> Tuple[Optional[str], Optional[str]]:
+    winner = None
+    if scores1 and (not scores2 or scores1[0] < scores2[0]):
+        winner = meta1
+    elif scores2 and (not scores1 or scores2[0] < scores1[0]):
+        winner = meta2
+    tie_break_winner = None
+    if not winner and scores1 and scores2:
+        if tuple(scores1) < tuple(scores2):
+            tie_break_winner = meta1
+        elif tuple(scores2) < tuple(scores1):
+            tie_break_winner = meta2
+    return winner, tie_break_winner
+
+
+def write_report(
+    path: str,
+    scrambles: List[str],
+    checkpoint: Checkpoint,
+    meta1: str,
+    meta2: str,
+):
+    with open(path, "w") as report:
+        report.write(
+            f"|scramble|{meta1} result|{meta2} result|winner|tie-break winner|\n"
+        )
+        report.write(f"|---|---|---|---|---|\n")
+        for i, scramble in enumerate(scrambles):
+            scores1 = checkpoint.scores.get((i, meta1))
+            scores2 = checkpoint.scores.get((i, meta2))
+            if scores1 is None or scores2 is None:
+                continue
+            winner, tie_break_winner = winners(scores1, scores2, meta1, meta2)
+            scores1_str = "/".join(str(s) for s in scores1)
+            scores2_str = "/".join(str(s) for s in scores2)
+            report.write(
+                f"|{scramble}|{scores1_str}|{scores2_str}|{winner or '-'}|{tie_break_winner or '-'}|\n"
+            )
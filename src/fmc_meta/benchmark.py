@@ -0,0 +1,168 @@
+from typing import Dict, List, Optional
+import contextlib
+import dataclasses
+import io
+import json
+import os
+import random
+import resource
+import tempfile
+import time
+
+import fmc_meta
+from fmc_meta import Meta
+from fmc_meta.execution import create_context
+from fmc_meta.profiling import Profiler, summarize
+
+CORPUS_SEED = 20240601
+FACES = ["U", "D", "R", "L", "F", "B"]
+
+
+def corpus(n: int, seed: int = CORPUS_SEED, length: int = 25) -> List[str]:
+    """
+    Pinned random-move scrambles. A face is never turned twice in a row,
+    or again with only its opposite face turned in between.
+    """
+    rng = random.Random(seed)
+    scrambles = []
+    for _ in range(n):
+        moves: List[str] = []
+        while len(moves) < length:
+            face = rng.choice(FACES)
+            if moves and moves[-1][0] == face:
+                continue
+            axis = FACES.index(face) // 2
+            if (
+                len(moves) > 1
+                and FACES.index(moves[-1][0]) // 2 == axis
+                and moves[-2][0] == face
+            ):
+                continue
+            moves.append(face + rng.choice(["", "2", "'"]))
+        scrambles.append(" ".join(moves))
+    return scrambles
+
+
+@dataclasses.dataclass
+class BenchmarkResult:
+    meta: str
+    scrambles: int
+    wall: float
+    scrambles_per_minute: float
+    # Mean seconds per scramble spent in each stage
+    stage_latency: Dict[str, float]
+    nissy_calls_per_scramble: float
+    # Move counts of the best three solutions of each scramble
+    scores: List[List[int]]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process or any finished subprocess"""
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    return peak / 1024
+
+
+def run_benchmark(
+    name: str, meta: Meta, scrambles: List[str], processes: int = 1
+) -> BenchmarkResult:
+    from fmc_meta.main import attempt
+
+    profiler = fmc_meta._profiler
+    with tempfile.TemporaryDirectory() as tmp:
+        # Installed before the workers start, so that they record their events too
+        fmc_meta._profiler = Profiler(os.path.join(tmp, "profile.jsonl"))
+        try:
+            scores = []
+            start = time.time()
+            with fmc_meta.use_context(
+                create_context("inline" if processes == 1 else "process", processes)
+            ):
+                for scramble in scrambles:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        solutions = attempt(meta, scramble.split(" "))
+                    scores.append(
+                        [f.cumulative_move_count for f in solutions.finishes[:3]]
+                    )
+            wall = time.time() - start
+            events = fmc_meta._profiler.events()
+        finally:
+            fmc_meta._profiler = profiler
+    n = len(scrambles)
+    return BenchmarkResult(
+        meta=name,
+        scrambles=n,
+        wall=wall,
+        scrambles_per_minute=60 * n / wall,
+        stage_latency={s.stage: s.wall / n for s in summarize(events) if s.wall},
+        nissy_calls_per_scramble=sum(e["type"] == "nissy" for e in events) / n,
+        scores=scores,
+    )
+
+
+def compare_to_baseline(
+    results: List[BenchmarkResult], baseline: Dict, tolerance: float, peak_rss: float
+) -> List[str]:
+    """Regressions of results and of the peak RSS from a saved baseline, as messages"""
+    regressions = []
+    base_rss = baseline.get("peak_rss_mb")
+    if base_rss and peak_rss > base_rss * (1 + tolerance):
+        regressions.append(f"peak RSS of {peak_rss:.0f} MB, baseline {base_rss:.0f} MB")
+    by_meta = {r["meta"]: r for r in baseline["results"]}
+    for result in results:
+        base = by_meta.get(result.meta)
+        if base is None:
+            continue
+        if result.scores != base["scores"][: result.scrambles]:
+            regressions.append(f"{result.meta}: solutions differ from the baseline")
+        if result.scrambles_per_minute < base["scrambles_per_minute"] * (1 - tolerance):
+            regressions.append(
+                f"{result.meta}: {result.scrambles_per_minute:.1f} scrambles/minute, "
+                f"baseline {base['scrambles_per_minute']:.1f}"
+            )
+        for stage, latency in result.stage_latency.items():
+            base_latency = base["stage_latency"].get(stage)
+            if base_latency and latency > base_latency * (1 + tolerance):
+                regressions.append(
+                    f"{result.meta}: {stage} takes {latency:.3f}s per scramble, "
+                    f"baseline {base_latency:.3f}s"
+                )
+        if result.nissy_calls_per_scramble > base["nissy_calls_per_scramble"]:
+            regressions.append(
+                f"{result.meta}: {result.nissy_calls_per_scramble:.1f} nissy calls "
+                f"per scramble, baseline {base['nissy_calls_per_scramble']:.1f}"
+            )
+    return regressions
+
+
+def save_results(path: str, results: List[BenchmarkResult], replay: Optional[str]):
+    with open(path, "w") as f:
+        json.dump(
+            dict(
+                replay=replay,
+                peak_rss_mb=peak_rss_mb(),
+                results=[dataclasses.asdict(r) for r in results],
+            ),
+            f,
+            indent=2,
+        )
+
+
+def format_results(results: List[BenchmarkResult]) -> str:
+    stages = ["eo", "dr", "finish"]
+    lines = [
+        "|meta|scrambles|scrambles/minute|"
+        + "|".join(f"{s} s/scramble" for s in stages)
+        + "|nissy calls/scramble|",
+        "|---|---|---|" + "---|" * len(stages) + "---|",
+    ]
+    for r in results:
+        latencies = "|".join(f"{r.stage_latency.get(s, 0):.3f}" for s in stages)
+        lines.append(
+            f"|{r.meta}|{r.scrambles}|{r.scrambles_per_minute:.1f}|{latencies}"
+            f"|{r.nissy_calls_per_scramble:.1f}|"
+        )
+    lines.append(f"\nPeak RSS: {peak_rss_mb():.0f} MB")
+    return "\n".join(lines)
@@ -0,0 +1,248 @@
+from typing import Callable, List, Optional, Tuple
+import dataclasses
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Last line of the stored output of a search stopped early: what nissy printed
+# up to the solution it stopped at. Searches that read past it need to run.
+STOPPED = "..."
+
+
+def replaces(output: str, stored: Optional[str]) -> bool:
+    """
+    Whether output should replace what is stored for the same search: only the
+    output of a search stopped early is replaced, by output that goes further
+    """
+    return (
+        stored is None
+        or stored.endswith(f"{STOPPED}\n")
+        and output.count("\n") > stored.count("\n")
+    )
+
+
+@dataclasses.dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    entries: int = 0
+    size: int = 0
+
+    def __sub__(self, other: "CacheStats") -> "CacheStats":
+        return CacheStats(
+            hits=self.hits - other.hits,
+            misses=self.misses - other.misses,
+            entries=self.entries - other.entries,
+            size=self.size - other.size,
+        )
+
+    def __str__(self):
+        total = self.hits + self.misses
+        rate = f" ({100 * self.hits / total:.0f}% hit rate)" if total else ""
+        return f"{self.hits} hits, {self.misses} misses{rate}"
+
+
+def normalize_args(args) -> List[str]:
+    """
+    Canonical form of a nissy argument list: options are paired with their
+    values and sorted, so that "-M 5 -N" and "-N -M 5" share a cache entry
+    """
+    tokens = [str(a).strip() for a in args]
+    options: List[Tuple[str, ...]] = []
+    i = 0
+    while i < len(tokens):
+        if i + 1 < len(tokens) and not tokens[i + 1].startswith("-"):
+            options.append((tokens[i], tokens[i + 1]))
+            i += 2
+        else:
+            options.append((tokens[i],))
+            i += 1
+    return [t for option in sorted(options) for t in option]
+
+
+class LocalConnections:
+    """
+    A connection to a sqlite database for each process and thread, as sqlite
+    connections can't be shared with forked pool workers, or between threads.
+    New connections use WAL, and create(conn) creates the tables if needed.
+    """
+
+    def __init__(self, path: str, create: Callable[[sqlite3.Connection], None]):
+        self.path = path
+        self.create = create
+        self._local = threading.local()
+
+    def get(self) -> sqlite3.Connection:
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            local.conn = sqlite3.connect(self.path, timeout=60)
+            local.pid = os.getpid()
+            with local.conn:
+                local.conn.execute("PRAGMA journal_mode=WAL")
+                self.create(local.conn)
+        return local.conn
+
+
+class NissyCache:
+    """
+    Content-addressed, on-disk cache of nissy output, keyed on step name,
+    normalized arguments and the move sequence leading to the searched position.
+    Entries are evicted least-recently-used first once the total size of
+    cached output exceeds max_size bytes.
+    Hit and miss counts are stored alongside the entries, so they accumulate
+    across all processes sharing the cache file.
+    """
+
+    def __init__(self, path: str, max_size: int = 256 * 1024 * 1024):
+        self.path = path
+        self.max_size = max_size
+        self._connections = LocalConnections(path, self._create)
+
+    @staticmethod
+    def _create(conn: sqlite3.Connection):
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, output TEXT, size INTEGER, last_used REAL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS entries_last_used ON entries(last_used)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)"
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO counters VALUES (?, 0)",
+            [("hits",), ("misses",), ("size",)],
+        )
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        return self._connections.get()
+
+    @staticmethod
+    def key(step_name: str, args, moves: List[str]) -> str:
+        content = json.dumps([step_name, normalize_args(args), moves])
+        return hashlib.sha1(content.encode("UTF8")).hexdigest()
+
+    def get(self, step_name: str, args, moves: List[str]) -> Optional[str]:
+        key = self.key(step_name, args, moves)
+        with self.conn as conn:
+            row = conn.execute(
+                "SELECT output FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                conn.execute(
+                    "UPDATE counters SET value = value + 1 WHERE name = 'misses'"
+                )
+                return None
+            conn.execute(
+                "UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+            conn.execute("UPDATE counters SET value = value + 1 WHERE name = 'hits'")
+            return row[0]
+
+    def put(self, step_name: str, args, moves: List[str], output: str):
+        key = self.key(step_name, args, moves)
+        size = len(output.encode("UTF8"))
+        with self.conn as conn:
+            old = conn.execute(
+                "SELECT size, output FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if not replaces(output, old[1] if old else None):
+                return
+            conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                (key, output, size, time.time()),
+            )
+            conn.execute(
+                "UPDATE counters SET value = value + ? WHERE name = 'size'",
+                (size - (old[0] if old else 0),),
+            )
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        (total,) = conn.execute(
+            "SELECT value FROM counters WHERE name = 'size'"
+        ).fetchone()
+        if total <= self.max_size:
+            return
+        freed = 0
+        victims = []
+        for key, size in conn.execute(
+            "SELECT key, size FROM entries ORDER BY last_used"
+        ):
+            if total - freed <= self.max_size:
+                break
+            victims.append((key,))
+            freed += size
+        conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+        conn.execute(
+            "UPDATE counters SET value = value - ? WHERE name = 'size'", (freed,)
+        )
+
+    def stats(self) -> CacheStats:
+        counters = dict(self.conn.execute("SELECT name, value FROM counters"))
+        (entries,) = self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+        return CacheStats(
+            hits=counters["hits"],
+            misses=counters["misses"],
+            entries=entries,
+            size=counters["size"],
+        )
+
+
+class FinishCache:
+    """
+    On-disk cache of the output of finish searches (drudfin, drrlfin and
+    drfbfin), shared by DRs whose positions are the same up to a symmetry of
+    the cube: rotations and mirrors, relabeling the DR axis. Output is stored
+    for a canonical position in DR on the UD axis, and relabeled back to the
+    searched DR's orientation.
+    Finishes found from a symmetric position are as short as nissy's own for
+    the DR, but may be different ones of the same length. Only searches for
+    every finish up to a length (-M) are cached: the one finish of a search
+    for the shortest would depend on which of the DRs was searched first.
+    """
+
+    def __init__(self, path: str, max_size: int = 256 * 1024 * 1024):
+        self.entries = NissyCache(path, max_size)
+
+    @staticmethod
+    def handles(step_name: str, args) -> bool:
+        return step_name in ("drudfin", "drrlfin", "drfbfin") and "-M" in args
+
+    def _entry(self, step_name: str, args, codes: bytes) -> Optional[Tuple[str, bytes]]:
+        """The canonical position's key, and the symmetry taking codes to it"""
+        from fmc_meta.symmetry import canonical
+
+        if not self.handles(step_name, args):
+            return None
+        found = canonical(codes, step_name[2:4])
+        if found is None:
+            return None
+        key, table = found
+        return key.hex(), table
+
+    def get(self, step_name: str, args, codes: bytes) -> Optional[str]:
+        from fmc_meta.symmetry import inverse_table, relabel_output
+
+        entry = self._entry(step_name, args, codes)
+        if entry is None:
+            return None
+        key, table = entry
+        output = self.entries.get("drudfin", args, [key])
+        return None if output is None else relabel_output(output, inverse_table(table))
+
+    def put(self, step_name: str, args, codes: bytes, output: str):
+        from fmc_meta.symmetry import relabel_output
+
+        entry = self._entry(step_name, args, codes)
+        if entry is not None:
+            key, table = entry
+            self.entries.put("drudfin", args, [key], relabel_output(output, table))
+
+    def stats(self) -> CacheStats:
+        return self.entries.stats()
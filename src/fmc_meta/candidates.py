@@ -0,0 +1,96 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from fmc_meta import Step
+from fmc_meta.moves import INVERSE_CODES, NO_MOVE, QUARTER_TURN_CODES
+
+_INVERSE = np.frombuffer(INVERSE_CODES.ljust(256, bytes([NO_MOVE])), dtype=np.uint8)
+_IS_QUARTER_TURN = np.array([c in QUARTER_TURN_CODES for c in range(256)])
+
+
+def _pad(codes: List[bytes]) -> Tuple[np.ndarray, np.ndarray]:
+    """Moves as rows of an array padded with NO_MOVE, and their lengths"""
+    lengths = np.array([len(c) for c in codes], dtype=np.int64)
+    width = int(lengths.max()) if len(codes) else 0
+    array = np.full((len(codes), max(width, 1)), NO_MOVE, dtype=np.uint8)
+    for i, c in enumerate(codes):
+        array[i, : len(c)] = np.frombuffer(c, dtype=np.uint8)
+    return array, lengths
+
+
+def _cancellation(a: np.ndarray, b: int) -> np.ndarray:
+    """Vectorized fmc_meta.moves.cancellation of moves a following move b"""
+    if b == NO_MOVE:
+        return np.zeros(len(a), dtype=np.int64)
+    same_face = (a // 3) == b // 3
+    return np.where(same_face, np.where(_INVERSE[a] == b, 2, 1), 0)
+
+
+class CandidateBatch:
+    """
+    Move counts and NISS flags of many candidate next steps from the same step,
+    as NumPy arrays. Each candidate is a pair of (moves on normal, moves on inverse)
+    move codes. The counts are the same as those of the corresponding Step objects,
+    which are only built for the candidates that are kept.
+    """
+
+    def __init__(self, name: str, previous: Step, solutions: List[Tuple[bytes, bytes]]):
+        self.name = name
+        self.previous = previous
+        self.solutions = solutions
+        normal, self.normal_length = _pad([s[0] for s in solutions])
+        inverse, self.inverse_length = _pad([s[1] for s in solutions])
+        has_normal = self.normal_length > 0
+        has_inverse = self.inverse_length > 0
+        last_normal = normal[
+            np.arange(len(solutions)), np.maximum(self.normal_length - 1, 0)
+        ]
+
+        # Cancellations with the previous steps, as in Step
+        self.cancellations = (
+            np.where(
+                has_normal, _cancellation(normal[:, 0], previous.last_on_normal), 0
+            )
+            + np.where(
+                has_inverse, _cancellation(inverse[:, 0], previous.last_on_inverse), 0
+            )
+            + np.where(
+                has_normal, _cancellation(last_normal, previous.last_on_inverse), 0
+            )
+        )
+        self.move_count = self.normal_length + self.inverse_length - self.cancellations
+        self.cumulative_move_count = previous.cumulative_move_count + self.move_count
+        self.qt_count = (_IS_QUARTER_TURN[normal]).sum(axis=1)
+        self.includes_niss = has_normal & has_inverse
+        self.niss_split = np.minimum(self.normal_length, self.inverse_length)
+        if previous.includes_niss:
+            self.requires_niss = np.zeros(len(solutions), dtype=bool)
+        else:
+            # Same (chained) comparison as Step.requires_niss
+            n = len(previous.codes)
+            self.requires_niss = ~((self.normal_length > (0 ^ n)) & (n > 0))
+
+    def __len__(self):
+        return len(self.solutions)
+
+    def steps(self, keep: Optional[np.ndarray] = None) -> List[Step]:
+        """Steps for the candidates selected by a boolean mask, in their original order"""
+        indexes = range(len(self)) if keep is None else np.flatnonzero(keep)
+        return [
+            Step.from_codes(self.name, *self.solutions[i], previous=self.previous)
+            for i in indexes
+        ]
+
+    def steps_on_inverse(
+        self, previous: Step, keep: Optional[np.ndarray] = None
+    ) -> List[Step]:
+        """
+        Steps applying the normal moves of the selected candidates on the inverse
+        of another step, for candidates found by solving that step's inverse
+        """
+        indexes = range(len(self)) if keep is None else np.flatnonzero(keep)
+        return [
+            Step.from_codes(self.name, b"", self.solutions[i][0], previous=previous)
+            for i in indexes
+        ]
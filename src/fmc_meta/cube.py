@@ -0,0 +1,348 @@
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from fmc_meta.moves import MOVES, NO_MOVE
+
+Vector = Tuple[int, int, int]
+
+# Outward normal of each face: x to the right, y up, z to the front
+NORMALS: Dict[str, Vector] = {
+    "U": (0, 1, 0),
+    "D": (0, -1, 0),
+    "R": (1, 0, 0),
+    "L": (-1, 0, 0),
+    "F": (0, 0, 1),
+    "B": (0, 0, -1),
+}
+# Axes by the faces' names in step names, e.g. drud and eofb
+AXES = {"rl": 0, "ud": 1, "fb": 2}
+
+CORNERS = ["URF", "UFL", "ULB", "UBR", "DFR", "DLF", "DBL", "DRB"]
+EDGES = ["UR", "UF", "UL", "UB", "DR", "DF", "DL", "DB", "FR", "FL", "BL", "BR"]
+CENTERS = ["U", "D", "R", "L", "F", "B"]
+
+# Move table index of no move, for padding
+_IDENTITY = len(MOVES)
+
+
+def _dot(a: Vector, b: Vector) -> int:
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+
+def _cross(a: Vector, b: Vector) -> Vector:
+    return (
+        a[1] * b[2] - a[2] * b[1],
+        a[2] * b[0] - a[0] * b[2],
+        a[0] * b[1] - a[1] * b[0],
+    )
+
+
+def _turn(v: Vector, n: Vector) -> Vector:
+    """v turned a quarter clockwise, looking along -n"""
+    d = _dot(v, n)
+    c = _cross(n, v)
+    return (d * n[0] - c[0], d * n[1] - c[1], d * n[2] - c[2])
+
+
+def _axis(v: Vector) -> int:
+    return next(i for i in range(3) if v[i])
+
+
+def _position(slot: str) -> Vector:
+    return tuple(sum(NORMALS[f][i] for f in slot) for i in range(3))  # type: ignore
+
+
+def _corner_stickers(slot: str) -> List[Vector]:
+    """Normals of the slot's stickers, U or D first, then clockwise"""
+    first, a, b = (NORMALS[f] for f in slot)
+    return [first, a, b] if _dot(_cross(first, a), b) > 0 else [first, b, a]
+
+
+def _edge_stickers(slot: str, axis: int = AXES["fb"]) -> List[Vector]:
+    """
+    Normals of the slot's stickers, its reference sticker first. For edge
+    orientation on the FB or RL axis, that is the U or D sticker, or else the one
+    on the axis. For the UD axis, it is the F or B sticker, or else the U or D one.
+    """
+    priority = AXES["fb"] if axis == AXES["ud"] else AXES["ud"]
+    stickers = [NORMALS[f] for f in slot]
+    if _axis(stickers[1]) == priority or (
+        _axis(stickers[0]) != priority and _axis(stickers[1]) == axis
+    ):
+        stickers.reverse()
+    return stickers
+
+
+def _move(code: int):
+    """Outward normal of the turn's direction, and the layers turned"""
+    face, quarters = MOVES[code][0], code % 3 + 1
+    if face in "UDRLFB":
+        n = NORMALS[face]
+        return n, quarters, (lambda p: _dot(p, n) == 1)
+    if face in "MES":
+        n = NORMALS[{"M": "L", "E": "D", "S": "F"}[face]]
+        return n, quarters, (lambda p: _dot(p, n) == 0)
+    if face in "udrlfb":
+        n = NORMALS[face.upper()]
+        return n, quarters, (lambda p: _dot(p, n) >= 0)
+    n = NORMALS[{"x": "R", "y": "U", "z": "F"}[face]]
+    return n, quarters, (lambda p: True)
+
+
+def _tables(slots: List[str], stickers: List[List[Vector]]):
+    """
+    For each move, and no move, the slot each slot's piece comes from,
+    and how far its stickers turn along the slot's sticker order
+    """
+    positions = [_position(s) for s in slots]
+    source = np.zeros((len(MOVES) + 1, len(slots)), dtype=np.intp)
+    twist = np.zeros((len(MOVES) + 1, len(slots)), dtype=np.uint8)
+    source[_IDENTITY] = np.arange(len(slots))
+    for code in range(len(MOVES)):
+        n, quarters, turned = _move(code)
+        for i, p in enumerate(positions):
+            reference = stickers[i][0]
+            if turned(p):
+                for _ in range(quarters):
+                    p = _turn(p, n)
+                    reference = _turn(reference, n)
+            j = positions.index(p)
+            source[code, j] = i
+            twist[code, j] = stickers[j].index(reference)
+    return source, twist
+
+
+_CORNER_STICKERS = [_corner_stickers(s) for s in CORNERS]
+_EDGE_STICKERS = [_edge_stickers(s) for s in EDGES]
+_CP, _CO = _tables(CORNERS, _CORNER_STICKERS)
+_EP, _EO = _tables(EDGES, _EDGE_STICKERS)
+_CENTERS, _ = _tables(CENTERS, [[NORMALS[c]] for c in CENTERS])
+_MOVE_INDEX = np.full(256, _IDENTITY, dtype=np.intp)
+_MOVE_INDEX[: len(MOVES)] = np.arange(len(MOVES))
+# Batches small enough that gathering each cube's pieces beats grouping by move
+_SMALL_BATCH = 64
+_ADD_MOD_3 = np.add.outer(np.arange(3), np.arange(3)).astype(np.uint8) % 3
+
+
+def _axis_tables():
+    """
+    Orientation of each piece in each slot on each axis, by its orientation
+    as stored in a Cube, indexed [axis, slot, piece, orientation]
+    """
+    co = np.zeros((3, 8, 8, 3), dtype=np.uint8)
+    eo = np.zeros((3, 12, 12, 2), dtype=np.uint8)
+    for axis in range(3):
+        for j in range(8):
+            on_axis = [_axis(n) for n in _CORNER_STICKERS[j]].index(axis)
+            for p in range(8):
+                k = [_axis(n) for n in _CORNER_STICKERS[p]].index(axis)
+                for o in range(3):
+                    co[axis, j, p, o] = (k + o - on_axis) % 3
+        for j in range(12):
+            reference = _EDGE_STICKERS[j].index(_edge_stickers(EDGES[j], axis)[0])
+            for p in range(12):
+                k = _EDGE_STICKERS[p].index(_edge_stickers(EDGES[p], axis)[0])
+                for o in range(2):
+                    eo[axis, j, p, o] = (k + o - reference) % 2
+    return co, eo
+
+
+_CO_ON_AXIS, _EO_ON_AXIS = _axis_tables()
+# Edges of the slice between each axis's faces
+_SLICE = np.array(
+    [[_position(e)[axis] == 0 for e in EDGES] for axis in range(3)], dtype=bool
+)
+
+
+class Cube:
+    """
+    Positions of many cubes, as NumPy arrays with one row per cube: the piece in
+    each corner, edge and center slot (see CORNERS, EDGES and CENTERS), and the
+    orientation of the corners (on the UD axis) and edges (on the FB axis).
+    Centers are only moved by slice moves, wide moves and rotations, and the
+    orientation checks are relative to the slots, not the centers.
+    """
+
+    def __init__(
+        self,
+        cp: np.ndarray,
+        co: np.ndarray,
+        ep: np.ndarray,
+        eo: np.ndarray,
+        centers: np.ndarray,
+    ):
+        self.cp = cp
+        self.co = co
+        self.ep = ep
+        self.eo = eo
+        self.centers = centers
+
+    @classmethod
+    def solved(cls, n: int = 1) -> "Cube":
+        return cls(
+            cp=np.tile(np.arange(8, dtype=np.uint8), (n, 1)),
+            co=np.zeros((n, 8), dtype=np.uint8),
+            ep=np.tile(np.arange(12, dtype=np.uint8), (n, 1)),
+            eo=np.zeros((n, 12), dtype=np.uint8),
+            centers=np.tile(np.arange(6, dtype=np.uint8), (n, 1)),
+        )
+
+    @classmethod
+    def from_codes(cls, codes: Sequence[bytes]) -> "Cube":
+        """The positions reached by each move sequence from the solved cube"""
+        cube = cls.solved(len(codes))
+        width = max((len(c) for c in codes), default=0)
+        padded = np.full((len(codes), width), NO_MOVE, dtype=np.uint8)
+        for i, c in enumerate(codes):
+            padded[i, : len(c)] = np.frombuffer(c, dtype=np.uint8)
+        for column in padded.T:
+            cube = cube.apply(column)
+        return cube
+
+    def __len__(self) -> int:
+        return len(self.cp)
+
+    def __getitem__(self, index) -> "Cube":
+        return Cube(
+            self.cp[index],
+            self.co[index],
+            self.ep[index],
+            self.eo[index],
+            self.centers[index],
+        )
+
+    def apply(self, codes: np.ndarray) -> "Cube":
+        """Each cube with one move applied, codes[i] to cube i. NO_MOVE leaves it."""
+        moves = _MOVE_INDEX[codes]
+        if len(self) <= _SMALL_BATCH:
+            return self._turned_each(moves)
+        cube = Cube(
+            np.empty_like(self.cp),
+            np.empty_like(self.co),
+            np.empty_like(self.ep),
+            np.empty_like(self.eo),
+            np.empty_like(self.centers),
+        )
+        # Gathering whole columns for each distinct move is faster than
+        # gathering each cube's pieces separately
+        for move in np.unique(moves):
+            rows = np.flatnonzero(moves == move)
+            cube._set(rows, self[rows]._turned(move))
+        return cube
+
+    def apply_codes(self, codes: bytes) -> "Cube":
+        """Each cube with the same moves applied"""
+        cube = self
+        for c in codes:
+            cube = cube._turned(_MOVE_INDEX[c])
+        return cube
+
+    def _turned(self, move: int) -> "Cube":
+        cp_from = _CP[move]
+        ep_from = _EP[move]
+        return Cube(
+            cp=self.cp[:, cp_from],
+            co=_ADD_MOD_3[self.co[:, cp_from], _CO[move]],
+            ep=self.ep[:, ep_from],
+            eo=self.eo[:, ep_from] ^ _EO[move],
+            centers=self.centers[:, _CENTERS[move]],
+        )
+
+    def _turned_each(self, moves: np.ndarray) -> "Cube":
+        """Each cube turned by its own move, gathering each cube's pieces"""
+        cp_from = _CP[moves]
+        ep_from = _EP[moves]
+        return Cube(
+            cp=np.take_along_axis(self.cp, cp_from, axis=1),
+            co=_ADD_MOD_3[np.take_along_axis(self.co, cp_from, axis=1), _CO[moves]],
+            ep=np.take_along_axis(self.ep, ep_from, axis=1),
+            eo=np.take_along_axis(self.eo, ep_from, axis=1) ^ _EO[moves],
+            centers=np.take_along_axis(self.centers, _CENTERS[moves], axis=1),
+        )
+
+    def then(self, other: "Cube") -> "Cube":
+        """
+        Each cube followed by the moves that take the solved cube to other,
+        which has one cube, or one for each cube
+        """
+
+        def gather(pieces: np.ndarray, slots: np.ndarray) -> np.ndarray:
+            slots = np.broadcast_to(slots, pieces.shape).astype(np.intp)
+            return np.take_along_axis(pieces, slots, axis=1)
+
+        return Cube(
+            cp=gather(self.cp, other.cp),
+            co=_ADD_MOD_3[gather(self.co, other.cp), other.co],
+            ep=gather(self.ep, other.ep),
+            eo=gather(self.eo, other.ep) ^ other.eo,
+            centers=gather(self.centers, other.centers),
+        )
+
+    def inverse(self) -> "Cube":
+        """The positions reached by the inverse of the moves that reach each cube"""
+        rows = np.arange(len(self))[:, None]
+        cube = Cube(
+            np.empty_like(self.cp),
+            np.empty_like(self.co),
+            np.empty_like(self.ep),
+            np.empty_like(self.eo),
+            np.empty_like(self.centers),
+        )
+        cube.cp[rows, self.cp] = np.arange(8)
+        cube.co[rows, self.cp] = (3 - self.co) % 3
+        cube.ep[rows, self.ep] = np.arange(12)
+        cube.eo[rows, self.ep] = self.eo
+        cube.centers[rows, self.centers] = np.arange(6)
+        return cube
+
+    def _set(self, rows: np.ndarray, cube: "Cube"):
+        self.cp[rows] = cube.cp
+        self.co[rows] = cube.co
+        self.ep[rows] = cube.ep
+        self.eo[rows] = cube.eo
+        self.centers[rows] = cube.centers
+
+    def keys(self) -> List[bytes]:
+        """A key of each position, the same for cubes in the same position"""
+        packed = np.concatenate(
+            [self.cp, self.co, self.ep, self.eo, self.centers], axis=1
+        ).astype(np.uint8)
+        return [row.tobytes() for row in packed]
+
+    def is_solved(self) -> np.ndarray:
+        solved = Cube.solved()
+        return (
+            (self.cp == solved.cp).all(axis=1)
+            & (self.co == 0).all(axis=1)
+            & (self.ep == solved.ep).all(axis=1)
+            & (self.eo == 0).all(axis=1)
+            & (self.centers == solved.centers).all(axis=1)
+        )
+
+    def edge_orientation(self, axis: str) -> np.ndarray:
+        """Orientation of the edge in each slot on an axis, e.g. "fb" """
+        return _EO_ON_AXIS[AXES[axis], np.arange(12), self.ep, self.eo]
+
+    def corner_orientation(self, axis: str) -> np.ndarray:
+        """Orientation of the corner in each slot on an axis, e.g. "ud" """
+        return _CO_ON_AXIS[AXES[axis], np.arange(8), self.cp, self.co]
+
+    def has_eo(self, axis: str) -> np.ndarray:
+        """Whether each cube's edges are oriented on an axis, as for nissy's eofb"""
+        return (self.edge_orientation(axis) == 0).all(axis=1)
+
+    def has_dr(self, axis: str) -> np.ndarray:
+        """
+        Whether each cube is in domino reduction on an axis, as for nissy's drud:
+        corners oriented on the axis, edges oriented on the other axes, and the
+        slice edges between the axis's faces in that slice
+        """
+        others = [a for a in AXES if a != axis]
+        i = AXES[axis]
+        return (
+            (self.corner_orientation(axis) == 0).all(axis=1)
+            & self.has_eo(others[0])
+            & self.has_eo(others[1])
+            & (_SLICE[i][self.ep] == _SLICE[i]).all(axis=1)
+        )
@@ -0,0 +1,72 @@
+from typing import TYPE_CHECKING, Callable, Dict, Hashable, List, Tuple
+
+if TYPE_CHECKING:
+    from fmc_meta import Step
+
+
+def position_key(step: "Step") -> bytes:
+    """The same for steps that reach the same position"""
+    from fmc_meta.cube import Cube
+
+    return Cube.solved().apply_codes(step.all_codes).keys()[0]
+
+
+def _tail_key(step: "Step") -> Tuple:
+    """What the next step's move counts and NISS flags depend on, besides its moves"""
+    return (
+        step.last_on_normal,
+        step.last_on_inverse,
+        step.includes_niss,
+        len(step.codes),
+    )
+
+
+def dr_search_key(eo: "Step") -> Hashable:
+    """EOs with the same key have the same DRs"""
+    return (eo.name, position_key(eo), eo.move_count, _tail_key(eo))
+
+
+def finish_search_key(dr: "Step") -> Hashable:
+    """DRs with the same key have the same finishes"""
+    return (dr.name, position_key(dr), dr.cumulative_move_count, _tail_key(dr))
+
+
+def reparent(step: "Step", previous: "Step") -> "Step":
+    """The same moves as step, following another step"""
+    return type(step).from_codes(
+        step.name, step.codes, step.codes_on_inverse, previous=previous
+    )
+
+
+class Deduplicated:
+    """
+    Candidates grouped by the search they need, so that each search is run once,
+    on the first candidate of its group, and its results shared with the others
+    """
+
+    def __init__(self, candidates: List["Step"], key: Callable[["Step"], Hashable]):
+        self.candidates = candidates
+        self.unique: List["Step"] = []
+        self._group: List[int] = []
+        groups: Dict[Hashable, int] = {}
+        for candidate in candidates:
+            k = key(candidate)
+            if k not in groups:
+                groups[k] = len(self.unique)
+                self.unique.append(candidate)
+            self._group.append(groups[k])
+
+    @property
+    def saved(self) -> int:
+        """Searches that don't need to be run"""
+        return len(self.candidates) - len(self.unique)
+
+    def expand(self, results: List[List["Step"]]) -> List[List["Step"]]:
+        """Results of every candidate, from the results of the unique ones"""
+        expanded = []
+        for candidate, group in zip(self.candidates, self._group):
+            if candidate is self.unique[group]:
+                expanded.append(results[group])
+            else:
+                expanded.append([reparent(s, candidate) for s in results[group]])
+        return expanded
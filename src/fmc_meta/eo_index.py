@@ -0,0 +1,234 @@
+from typing import Dict, List, Optional, Tuple
+import functools
+import os
+from os import path
+
+import numpy as np
+
+from fmc_meta import EO_AXES, Step, cache_dir
+from fmc_meta.cube import Cube
+from fmc_meta.moves import INVERSE_CODES, NO_MOVE, invert_codes
+
+# Faces whose quarter turns change the edge orientation of each step's axis
+_AXIS_FACES = {"eofb": (4, 5), "eorl": (2, 3), "eoud": (0, 1)}
+# 2^11 orientations: the last edge's follows from the others
+STATES = 2048
+# Face turns: U, U2, U', D, ... B'
+_FACE_MOVES = 18
+_INVERSE = np.frombuffer(INVERSE_CODES[:_FACE_MOVES], dtype=np.uint8)
+_HEADER = 4
+
+
+def default_path() -> str:
+    return path.join(cache_dir(), "eo-index.npy")
+
+
+def _sequences(max_length: int) -> List[np.ndarray]:
+    """
+    Move sequences of each length up to max_length, one per row, as nissy
+    searches them: no two turns of the same face in a row, and turns of
+    opposite faces in one order only (U before D, R before L, F before B)
+    """
+    levels = [np.zeros((1, 0), dtype=np.uint8)]
+    for length in range(1, max_length + 1):
+        previous = levels[-1]
+        rows = []
+        for move in range(_FACE_MOVES):
+            if length == 1:
+                allowed = np.ones(1, dtype=bool)
+            else:
+                face, last = move // 3, previous[:, -1] // 3
+                allowed = (last != face) & ~((last // 2 == face // 2) & (face < last))
+            prefix = previous[allowed]
+            rows.append(
+                np.hstack([prefix, np.full((len(prefix), 1), move, dtype=np.uint8)])
+            )
+        levels.append(np.vstack(rows))
+    return levels
+
+
+def _valid_endings(sequences: np.ndarray, axis_step: str) -> np.ndarray:
+    """
+    Whether each sequence can be one side of an EO solution: nissy only prints
+    solutions whose last move on each side is a clockwise quarter turn (F rather
+    than F' or F2, which reach the same EO), as is the move before it if the two
+    commute. A last move that doesn't change the EO would make a longer copy of
+    a shorter solution.
+    """
+    if sequences.shape[1] == 0:
+        return np.ones(len(sequences), dtype=bool)
+    last = sequences[:, -1]
+    valid = np.isin(last // 3, _AXIS_FACES[axis_step]) & (last % 3 == 0)
+    if sequences.shape[1] > 1:
+        second = sequences[:, -2]
+        commute = second // 6 == last // 6
+        valid &= ~commute | (second % 3 == 0)
+    return valid
+
+
+def _states(cube: Cube, axis_step: str) -> np.ndarray:
+    """Index of the edge orientation of each cube on the step's axis"""
+    orientation = cube.edge_orientation(axis_step[2:])[:, :11].astype(np.int64)
+    return orientation @ (1 << np.arange(11))
+
+
+class EOIndex:
+    """
+    EO solutions of every edge orientation on each axis, up to max_length
+    moves, as nissy finds them: each row of the table of an axis is a solution,
+    padded with NO_MOVE, sorted by the orientation it solves and then by length.
+    The tables are in the order of EO_AXES, and offsets[axis][state] is the
+    first row of a state's solutions.
+    Stored as a single NumPy array, so that it can be memory-mapped.
+    """
+
+    def __init__(self, max_length: int, offsets: np.ndarray, rows: np.ndarray):
+        self.max_length = max_length
+        self.offsets = offsets
+        self.rows = rows
+
+    @classmethod
+    def build(cls, max_length: int) -> "EOIndex":
+        tables: Dict[str, List[Tuple[np.ndarray, np.ndarray]]] = {
+            a: [] for a in EO_AXES
+        }
+        for sequences in _sequences(max_length)[1:]:
+            for axis_step in EO_AXES:
+                solutions = sequences[_valid_endings(sequences, axis_step)]
+                # A solution solves the orientation of its inverse
+                cube = Cube.solved(len(solutions))
+                for column in _INVERSE[solutions[:, ::-1]].T:
+                    cube = cube.apply(column)
+                tables[axis_step].append((_states(cube, axis_step), solutions))
+        offsets = np.zeros((len(EO_AXES), STATES + 1), dtype=np.uint32)
+        rows = []
+        start = 0
+        for i, axis_step in enumerate(EO_AXES):
+            states = np.concatenate([s for s, _ in tables[axis_step]])
+            padded = np.vstack(
+                [
+                    np.pad(
+                        solutions,
+                        ((0, 0), (0, max_length - solutions.shape[1])),
+                        constant_values=NO_MOVE,
+                    )
+                    for _, solutions in tables[axis_step]
+                ]
+            )
+            # Stable, so that solutions of a state stay in order of length
+            order = np.argsort(states, kind="stable")
+            offsets[i] = start + np.searchsorted(states[order], np.arange(STATES + 1))
+            rows.append(padded[order])
+            start += len(order)
+        return cls(max_length, offsets, np.vstack(rows))
+
+    def save(self, file: str):
+        header = np.array([self.max_length, 0, 0, 0], dtype=np.uint8)
+        data = np.concatenate(
+            [
+                header,
+                self.offsets.astype("<u4").reshape(-1).view(np.uint8),
+                self.rows.reshape(-1),
+            ]
+        )
+        os.makedirs(path.dirname(path.abspath(file)), exist_ok=True)
+        # Written whole and then moved, for processes building it at once
+        temp = f"{file}.{os.getpid()}.npy"
+        np.save(temp, data)
+        os.replace(temp, file)
+
+    @classmethod
+    def load(cls, file: str) -> "EOIndex":
+        data = np.load(file, mmap_mode="r")
+        max_length = int(data[0])
+        end = _HEADER + len(EO_AXES) * (STATES + 1) * 4
+        offsets = data[_HEADER:end].view("<u4").reshape(len(EO_AXES), STATES + 1)
+        return cls(max_length, offsets, data[end:].reshape(-1, max_length))
+
+    def solutions(
+        self, axis_step: str, cube: Cube, max_length: int
+    ) -> List[List[bytes]]:
+        """Solutions of the EO of each cube on the step's axis, up to max_length moves"""
+        table = self.offsets[EO_AXES.index(axis_step)]
+        width = self.max_length
+        found = []
+        for state in _states(cube, axis_step):
+            rows = self.rows[table[state] : table[state + 1]]
+            lengths = (rows != NO_MOVE).sum(axis=1).tolist()
+            # One copy out of the mapped file, and then slices of bytes
+            data = rows.tobytes()
+            found.append(
+                [
+                    data[i * width : i * width + n]
+                    for i, n in enumerate(lengths)
+                    if n <= max_length
+                ]
+            )
+        return found
+
+
+_loaded: Dict[str, EOIndex] = {}
+
+
+@functools.lru_cache()
+def _premoves(axis_step: str, max_length: int) -> List[bytes]:
+    """Moves that can be on one side of a NISS EO solution, up to max_length of them"""
+    return [
+        bytes(s)
+        for sequences in _sequences(max_length)
+        for s in sequences[_valid_endings(sequences, axis_step)]
+    ]
+
+
+def load_index(max_length: int, file: Optional[str] = None) -> EOIndex:
+    """
+    The index in file, by default in the user's cache directory, built and
+    saved first if it is missing or doesn't go up to max_length moves
+    """
+    file = file or default_path()
+    index = _loaded.get(file)
+    if index is None and path.exists(file):
+        index = EOIndex.load(file)
+    if index is None or index.max_length < max_length:
+        index = EOIndex.build(max_length)
+        index.save(file)
+    _loaded[file] = index
+    return index
+
+
+def eo_solutions(
+    index: EOIndex,
+    axis_step: str,
+    scramble: Step,
+    max_length: int,
+    max_niss_split: Optional[int] = None,
+) -> List[Tuple[bytes, bytes]]:
+    """
+    Move codes on normal and on inverse of each EO solution of the scramble on
+    the step's axis, as from nissy's solve command with -M max_length, and
+    with -N if max_niss_split is given, keeping solutions with at most
+    max_niss_split moves on one side.
+    With NISS, each sequence of premoves up to max_niss_split moves is applied
+    to the scramble, on normal or on inverse, and the EO of the position
+    reached is looked up.
+    """
+    premoves = [b""]
+    if max_niss_split is not None:
+        premoves = _premoves(axis_step, min(max_niss_split, max_length))
+    # Moves on inverse come before the scramble, and moves on normal after it
+    premoved = Cube.from_codes([invert_codes(p) for p in premoves])
+    position = Cube.solved().apply_codes(scramble.all_codes)
+    cubes = [premoved.then(position)]
+    if max_niss_split is not None:
+        cubes.append(premoved.then(position.inverse()))
+    found = [s for cube in cubes for s in index.solutions(axis_step, cube, max_length)]
+    solutions: Dict[Tuple[bytes, bytes], None] = {}
+    for p, normal in zip(premoves, found):
+        for s in normal:
+            if s and len(s) + len(p) <= max_length:
+                solutions[(s, p)] = None
+    for p, inverse in zip(premoves, found[len(premoves) :]):
+        for s in inverse:
+            if s and len(s) + len(p) <= max_length:
+                solutions[(p, s)] = None
+    return sorted(solutions, key=lambda s: len(s[0]) + len(s[1]))
@@ -0,0 +1,222 @@
+from typing import TYPE_CHECKING, Callable, Iterable, List, NamedTuple, Optional, Tuple
+from abc import ABC, abstractmethod
+import concurrent.futures
+import os
+import threading
+
+import fmc_meta
+
+if TYPE_CHECKING:
+    import multiprocessing.managers
+
+KINDS = ["inline", "thread", "process"]
+
+
+class ExecutionContext(ABC):
+    """
+    Runs the tasks of attempts: each stage maps a task over its candidates, and
+    pipelined attempts submit tasks one at a time. Tasks mostly wait on nissy,
+    so concurrency is the number of tasks run at a time, not a number of cores.
+    Closing the context, or leaving it as a context manager, stops its workers.
+    """
+
+    kind: str
+
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+
+    @abstractmethod
+    def map(self, fn: Callable, items: Iterable) -> List:
+        """fn of each item, in order"""
+
+    @abstractmethod
+    def apply_async(
+        self,
+        fn: Callable,
+        args: Tuple = (),
+        kwds: Optional[dict] = None,
+        callback: Optional[Callable] = None,
+        error_callback: Optional[Callable] = None,
+    ):
+        """Runs fn(*args, **kwds), passing its result to callback or what it raises to error_callback"""
+
+    def shared(self) -> Tuple[list, "threading.Lock"]:
+        """A list and a lock shared by all tasks"""
+        return [], threading.Lock()
+
+    def close(self):
+        if fmc_meta._pool is self:
+            fmc_meta._pool = None
+
+    def __enter__(self) -> "ExecutionContext":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class InlineContext(ExecutionContext):
+    """Runs tasks in the calling thread, one after another"""
+
+    kind = "inline"
+
+    def __init__(self, concurrency: int = 1):
+        super().__init__(concurrency)
+
+    def map(self, fn: Callable, items: Iterable) -> List:
+        return [fn(i) for i in items]
+
+    def apply_async(self, fn, args=(), kwds=None, callback=None, error_callback=None):
+        try:
+            result = fn(*args, **(kwds or {}))
+        except Exception as e:
+            if error_callback:
+                error_callback(e)
+            return
+        if callback:
+            callback(result)
+
+
+class ThreadContext(ExecutionContext):
+    """
+    Runs tasks on threads of this process. Steps are shared rather than
+    copied, and nothing is pickled.
+    """
+
+    kind = "thread"
+
+    def __init__(self, concurrency: int):
+        super().__init__(concurrency)
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="fmc-meta"
+        )
+
+    def map(self, fn: Callable, items: Iterable) -> List:
+        return list(self._executor.map(fn, items))
+
+    def apply_async(self, fn, args=(), kwds=None, callback=None, error_callback=None):
+        def done(future: concurrent.futures.Future):
+            if future.cancelled():
+                return
+            e = future.exception()
+            if e is None:
+                if callback:
+                    callback(future.result())
+            elif error_callback:
+                error_callback(e)
+
+        self._executor.submit(fn, *args, **(kwds or {})).add_done_callback(done)
+
+    def close(self):
+        self._executor.shutdown(cancel_futures=True)
+        super().close()
+
+
+class _Follows(NamedTuple):
+    """A step following its task's first argument, which the caller already has"""
+
+    name: str
+    codes: bytes
+    codes_on_inverse: bytes
+
+
+class _Detached:
+    """
+    A task run in another process, whose steps following its first argument are
+    sent back as their move codes only, instead of with copies of the steps
+    before them
+    """
+
+    def __init__(self, fn: Callable):
+        self.fn = fn
+
+    def __call__(self, *args, **kwargs):
+        result = self.fn(*args, **kwargs)
+        if args and isinstance(args[0], fmc_meta.Step) and isinstance(result, list):
+            # In place, to keep the type and attributes of list subclasses
+            result[:] = [
+                (
+                    _Follows(s.name, s.codes, s.codes_on_inverse)
+                    if getattr(s, "previous", None) is args[0]
+                    else s
+                )
+                for s in result
+            ]
+        return result
+
+
+def _attach(result, previous):
+    if isinstance(result, list):
+        result[:] = [
+            (
+                fmc_meta.Step.from_codes(*s, previous=previous)
+                if isinstance(s, _Follows)
+                else s
+            )
+            for s in result
+        ]
+    return result
+
+
+class ProcessContext(ExecutionContext):
+    """
+    Runs tasks in a pool of worker processes. Candidate steps are sent to the
+    workers as their move codes (see Step.__reduce__), and found steps are sent
+    back without the steps before them.
+    """
+
+    kind = "process"
+
+    def __init__(self, concurrency: int):
+        import multiprocessing
+
+        super().__init__(concurrency)
+        self._pool = multiprocessing.Pool(processes=concurrency)
+        self._manager: Optional["multiprocessing.managers.SyncManager"] = None
+
+    def map(self, fn: Callable, items: Iterable) -> List:
+        items = list(items)
+        found = self._pool.map(_Detached(fn), items)
+        return [_attach(r, item) for r, item in zip(found, items)]
+
+    def apply_async(self, fn, args=(), kwds=None, callback=None, error_callback=None):
+        previous = args[0] if args else None
+        self._pool.apply_async(
+            _Detached(fn),
+            args,
+            kwds or {},
+            callback=callback and (lambda result: callback(_attach(result, previous))),
+            error_callback=error_callback,
+        )
+
+    def shared(self):
+        import multiprocessing
+
+        if self._manager is None:
+            self._manager = multiprocessing.Manager()
+        return self._manager.list(), self._manager.Lock()
+
+    def close(self):
+        self._pool.terminate()
+        self._pool.join()
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+        super().close()
+
+
+def create_context(
+    kind: str = "process", concurrency: Optional[int] = None
+) -> ExecutionContext:
+    """
+    An execution context of a kind in KINDS, running concurrency tasks at a
+    time, by default one per core
+    """
+    concurrency = concurrency or os.cpu_count() or 1
+    if kind == "inline":
+        return InlineContext(concurrency)
+    if kind == "thread":
+        return ThreadContext(concurrency)
+    if kind == "process":
+        return ProcessContext(concurrency)
+    raise ValueError(f"Unknown execution context '{kind}', expected one of {KINDS}")
@@ -1,33 +1,48 @@
-from typing import List, Tuple, Optional, Dict
-import multiprocessing
+from typing import TYPE_CHECKING, List, Tuple, Optional, Dict
+import os
 from os import path
 import re
-import subprocess
 import json
 
-from pyhocon import ConfigFactory, ConfigTree  # type: ignore
-from pydantic import BaseModel
 import click
 
 import fmc_meta
-from fmc_meta import Step, Meta, MoveCountHistogram, strategies
 
-config = ConfigFactory.parse_file(path.join(path.dirname(__file__), "meta.conf"))
+if TYPE_CHECKING:
+    from fmc_meta import Meta, SolutionSet
 
-
-class SolutionSet(BaseModel):
-    scramble: Step
-    eos: List[Step]
-    drs: List[Step]
-    finishes: List[Step]
+# Everything else is imported by the commands that need it, so that listing
+# metas, showing their options and shell completion start quickly
+META_CONF = path.join(path.dirname(__file__), "meta.conf")
+# What the compiled form of meta.conf is built from
+_COMPILED_FROM = [
+    META_CONF,
+    *(
+        path.join(path.dirname(__file__), f)
+        for f in ("__init__.py", "models.py", "strategies.py")
+    ),
+]
 
 
 def attempt(
-    meta: Meta,
+    meta: "Meta",
     scramble_moves: List[str],
-) -> SolutionSet:
-    if fmc_meta._pool is None:
-        fmc_meta._pool = multiprocessing.Pool(processes=multiprocessing.cpu_count())
+    pipelined: bool = False,
+    top: Optional[int] = None,
+    snapshot: Optional[str] = None,
+) -> "SolutionSet":
+    """
+    If top is given, only the first top finishes are guaranteed to be found.
+    If snapshot is given, all candidates found are saved to that file, and
+    searches already saved there for the same scramble and search settings
+    are reused. The stages then run one after another.
+    If the meta has adaptive strategies or a budget, candidates are expanded by
+    an AdaptiveAttempt instead, and snapshot and pipelined are ignored.
+    """
+    from fmc_meta import Step, MoveCountHistogram, SolutionSet
+    from fmc_meta.adaptive import AdaptiveAttempt, is_adaptive
+    from fmc_meta.pipeline import Pipeline
+    from fmc_meta.snapshot import Snapshot
 
     solutions = SolutionSet(
         scramble=Step(name="scramble", moves=scramble_moves),
@@ -37,6 +52,22 @@ def attempt(
     )
 
     print("Looking for EOs")
+    if is_adaptive(meta):
+        solutions.eos, solutions.drs, solutions.finishes = AdaptiveAttempt(
+            meta, solutions.scramble, top
+        ).run()
+        return solutions
+    if snapshot:
+        solutions.eos, solutions.drs, solutions.finishes = Snapshot(snapshot).run(
+            meta, solutions.scramble, top=top
+        )
+        return solutions
+    if pipelined:
+        solutions.eos, solutions.drs, solutions.finishes = Pipeline(
+            meta, solutions.scramble, slots=fmc_meta.context().concurrency, top=top
+        ).run()
+        return solutions
+
     solutions.eos = meta.eo.find_eos(solutions.scramble)
 
     print(
@@ -46,7 +77,7 @@ def attempt(
     print(
         f"Looking for finishes on {len(solutions.drs)} DRs: {MoveCountHistogram(steps=solutions.drs)}"
     )
-    solutions.finishes = meta.finish.drs_to_finishes(solutions.drs)
+    solutions.finishes = meta.finish.drs_to_finishes(solutions.drs, top=top)
     return solutions
 
 
@@ -58,27 +89,23 @@ def run():
 @run.command(help="List pre-configured metas")
 def list():
     print("Available metas:\n")
-    for name, _ in config["options"].items():
-        meta = load_meta(name)
+    for name, compiled in compiled_config()["metas"].items():
         print(f"{name}:")
-        print(f"  EO: {meta.eo.description()}")
-        print(f"  DR: {meta.dr.description()}")
-        print(f"  Finish: {meta.finish.description()}")
+        for label, description in compiled["description"]:
+            print(f"  {label}: {description}")
 
 
 @run.command(help="Show command-line options for pre-configured meta")
 @click.argument("meta")
 def show_options(meta):
-    m = load_meta(meta)
+    compiled = compiled_config()["metas"].get(meta)
+    groups = compiled["options"] if compiled else meta_options(load_meta(meta))
     print(f"Config options for {meta}:")
-    for name, field in m.eo.model_fields.items():
-        print(f"  --eo.{name}={field.default}\n    {field.description or ''}")
-    print("")
-    for name, field in m.dr.model_fields.items():
-        print(f"  --dr.{name}={field.default}\n    {field.description or ''}")
-    print("")
-    for name, field in m.finish.model_fields.items():
-        print(f"  --finish.{name}={field.default}\n    {field.description or ''}")
+    for i, group in enumerate(groups):
+        if i:
+            print("")
+        for option, description in group:
+            print(f"  {option}\n    {description}")
 
 
 def parse_overrides(ctx):
@@ -106,6 +133,7 @@ def dump(ctx, meta):
         "dr": the_meta.dr.model_dump() | {"class": the_meta.dr.__class__.__name__},
         "finish": the_meta.finish.model_dump()
         | {"class": the_meta.finish.__class__.__name__},
+        "budget": the_meta.budget.model_dump(),
     }
     print(json.dumps(dump, indent=2))
 
@@ -119,24 +147,125 @@ def dump(ctx, meta):
 )
 @click.option("--meta", required=True, help="Meta strategy name")
 @click.option("--top", type=int, default=3, help="Show this many solutions")
+@click.option("--cache", help="Cache nissy results in this file")
+@click.option(
+    "--cache-size", type=int, default=256, help="Maximum cache size in megabytes"
+)
+@click.option(
+    "--finish-cache",
+    help="Cache finishes in this file, shared by DRs that are the same up to "
+    "symmetry. Uses --cache-size too",
+)
+@click.option(
+    "--persistent-nissy",
+    is_flag=True,
+    help="Keep nissy running between searches instead of starting it for each search",
+)
+@click.option(
+    "--pipelined",
+    is_flag=True,
+    help="Start DR and finish searches before the previous stage has finished",
+)
+@click.option(
+    "--executor",
+    type=click.Choice(["process", "thread"]),
+    default="process",
+    help="Run searches in worker processes or in threads of this process",
+)
+@click.option(
+    "--concurrency",
+    type=int,
+    help="Number of searches to run at a time. Default is one per core. Searches "
+    "mostly wait on nissy, so more than that can help with --executor thread",
+)
+@click.option(
+    "--bound",
+    is_flag=True,
+    help="Skip or shorten finish searches that can't improve the top solutions",
+)
+@click.option(
+    "--profile",
+    help="Write a trace of stage, pool task and nissy call timings to this file "
+    "(JSON lines), and print a summary",
+)
+@click.option(
+    "--record",
+    help="Record the output of every nissy search in this file, for --replay",
+)
+@click.option(
+    "--replay",
+    help="Replay nissy output recorded with --record instead of running nissy",
+)
+@click.option(
+    "--snapshot",
+    help="Save all EOs, DRs and finishes found in this file, and reuse them when "
+    "solving the same scramble with different retain, prefer_axis_diversity or seed",
+)
+@click.option(
+    "--max-seconds",
+    type=float,
+    help="Stop after this many seconds, keeping the best solutions found so far. "
+    "Same as --budget.total.seconds",
+)
+@click.option(
+    "--max-searches",
+    type=int,
+    help="Stop after this many nissy searches, keeping the best solutions found "
+    "so far. Same as --budget.total.searches",
+)
 @click.pass_context
-def solve(ctx, meta, top):
+def solve(
+    ctx,
+    meta,
+    top,
+    cache,
+    cache_size,
+    finish_cache,
+    persistent_nissy,
+    pipelined,
+    executor,
+    concurrency,
+    bound,
+    profile,
+    record,
+    replay,
+    snapshot,
+    max_seconds,
+    max_searches,
+):
+    from fmc_meta.adaptive import is_adaptive
+    from fmc_meta.execution import create_context
+
     the_meta = load_meta(meta, parse_overrides(ctx))
+    use_cache(cache, cache_size, finish_cache)
+    use_profiler(profile)
+    use_backend(persistent_nissy, record, replay, sessions_for(executor, concurrency))
     scramble = next((a for a in ctx.args if not a.startswith("--")), None)
     if not scramble:
         print("Missing scramble")
         exit(1)
 
+    if max_seconds is not None:
+        the_meta.budget.total.seconds = max_seconds
+    if max_searches is not None:
+        the_meta.budget.total.searches = max_searches
     print(f"Using meta={meta}")
     print(f"Scramble: {scramble}")
-    solution_set = attempt(
-        meta=the_meta,
-        scramble_moves=scramble.split(" "),
-    )
+    with fmc_meta.use_context(create_context(executor, concurrency)):
+        solution_set = attempt(
+            meta=the_meta,
+            scramble_moves=scramble.split(" "),
+            pipelined=pipelined,
+            # Adaptive attempts stop expanding candidates that can't improve the top solutions
+            top=top if bound or is_adaptive(the_meta) else None,
+            snapshot=snapshot,
+        )
     for sol in solution_set.finishes[:top]:
         print("")
         for step in sol.from_beginning():
             print(f"{step} // {step.name} ({step.cumulative_move_count})")
+    report_cache()
+    report_profile()
 
 
 @run.command(help="Compare two metas on a set of random scrambles")
@@ -144,65 +273,448 @@ def solve(ctx, meta, top):
 @click.option(
     "--report", help="File to contain the comparison report (Markdown format)"
 )
+@click.option(
+    "--scrambles",
+    help="File of scrambles to compare on, one per line. "
+    "Default is to generate random scrambles and save them next to the report",
+)
+@click.option(
+    "--checkpoint",
+    help="File to record finished scrambles in, so that an interrupted comparison "
+    "can be resumed. Default is the report file name with a .jsonl suffix",
+)
+@click.option(
+    "--processes",
+    type=int,
+    default=os.cpu_count(),
+    help="Number of scrambles to solve in parallel. "
+    "With 1, each scramble uses all cores for its own searches",
+)
+@click.option("--cache", help="Cache nissy results in this file")
+@click.option(
+    "--cache-size", type=int, default=256, help="Maximum cache size in megabytes"
+)
+@click.option(
+    "--finish-cache",
+    help="Cache finishes in this file, shared by DRs that are the same up to "
+    "symmetry. Uses --cache-size too",
+)
+@click.option(
+    "--persistent-nissy",
+    is_flag=True,
+    help="Keep nissy running between searches instead of starting it for each search",
+)
+@click.option(
+    "--pipelined",
+    is_flag=True,
+    help="Start DR and finish searches before the previous stage has finished",
+)
+@click.option(
+    "--executor",
+    type=click.Choice(["process", "thread"]),
+    default="process",
+    help="Run searches in worker processes or in threads of this process",
+)
+@click.option(
+    "--concurrency",
+    type=int,
+    help="Number of searches to run at a time. Default is one per core. Searches "
+    "mostly wait on nissy, so more than that can help with --executor thread",
+)
+@click.option(
+    "--bound",
+    is_flag=True,
+    help="Skip or shorten finish searches that can't improve the top solutions",
+)
+@click.option(
+    "--profile",
+    help="Write a trace of stage, pool task and nissy call timings to this file "
+    "(JSON lines), and print a summary",
+)
+@click.option(
+    "--record",
+    help="Record the output of every nissy search in this file, for --replay",
+)
+@click.option(
+    "--replay",
+    help="Replay nissy output recorded with --record instead of running nissy",
+)
+@click.option(
+    "--batch-size",
+    type=int,
+    help="Solve all scrambles together, a stage at a time, sending up to this "
+    "many searches to each nissy process. --processes, --pipelined and --bound "
+    "are ignored",
+)
 @click.argument("meta1", nargs=1)
 @click.argument("meta2", nargs=1)
-def compare(n: int, report, meta1, meta2):
-    m1 = load_meta(meta1)
-    m2 = load_meta(meta2)
+def compare(
+    n: int,
+    report,
+    scrambles,
+    checkpoint,
+    processes,
+    cache,
+    cache_size,
+    finish_cache,
+    persistent_nissy,
+    pipelined,
+    executor,
+    concurrency,
+    bound,
+    profile,
+    record,
+    replay,
+    batch_size,
+    meta1,
+    meta2,
+):
+    from fmc_meta import batch
+
+    from fmc_meta.adaptive import is_adaptive
+    from fmc_meta.execution import create_context
+
+    metas = {meta1: load_meta(meta1), meta2: load_meta(meta2)}
+    if batch_size and any(is_adaptive(m) for m in metas.values()):
+        print("--batch-size can't be used with adaptive metas or budgets")
+        exit(1)
+    # Batched searches read their whole output, up to the longest finish
+    if batch_size and any(
+        getattr(m.finish, "single_pass", False) for m in metas.values()
+    ):
+        print("--batch-size can't be used with single-pass finishes")
+        exit(1)
+    use_cache(cache, cache_size, finish_cache)
+    use_profiler(profile)
+    # With more than one process, each runs the searches of its own attempts
+    if processes > 1 and not batch_size:
+        executor = "inline"
+    use_backend(persistent_nissy, record, replay, sessions_for(executor, concurrency))
 
-    with open(report, "w") as report:
-        report.write(
-            f"|scramble|{meta1} result|{meta2} result|winner|tie-break winner|\n"
+    base = path.splitext(report)[0]
+    if scrambles:
+        scramble_strs = batch.read_scrambles(scrambles)
+    elif path.exists(f"{base}.scrambles"):
+        # Resuming an earlier comparison
+        scramble_strs = batch.read_scrambles(f"{base}.scrambles")
+    elif n is None:
+        print("Missing --n or --scrambles")
+        exit(1)
+    else:
+        scramble_strs = batch.generate_scrambles(n, f"{base}.scrambles")
+    if n is not None:
+        if len(scramble_strs) < n:
+            print(
+                f"Only {len(scramble_strs)} scrambles to compare on, fewer than --n {n}"
+            )
+        scramble_strs = scramble_strs[:n]
+
+    done = batch.Checkpoint(checkpoint or f"{base}.jsonl")
+    done.check_scrambles(scramble_strs)
+    jobs = [
+        batch.Job(index=i, scramble=s, meta=m)
+        for i, s in enumerate(scramble_strs)
+        for m in metas
+    ]
+    jobs = [j for j in jobs if not done.is_done(j)]
+    if len(jobs) < len(scramble_strs) * len(metas):
+        print(f"Resuming with {len(jobs)} of {len(scramble_strs) * len(metas)} left")
+
+    with fmc_meta.use_context(create_context(executor, concurrency)):
+        if batch_size:
+            results = batch.run_batched(jobs, metas, batch_size)
+        else:
+            results = batch.run_jobs(
+                jobs, metas, processes, pipelined, top=3 if bound else None
+            )
+        for job, scores in results:
+            done.record(job, scores)
+            scores_str = "/".join(str(s) for s in scores)
+            print(f"{job.meta} found solutions in {scores_str} on {job.scramble}")
+    batch.write_report(report, scramble_strs, done, meta1, meta2)
+    report_cache()
+    report_profile()
+
+
+@run.command(help="Benchmark metas on a pinned corpus of scrambles")
+@click.option("--n", type=int, default=20, help="Number of scrambles")
+@click.option(
+    "--meta",
+    "meta_names",
+    multiple=True,
+    help="Meta to benchmark, can be repeated. Default is every pre-configured meta",
+)
+@click.option(
+    "--processes",
+    type=int,
+    default=1,
+    help="Number of pool workers. With 1, searches run in this process",
+)
+@click.option(
+    "--record",
+    help="Record the output of every nissy search in this file, for --replay",
+)
+@click.option(
+    "--replay",
+    help="Replay nissy output recorded with --record instead of running nissy, "
+    "to benchmark the Python side alone",
+)
+@click.option("--baseline", help="Report regressions from results saved in this file")
+@click.option("--save", help="Save the results in this file, for use as a baseline")
+@click.option(
+    "--tolerance",
+    type=float,
+    default=0.1,
+    help="Slow-down from the baseline to report as a regression",
+)
+def benchmark(n, meta_names, processes, record, replay, baseline, save, tolerance):
+    from fmc_meta import benchmark as bench
+
+    use_backend(False, record, replay)
+    scrambles = bench.corpus(n)
+    results = []
+    for name in meta_names or compiled_config()["metas"]:
+        print(f"Benchmarking {name} on {n} scrambles")
+        results.append(bench.run_benchmark(name, load_meta(name), scrambles, processes))
+    print("")
+    print(bench.format_results(results))
+    if save:
+        bench.save_results(save, results, replay)
+    if baseline:
+        with open(baseline) as f:
+            regressions = bench.compare_to_baseline(
+                results, json.load(f), tolerance, bench.peak_rss_mb()
+            )
+        if regressions:
+            print("\nRegressions from baseline:")
+            for r in regressions:
+                print(f"  {r}")
+            exit(1)
+        print("\nNo regressions from baseline")
+
+
+@run.command(help="Build the index of EO solutions used by --eo.use_index")
+@click.option("--max-length", type=int, default=5, help="Longest EO solutions to index")
+@click.option(
+    "--check",
+    type=int,
+    default=0,
+    help="Compare lookups with nissy's solutions on this many scrambles",
+)
+def build_eo_index(max_length, check):
+    from fmc_meta import Step, nissy_solutions
+    from fmc_meta.benchmark import corpus
+    from fmc_meta.eo_index import EOIndex, default_path, eo_solutions
+
+    index = EOIndex.build(max_length)
+    index.save(default_path())
+    print(f"Saved {len(index.rows)} EO solutions in {default_path()}")
+    mismatches = 0
+    for scramble_str in corpus(check):
+        scramble = Step(name="scramble", moves=scramble_str.split(" "))
+        for axis_step in fmc_meta.EO_AXES:
+            found = set(eo_solutions(index, axis_step, scramble, max_length, 1))
+            searched = set(
+                s
+                for s in nissy_solutions(axis_step, scramble, "-M", max_length, "-N")
+                if min(len(s[0]), len(s[1])) <= 1
+            )
+            if found != searched:
+                mismatches += 1
+                print(
+                    f"{axis_step} on {scramble_str}: {len(found - searched)} "
+                    f"not from nissy, {len(searched - found)} missing"
+                )
+    if check:
+        print(f"{mismatches} mismatches in {check * len(fmc_meta.EO_AXES)} searches")
+        if mismatches:
+            exit(1)
+
+
+_cache_stats_at_start = None
+
+
+_finish_stats_at_start = None
+
+
+def use_cache(
+    cache_path: Optional[str], cache_size: int, finish_cache: Optional[str] = None
+):
+    global _cache_stats_at_start, _finish_stats_at_start
+    from fmc_meta.cache import FinishCache, NissyCache
+
+    if cache_path:
+        fmc_meta._cache = NissyCache(cache_path, max_size=cache_size * 1024 * 1024)
+        _cache_stats_at_start = fmc_meta._cache.stats()
+    if finish_cache:
+        fmc_meta._finish_cache = FinishCache(
+            finish_cache, max_size=cache_size * 1024 * 1024
+        )
+        _finish_stats_at_start = fmc_meta._finish_cache.stats()
+
+
+def report_cache():
+    if fmc_meta._cache:
+        stats = fmc_meta._cache.stats()
+        print(f"\nnissy cache: {stats - _cache_stats_at_start}")
+        print(f"  {stats.entries} entries, {stats.size / 1024 / 1024:.1f} MB")
+    if fmc_meta._finish_cache:
+        stats = fmc_meta._finish_cache.stats()
+        print(f"\nfinish cache: {stats - _finish_stats_at_start}")
+        print(f"  {stats.entries} positions, {stats.size / 1024 / 1024:.1f} MB")
+
+
+def sessions_for(executor: str, concurrency: Optional[int]) -> int:
+    """nissy sessions each process needs to run its share of the searches"""
+    return (concurrency or os.cpu_count() or 1) if executor == "thread" else 1
+
+
+def use_backend(
+    persistent_nissy: bool,
+    record: Optional[str],
+    replay: Optional[str],
+    sessions: int = 1,
+):
+    from fmc_meta.backend import NissyArchive, RecordingBackend, ReplayBackend
+
+    if replay:
+        fmc_meta._backend = ReplayBackend(NissyArchive(replay))
+        return
+    if persistent_nissy:
+        fmc_meta.use_sessions(size=sessions)
+    if record:
+        fmc_meta._backend = RecordingBackend(fmc_meta.backend(), NissyArchive(record))
+
+
+def use_profiler(profile_path: Optional[str]):
+    from fmc_meta.profiling import Profiler
+
+    if profile_path:
+        fmc_meta._profiler = Profiler(profile_path)
+
+
+def report_profile():
+    from fmc_meta.profiling import format_summary, summarize
+
+    if fmc_meta._profiler:
+        print(f"\nProfile written to {fmc_meta._profiler.path}")
+        print(format_summary(summarize(fmc_meta._profiler.events())))
+
+
+def compiled_path() -> str:
+    return path.join(fmc_meta.cache_dir(), "meta.json")
+
+
+def _version() -> List[List[int]]:
+    return [[os.stat(f).st_mtime_ns, os.stat(f).st_size] for f in _COMPILED_FROM]
+
+
+def compiled_config() -> Dict:
+    """
+    The pre-configured metas, with what list and show-options print for them,
+    as compiled from meta.conf. The compiled form is kept as JSON in the user's
+    cache directory, and compiled again when meta.conf or the strategies change.
+    """
+    compiled_file = compiled_path()
+    version = _version()
+    try:
+        with open(compiled_file) as f:
+            compiled = json.load(f)
+        if compiled["version"] == version:
+            return compiled
+    except (OSError, ValueError, KeyError):
+        pass
+    compiled = json.dumps({"version": version, "metas": _compile()})
+    try:
+        os.makedirs(path.dirname(compiled_file), exist_ok=True)
+        with open(f"{compiled_file}.{os.getpid()}", "w") as f:
+            f.write(compiled)
+        os.replace(f"{compiled_file}.{os.getpid()}", compiled_file)
+    except OSError:
+        # Compiling again next time is only slower
+        pass
+    # The same as when it is read back
+    return json.loads(compiled)
+
+
+def _compile() -> Dict:
+    from pyhocon import ConfigFactory  # type: ignore
+
+    options = ConfigFactory.parse_file(META_CONF)["options"]
+    metas = {}
+    for name in options:
+        cfg = options[name].as_plain_ordered_dict()
+        meta = meta_from_config(cfg)
+        description = [
+            ["EO", meta.eo.description()],
+            ["DR", meta.dr.description()],
+            ["Finish", meta.finish.description()],
+        ]
+        if meta.budget.is_set():
+            description.append(["Budget", meta.budget.description()])
+        metas[name] = {
+            "config": cfg,
+            "description": description,
+            "options": meta_options(meta),
+        }
+    return metas
+
+
+def meta_options(meta):
+    """Command-line options of a meta with their descriptions, in groups"""
+    from fmc_meta.models import Budget, StageBudget
+
+    groups = [
+        [
+            (f"--{stage}.{name}={field.default}", field.description or "")
+            for name, field in fields.items()
+        ]
+        for stage, fields in (
+            ("eo", type(meta.eo).model_fields),
+            ("dr", type(meta.dr).model_fields),
+            ("finish", type(meta.finish).model_fields),
         )
-        report.write(f"|---|---|---|---|---|\n")
-        for i in range(0, n):
-            scramble_str = subprocess.check_output(
-                ["nissy", "scramble"], encoding="UTF8"
-            ).strip()
-            report.write(f"|{scramble_str}")
-            scramble_moves = scramble_str.split(" ")
-            print(f"Using {meta1} on {scramble_str}")
-            solutions1 = attempt(m1, scramble_moves)
-            scores1 = [f.cumulative_move_count for f in solutions1.finishes[:3]]
-            scores1_str = "/".join(str(s) for s in scores1)
-            print(f"{meta1} found solutions in {scores1_str}")
-            report.write(f"|{scores1_str}")
-            print(f"Using {meta2} on {scramble_str}")
-            solutions2 = attempt(m2, scramble_moves)
-            scores2 = [f.cumulative_move_count for f in solutions2.finishes[:3]]
-            scores2_str = "/".join((str(s) for s in scores2))
-            print(f"{meta2} found solutions in {scores2_str}")
-            report.write(f"|{scores2_str}")
-            winner = ""
-            if scores1 and (not scores2 or scores1[0] < scores2[0]):
-                winner = meta1
-            elif scores2 and (not scores1 or scores2[0] < scores1[0]):
-                winner = meta2
-            tie_break_winner = ""
-            if not winner and scores1 and scores2:
-                if tuple(scores1) < tuple(scores2):
-                    tie_break_winner = meta1
-                elif tuple(scores2) < tuple(scores1):
-                    tie_break_winner = meta2
-
-            report.write(f"|{winner or '-'}|{tie_break_winner or '-'}|\n")
-            report.flush()
+    ]
+    for stage in Budget.model_fields:
+        groups.append(
+            [
+                (f"--budget.{stage}.{name}=None", field.description or "")
+                for name, field in StageBudget.model_fields.items()
+            ]
+        )
+    return groups
+
+
+def meta_from_config(meta_cfg) -> "Meta":
+    from fmc_meta import Meta, strategies
+    from fmc_meta.models import Budget
+
+    eo = getattr(strategies, meta_cfg["eo"]["class"])(**meta_cfg["eo"])
+    dr = getattr(strategies, meta_cfg["dr"]["class"])(**meta_cfg["dr"])
+    finish = getattr(strategies, meta_cfg["finish"]["class"])(**meta_cfg["finish"])
+    budget = Budget(**meta_cfg.get("budget", {}))
+    return Meta(eo=eo, dr=dr, finish=finish, budget=budget)
 
 
 def load_meta(name: str, overrides: Optional[Dict] = None) -> "Meta":
     if path.exists(name):
+        from pyhocon import ConfigFactory
+
         meta_cfg = ConfigFactory.parse_file(name)
-    elif name in config["options"]:
-        meta_cfg = config["options"][name]
     else:
-        print(f"No meta named '{name}'")
-        exit(1)
+        metas = compiled_config()["metas"]
+        if name not in metas:
+            print(f"No meta named '{name}'")
+            exit(1)
+        if not overrides:
+            return meta_from_config(metas[name]["config"])
+
+        from pyhocon import ConfigFactory
+
+        meta_cfg = ConfigFactory.from_dict(metas[name]["config"])
     if overrides:
         meta_cfg = ConfigFactory.from_dict(overrides).with_fallback(meta_cfg)
-    eo = getattr(strategies, meta_cfg["eo"]["class"])(**meta_cfg["eo"])
-    dr = getattr(strategies, meta_cfg["dr"]["class"])(**meta_cfg["dr"])
-    finish = getattr(strategies, meta_cfg["finish"]["class"])(**meta_cfg["finish"])
-    return Meta(eo=eo, dr=dr, finish=finish)
+    return meta_from_config(meta_cfg)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,70 @@
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from fmc_meta import Step
+
+
+class MoveCountHistogram(BaseModel):
+    steps: List[Step]
+
+    @property
+    def counts(self) -> List[Tuple[int, int]]:
+        count: Dict[int, int] = {}
+        for s in self.steps:
+            count[s.cumulative_move_count] = count.get(s.cumulative_move_count, 0) + 1
+        rows = sorted(list(count.items()))
+        return rows
+
+    def __str__(self):
+        return " ".join(f"{n}x{m}-moves" for m, n in self.counts)
+
+
+class SolutionSet(BaseModel):
+    scramble: Step
+    eos: List[Step]
+    drs: List[Step]
+    finishes: List[Step]
+
+
+class StageBudget(BaseModel):
+    seconds: Optional[float] = Field(default=None, description="Wall-clock seconds")
+    searches: Optional[int] = Field(
+        default=None, description="nissy searches, including cached ones"
+    )
+
+    def is_set(self) -> bool:
+        return self.seconds is not None or self.searches is not None
+
+    def description(self) -> str:
+        limits = []
+        if self.seconds is not None:
+            limits.append(f"{self.seconds}s")
+        if self.searches is not None:
+            limits.append(f"{self.searches} searches")
+        return " or ".join(limits)
+
+
+class Budget(BaseModel):
+    """
+    Effort allowed for DR searches, finish searches and the whole attempt.
+    The EO searches always run to the end.
+    """
+
+    dr: StageBudget = Field(default_factory=StageBudget)
+    finish: StageBudget = Field(default_factory=StageBudget)
+    total: StageBudget = Field(default_factory=StageBudget)
+
+    def is_set(self) -> bool:
+        return self.dr.is_set() or self.finish.is_set() or self.total.is_set()
+
+    def description(self) -> str:
+        return ". ".join(
+            f"{name}: {budget.description()}"
+            for name, budget in (
+                ("DR", self.dr),
+                ("Finish", self.finish),
+                ("Total", self.total),
+            )
+            if budget.is_set()
+        )
@@ -0,0 +1,37 @@
+from typing import Dict, Iterable, List
+
+# Face turns, then slice moves, wide moves and rotations, in case nissy prints them
+FACES = "UDRLFB" + "MES" + "udrlfb" + "xyz"
+MOVES = [f + suffix for f in FACES for suffix in ("", "2", "'")]
+
+# Moves are encoded as small integers: 3 * face + (0 for clockwise, 1 for half, 2 for counter-clockwise)
+CODES: Dict[str, int] = {m: i for i, m in enumerate(MOVES)}
+NO_MOVE = 255
+
+INVERSE_CODES = bytes(3 * (c // 3) + 2 - c % 3 for c in range(len(MOVES)))
+QUARTER_TURN_CODES = frozenset(c for c in range(len(MOVES)) if c % 3 != 1)
+_INVERSE_TABLE = INVERSE_CODES.ljust(256, b"\0")
+
+
+def encode(moves: Iterable[str]) -> bytes:
+    return bytes(CODES[m] for m in moves)
+
+
+def decode(codes: bytes) -> List[str]:
+    return [MOVES[c] for c in codes]
+
+
+def invert_codes(codes: bytes) -> bytes:
+    return codes[::-1].translate(_INVERSE_TABLE)
+
+
+def cancellation(a: int, b: int) -> int:
+    """
+    Number of moves saved when move a follows move b
+    """
+    if a // 3 == b // 3:
+        if INVERSE_CODES[a] == b:
+            return 2
+        else:
+            return 1
+    return 0
@@ -0,0 +1,235 @@
+from typing import Callable, Dict, Hashable, List, Optional, Set, Tuple
+import functools
+import queue
+import time
+
+import fmc_meta
+from fmc_meta import (
+    EO_AXES,
+    Step,
+    Meta,
+    MoveCountHistogram,
+    FinishBound,
+    record_stage,
+)
+from fmc_meta.dedupe import dr_search_key, finish_search_key, reparent
+
+
+class Pipeline:
+    """
+    Runs the EO, DR and finish stages of an attempt without a barrier between them.
+    Each stage's selection is only final once all of its input searches are done,
+    so work on the next stage starts as soon as its candidates are in the retained
+    set of what has been found so far. This speculative work only goes into idle
+    pool slots, and is kept if the candidate makes the final selection.
+    The final selections are the same as running the stages one after another.
+    If top is given, finish searches are bounded as in FinishStrategy.drs_to_finishes,
+    counting only finishes of DRs in the final selection.
+    As in the staged run, equivalent candidates share a single search.
+    """
+
+    def __init__(
+        self, meta: Meta, scramble: Step, slots: int, top: Optional[int] = None
+    ):
+        self.meta = meta
+        self.scramble = scramble
+        self.slots = slots
+        self.bound = FinishBound(top) if top is not None else None
+        # Finish searches started before their DR was known to be selected
+        self.speculative: Set[Hashable] = set()
+        self.completed: queue.Queue = queue.Queue()
+        self.in_flight = 0
+        self.eos_by_axis: Dict[str, List[Step]] = {}
+        # DRs by id() of their EO, and finishes by id() of their DR
+        self.drs_by_eo: Dict[int, Optional[List[Step]]] = {}
+        self.finishes_by_dr: Dict[int, Optional[List[Step]]] = {}
+        # Candidates by the key of the search they need, the first one searched
+        self.eos_by_key: Dict[Hashable, List[Step]] = {}
+        self.drs_by_key: Dict[Hashable, List[Step]] = {}
+        self.finish_keys: Dict[int, Hashable] = {}
+        self.eos: Optional[List[Step]] = None
+        self.drs: Optional[List[Step]] = None
+
+    def _submit(self, key: Tuple[str, Hashable], fn: Callable, *args, **kwargs):
+        self.in_flight += 1
+        fmc_meta.context().apply_async(
+            fmc_meta._task(key[0], fn),
+            args,
+            kwargs,
+            callback=lambda result: self.completed.put((key, result)),
+            error_callback=lambda e: self.completed.put((key, e)),
+        )
+
+    @staticmethod
+    def _share(
+        candidates: List[Step],
+        results: Dict[int, Optional[List[Step]]],
+        found: List[Step],
+    ):
+        """Results of every candidate of a search, from those of the first one"""
+        results[id(candidates[0])] = found
+        for candidate in candidates[1:]:
+            results[id(candidate)] = [reparent(s, candidate) for s in found]
+
+    def _add(
+        self,
+        candidate: Step,
+        key: Hashable,
+        by_key: Dict[Hashable, List[Step]],
+        results: Dict[int, Optional[List[Step]]],
+    ) -> bool:
+        """Whether the candidate's search is new, rather than shared"""
+        results[id(candidate)] = None
+        if key not in by_key:
+            by_key[key] = [candidate]
+            return True
+        by_key[key].append(candidate)
+        first = results[id(by_key[key][0])]
+        if first is not None:
+            self._share([by_key[key][0], candidate], results, first)
+        return False
+
+    def _submit_drs(self, eos: List[Step], required: bool):
+        for eo in eos:
+            if id(eo) not in self.drs_by_eo:
+                key = dr_search_key(eo)
+                if (
+                    key not in self.eos_by_key
+                    and not required
+                    and self.in_flight >= self.slots
+                ):
+                    return
+                if self._add(eo, key, self.eos_by_key, self.drs_by_eo):
+                    self._submit(("dr", key), self.meta.dr.find_drs_for_eo, eo)
+
+    def _submit_finishes(self, drs: List[Step], required: bool):
+        for dr in drs:
+            if id(dr) not in self.finishes_by_dr:
+                key = finish_search_key(dr)
+                if (
+                    key not in self.drs_by_key
+                    and not required
+                    and self.in_flight >= self.slots
+                ):
+                    return
+                self.finish_keys[id(dr)] = key
+                if not self._add(dr, key, self.drs_by_key, self.finishes_by_dr):
+                    if required:
+                        self._offer(dr)
+                    continue
+                dr_to_finish: Callable[[Step], List[Step]]
+                if required and self.bound:
+                    dr_to_finish = functools.partial(
+                        self.meta.finish._dr_to_finish_within, self.bound
+                    )
+                else:
+                    dr_to_finish = self.meta.finish.dr_to_finish
+                    self.speculative.add(key)
+                self._submit(("finish", key), dr_to_finish, dr)
+
+    def _known_eos(self) -> List[Step]:
+        return [s for axis in EO_AXES for s in self.eos_by_axis.get(axis, [])]
+
+    def _known_drs(self, eos: List[Step]) -> List[Step]:
+        return [dr for eo in eos for dr in self.drs_by_eo.get(id(eo)) or []]
+
+    def _schedule(self):
+        # Required work
+        if self.eos is not None:
+            self._submit_drs(self.eos, required=True)
+        if self.drs is not None:
+            self._submit_finishes(self.drs, required=True)
+        # Speculative work on what would be selected given the results so far
+        eos = self.eos
+        if eos is None:
+            eos = self.meta.eo.select_eos(self._known_eos())
+            self._submit_drs(eos, required=False)
+        if self.drs is None:
+            drs = self.meta.dr.select_drs(self._known_drs(eos))
+            self._submit_finishes(drs, required=False)
+
+    def _select(self):
+        if self.eos is None and len(self.eos_by_axis) == len(EO_AXES):
+            eos = self._known_eos()
+            print(f"Found EOs: {MoveCountHistogram(steps=eos)}")
+            self.eos = self.meta.eo.select_eos(eos)
+            record_stage("eo", self.start, found=len(eos), kept=len(self.eos))
+            print(
+                f"Looking for DRs on {len(self.eos)} EOs: {MoveCountHistogram(steps=self.eos)}"
+            )
+        if (
+            self.drs is None
+            and self.eos is not None
+            and all(self.drs_by_eo.get(id(eo)) is not None for eo in self.eos)
+        ):
+            drs = self._known_drs(self.eos)
+            print(f"Found DRs: {MoveCountHistogram(steps=drs)}")
+            self.drs = self.meta.dr.select_drs(drs)
+            saved = len(self.eos) - len({dr_search_key(eo) for eo in self.eos})
+            record_stage(
+                "dr", self.start, found=len(drs), kept=len(self.drs), saved=saved
+            )
+            print(
+                f"Looking for finishes on {len(self.drs)} DRs: {MoveCountHistogram(steps=self.drs)}"
+            )
+            for dr in self.drs:
+                self._offer(dr)
+
+    def _offer(self, dr: Step):
+        """Count the finishes of a selected DR found by a speculative search"""
+        finishes = self.finishes_by_dr.get(id(dr))
+        if (
+            self.bound
+            and finishes is not None
+            and self.finish_keys[id(dr)] in self.speculative
+        ):
+            for f in finishes:
+                self.bound.offer(f.cumulative_move_count)
+
+    def _finished(self) -> bool:
+        return self.drs is not None and all(
+            self.finishes_by_dr.get(id(dr)) is not None for dr in self.drs
+        )
+
+    def run(self) -> Tuple[List[Step], List[Step], List[Step]]:
+        """Stages are profiled from the start of the attempt, as they overlap"""
+        self.start = time.time()
+        for axis in EO_AXES:
+            self._submit(
+                ("eo", EO_AXES.index(axis)),
+                self.meta.eo.find_eos_on_axis,
+                axis,
+                scramble=self.scramble,
+            )
+        while True:
+            (stage, key), result = self.completed.get()
+            self.in_flight -= 1
+            if isinstance(result, Exception):
+                raise result
+            if stage == "eo":
+                self.eos_by_axis[EO_AXES[key]] = result
+            elif stage == "dr":
+                self._share(self.eos_by_key[key], self.drs_by_eo, result)
+            else:
+                self._share(self.drs_by_key[key], self.finishes_by_dr, result)
+                if self.drs is not None:
+                    searched = {id(dr) for dr in self.drs_by_key[key]}
+                    for dr in self.drs:
+                        if id(dr) in searched:
+                            self._offer(dr)
+            self._select()
+            if self._finished():
+                break
+            self._schedule()
+        assert self.eos is not None and self.drs is not None
+        finishes = [f for dr in self.drs for f in self.finishes_by_dr[id(dr)] or []]
+        finishes.sort(key=lambda s: s.cumulative_move_count)
+        saved = len(self.drs) - len({self.finish_keys[id(dr)] for dr in self.drs})
+        record_stage(
+            "finish",
+            self.start,
+            found=len(finishes),
+            kept=len(finishes),
+            saved=saved,
+        )
+        return self.eos, self.drs, finishes
@@ -0,0 +1,129 @@
+from typing import Callable, Dict, List, Optional
+import dataclasses
+import json
+import os
+import resource
+import threading
+import time
+
+# Stage of the task running in each thread, for tagging nissy calls
+_running = threading.local()
+
+
+def current_stage() -> Optional[str]:
+    return getattr(_running, "stage", None)
+
+
+class Profiler:
+    """
+    Trace of stages, pool tasks and nissy calls, written as one JSON object
+    per line. Pool workers append to the same file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        open(path, "w").close()
+
+    def record(self, **event):
+        event["pid"] = os.getpid()
+        with open(self.path, "a") as f:
+            f.write(json.dumps(event) + "\n")
+
+    def events(self) -> List[Dict]:
+        with open(self.path) as f:
+            return [json.loads(line) for line in f if line.endswith("\n")]
+
+
+def children_cpu_time() -> float:
+    """User and system time of this process's finished subprocesses"""
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class ProfiledTask:
+    """Pool task that records how long it waited in the queue and how long it ran"""
+
+    def __init__(self, profiler: Profiler, stage: str, fn: Callable):
+        self.profiler = profiler
+        self.stage = stage
+        self.fn = fn
+        self.submitted = time.time()
+
+    def __call__(self, *args, **kwargs):
+        start = time.time()
+        _running.stage = self.stage
+        try:
+            result = self.fn(*args, **kwargs)
+        finally:
+            _running.stage = None
+        self.profiler.record(
+            type="task",
+            stage=self.stage,
+            wait=start - self.submitted,
+            wall=time.time() - start,
+            candidates=len(result),
+        )
+        return result
+
+
+@dataclasses.dataclass
+class StageSummary:
+    stage: str
+    wall: float = 0
+    found: int = 0
+    kept: int = 0
+    saved: int = 0
+    tasks: int = 0
+    task_time: float = 0
+    wait: float = 0
+    calls: int = 0
+    cached: int = 0
+    nissy_time: float = 0
+    subprocess_time: float = 0
+    returned: int = 0
+    accepted: int = 0
+
+
+def summarize(events: List[Dict]) -> List[StageSummary]:
+    stages: Dict[str, StageSummary] = {}
+
+    def summary(stage: Optional[str]) -> StageSummary:
+        stage = stage or "other"
+        if stage not in stages:
+            stages[stage] = StageSummary(stage=stage)
+        return stages[stage]
+
+    for e in events:
+        s = summary(e.get("stage"))
+        if e["type"] == "stage":
+            s.wall += e["wall"]
+            s.found += e["found"]
+            s.kept += e["kept"]
+            s.saved += e.get("saved", 0)
+        elif e["type"] == "task":
+            s.tasks += 1
+            s.task_time += e["wall"]
+            s.wait += e["wait"]
+        elif e["type"] == "nissy":
+            s.calls += 1
+            s.cached += e["cached"]
+            s.nissy_time += e["wall"]
+            s.subprocess_time += e["subprocess"] or 0
+            s.returned += e["returned"]
+            s.accepted += e["accepted"]
+    return list(stages.values())
+
+
+def format_summary(summaries: List[StageSummary]) -> str:
+    lines = [
+        "|stage|wall s|found|kept|saved searches|tasks|task s|queue wait s"
+        "|nissy calls|cached|nissy s|subprocess cpu s|solutions|accepted|",
+        "|---|---|---|---|---|---|---|---|---|---|---|---|---|---|",
+    ]
+    for s in summaries:
+        lines.append(
+            f"|{s.stage}|{s.wall:.2f}|{s.found}|{s.kept}|{s.saved}|{s.tasks}|{s.task_time:.2f}"
+            f"|{s.wait:.2f}|{s.calls}|{s.cached}|{s.nissy_time:.2f}"
+            f"|{s.subprocess_time:.2f}|{s.returned}|{s.accepted}|"
+        )
+    return "\n".join(lines)
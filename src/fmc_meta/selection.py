@@ -0,0 +1,60 @@
+from typing import Dict, List, Sequence, Tuple
+import hashlib
+import heapq
+import itertools
+
+from fmc_meta import Step
+
+
+def tiebreak(step: Step, salt: str) -> str:
+    """Pseudo-random order of steps that are otherwise equally good"""
+    return hashlib.sha1((str(step) + salt).encode("UTF8")).hexdigest()
+
+
+def sort_order(step: Step, salt: str) -> Tuple:
+    return (
+        step.cumulative_move_count,
+        step.includes_niss,
+        step.requires_niss,
+        tiebreak(step, salt),
+    )
+
+
+def select(steps: Sequence[Step], n: int, salt: str) -> List[Step]:
+    """
+    The first n steps by sort_order, the same as sorted(steps, key=sort_order)[:n].
+    Steps are first compared on move count and NISS flags, and only those that
+    tie with another step that may be selected are hashed for the tiebreak.
+    """
+    if n <= 0:
+        return []
+    cheap = [(s.cumulative_move_count, s.includes_niss, s.requires_niss) for s in steps]
+    if len(steps) <= n:
+        candidates: Sequence[int] = range(len(steps))
+    else:
+        threshold = heapq.nsmallest(n, cheap)[-1]
+        candidates = [i for i, key in enumerate(cheap) if key <= threshold]
+    ties: Dict[Tuple, int] = {}
+    for i in candidates:
+        ties[cheap[i]] = ties.get(cheap[i], 0) + 1
+    keys = (
+        (cheap[i], tiebreak(steps[i], salt) if ties[cheap[i]] > 1 else "", i)
+        for i in candidates
+    )
+    # The index keeps steps with equal keys in their original order, as sorted() does
+    return [steps[i] for _, _, i in heapq.nsmallest(n, keys)]
+
+
+def select_per_axis(steps: Sequence[Step], n: int, salt: str) -> List[Step]:
+    """
+    The first n steps taking the best remaining step of each axis in turn,
+    with axes in order of name
+    """
+    by_axis = sorted(steps, key=lambda s: s.name)
+    selected = itertools.zip_longest(
+        *(
+            select(list(group), n, salt)
+            for _, group in itertools.groupby(by_axis, lambda s: s.name)
+        )
+    )
+    return [s for row in selected for s in row if s is not None][:n]
@@ -0,0 +1,208 @@
+from typing import List, Tuple
+import atexit
+import os
+import re
+import subprocess
+import threading
+
+PROMPT = "nissy-# "
+
+# A line of solve output: moves, parentheses for moves on inverse, or nothing
+_SOLUTION_LINE = re.compile(r"^[UDRLFB2' ()]*$")
+
+
+class SessionError(Exception):
+    pass
+
+
+class NissySession:
+    """
+    A nissy process running its interactive shell.
+    Pruning tables are loaded by the first search and stay in memory,
+    so subsequent searches only pay for the search itself.
+    """
+
+    def __init__(self, nissy_path: str):
+        self.process = subprocess.Popen(
+            [nissy_path],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            bufsize=0,
+        )
+        # Output read past the last prompt
+        self._buffer = b""
+        self._read_until_prompt()
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def _read_until_prompt(self) -> str:
+        fd = self.process.stdout.fileno()  # type: ignore[union-attr]
+        prompt = PROMPT.encode("UTF8")
+        while prompt not in self._buffer:
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                raise SessionError(
+                    f"nissy exited unexpectedly: {self._buffer.decode('UTF8')}"
+                )
+            self._buffer += chunk
+        output, _, self._buffer = self._buffer.partition(prompt)
+        return output.decode("UTF8")
+
+    @staticmethod
+    def _command(step_name: str, moves: List[str], args: List[str]) -> bytes:
+        return (" ".join(["solve", step_name, "-p"] + args + moves) + "\n").encode(
+            "UTF8"
+        )
+
+    def _write(self, commands: bytes):
+        try:
+            self.process.stdin.write(commands)  # type: ignore[union-attr]
+        except BrokenPipeError:
+            raise SessionError("nissy exited unexpectedly")
+
+    def _read_output(self) -> str:
+        output = self._read_until_prompt()
+        if not all(_SOLUTION_LINE.match(line) for line in output.split("\n")):
+            raise Exception(output)
+        return output
+
+    def solve(self, step_name: str, moves: List[str], args: List[str]) -> str:
+        self._write(self._command(step_name, moves, args))
+        return self._read_output()
+
+    def solve_many(self, searches: List[Tuple[str, List[str], List[str]]]) -> List[str]:
+        """
+        Output of each search, with all of the commands sent at once. They are
+        written from another thread, so that neither side waits on a full pipe.
+        """
+        commands = b"".join(self._command(*search) for search in searches)
+
+        def write():
+            try:
+                self._write(commands)
+            except SessionError:
+                pass  # Reading the output fails too
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            return [self._read_output() for _ in searches]
+        except BaseException:
+            # The writer may be waiting on nissy, which is waiting on us
+            self.kill()
+            raise
+        finally:
+            writer.join()
+
+    def kill(self):
+        """Kills nissy and waits for it, so that the session is no longer alive"""
+        self.process.kill()
+        self.process.wait()
+
+    def close(self):
+        if self.alive:
+            try:
+                self.process.stdin.close()  # type: ignore[union-attr]
+                self.process.wait(timeout=5)
+            except (BrokenPipeError, subprocess.TimeoutExpired):
+                self.kill()
+
+
+class NissySessionPool:
+    """
+    Long-lived nissy sessions, shared by the threads of one process.
+    Sessions are started on demand, up to size at a time, and replaced if
+    they crash. Forked processes get their own sessions rather than sharing
+    the parent's pipes.
+    """
+
+    def __init__(self, nissy_path: str, size: int = 1):
+        self.nissy_path = nissy_path
+        self.size = size
+        self._pid = 0
+        self._idle: List[NissySession] = []
+        self._started = 0
+        # Notified whenever a session is released, or a slot freed
+        self._available = threading.Condition()
+
+    def _reset_after_fork(self):
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._idle = []
+            self._started = 0
+            atexit.register(self.close)
+
+    def _acquire(self) -> NissySession:
+        with self._available:
+            self._reset_after_fork()
+            while not self._idle and self._started >= self.size:
+                self._available.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._started += 1
+        try:
+            return NissySession(self.nissy_path)
+        except BaseException:
+            # Another thread may be waiting for the slot
+            self._free_slot()
+            raise
+
+    def _free_slot(self):
+        with self._available:
+            self._started -= 1
+            self._available.notify()
+
+    def _release(self, session: NissySession):
+        if not session.alive:
+            self._free_slot()
+            return
+        with self._available:
+            self._idle.append(session)
+            self._available.notify()
+
+    def _solve_once(self, step_name: str, moves: List[str], args: List[str]) -> str:
+        session = self._acquire()
+        try:
+            return session.solve(step_name, moves, args)
+        except SessionError:
+            session.close()
+            raise
+        finally:
+            self._release(session)
+
+    def solve(self, step_name: str, moves: List[str], args: List[str]) -> str:
+        try:
+            return self._solve_once(step_name, moves, args)
+        except SessionError:
+            # The session crashed. Retry once on a fresh one
+            return self._solve_once(step_name, moves, args)
+
+    def _solve_many_once(
+        self, searches: List[Tuple[str, List[str], List[str]]]
+    ) -> List[str]:
+        session = self._acquire()
+        try:
+            return session.solve_many(searches)
+        except SessionError:
+            session.close()
+            raise
+        finally:
+            self._release(session)
+
+    def solve_many(self, searches: List[Tuple[str, List[str], List[str]]]) -> List[str]:
+        """Output of each search, all run on one session"""
+        try:
+            return self._solve_many_once(searches)
+        except SessionError:
+            return self._solve_many_once(searches)
+
+    def close(self):
+        if self._pid != os.getpid():
+            return
+        with self._available:
+            idle, self._idle = self._idle, []
+        for session in idle:
+            session.close()
@@ -0,0 +1,157 @@
+from typing import Dict, List, Optional, Tuple
+import json
+import os
+import time
+
+from fmc_meta import (
+    EO_AXES,
+    Step,
+    Meta,
+    MoveCountHistogram,
+    FinishBound,
+    record_stage,
+)
+
+# Strategy fields that only change which candidates are selected, not what is found
+SELECTION_FIELDS = {"retain", "prefer_axis_diversity", "seed", "adaptive"}
+# Strategy fields that only change how the searches are run
+EXECUTION_FIELDS = {"fan_out", "use_index", "single_pass"}
+
+
+def search_config(strategy) -> Dict:
+    """The strategy fields that its searches depend on"""
+    return strategy.model_dump(exclude=SELECTION_FIELDS | EXECUTION_FIELDS) | {
+        "class": strategy.__class__.__name__
+    }
+
+
+def step_key(step: Step) -> str:
+    return " // ".join(f"{s.name}: {s}" for s in step.from_beginning())
+
+
+def _to_row(step: Step) -> Dict:
+    return dict(
+        name=step.name, moves=step.moves, moves_on_inverse=step.moves_on_inverse
+    )
+
+
+def _from_row(row: Dict, previous: Step) -> Step:
+    return Step(
+        name=row["name"],
+        moves=row["moves"],
+        moves_on_inverse=row["moves_on_inverse"],
+        previous=previous,
+    )
+
+
+class Snapshot:
+    """
+    All candidates found while solving a scramble: the EOs, the DRs of each EO
+    and the finishes of each DR. Selecting from these again with different
+    retain, prefer_axis_diversity or seed settings only needs searches on the
+    candidates that weren't searched before. Each stage's results are discarded
+    when the scramble or its strategy's settings change, other than those that
+    only select candidates or change how searches are run.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.data: Dict = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.data = json.load(f)
+
+    def _stage(self, stage: str, scramble: Step, strategy) -> Dict:
+        config = search_config(strategy)
+        if self.data.get("scramble") != str(scramble):
+            self.data = {"scramble": str(scramble)}
+        if self.data.get(stage, {}).get("config") != config:
+            self.data[stage] = {"config": config, "results": {}}
+        return self.data[stage]["results"]
+
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.data, f)
+        os.replace(tmp, self.path)
+
+    def find_eos(self, meta: Meta, scramble: Step) -> List[Step]:
+        results = self._stage("eo", scramble, meta.eo)
+        missing = [axis for axis in EO_AXES if axis not in results]
+        if len(missing) < len(EO_AXES):
+            print(f"Reusing EOs on {len(EO_AXES) - len(missing)} axes from {self.path}")
+        start = time.time()
+        found = meta.eo.eos_on_axes(missing, scramble)
+        for axis, eos in zip(missing, found):
+            results[axis] = [_to_row(s) for s in eos]
+        self.save()
+        eos = [_from_row(row, scramble) for axis in EO_AXES for row in results[axis]]
+        print(f"Found EOs: {MoveCountHistogram(steps=eos)}")
+        selected = meta.eo.select_eos(eos)
+        record_stage("eo", start, found=len(eos), kept=len(selected))
+        return selected
+
+    def find_drs(self, meta: Meta, scramble: Step, eos: List[Step]) -> List[Step]:
+        results = self._stage("dr", scramble, meta.dr)
+        missing = [eo for eo in eos if step_key(eo) not in results]
+        if len(missing) < len(eos):
+            print(f"Reusing DRs of {len(eos) - len(missing)} EOs from {self.path}")
+        start = time.time()
+        found, saved = meta.dr.drs_of_eos(missing)
+        for eo, drs in zip(missing, found):
+            results[step_key(eo)] = [_to_row(s) for s in drs]
+        self.save()
+        drs = [_from_row(row, eo) for eo in eos for row in results[step_key(eo)]]
+        print(f"Found DRs: {MoveCountHistogram(steps=drs)}")
+        selected = meta.dr.select_drs(drs)
+        record_stage("dr", start, found=len(drs), kept=len(selected), saved=saved)
+        return selected
+
+    def drs_to_finishes(
+        self, meta: Meta, scramble: Step, drs: List[Step], top: Optional[int] = None
+    ) -> List[Step]:
+        """
+        If top is given, finish searches are bounded as in
+        FinishStrategy.drs_to_finishes, and their results are not saved
+        """
+        start = time.time()
+        results = self._stage("finish", scramble, meta.finish)
+        missing = [dr for dr in drs if step_key(dr) not in results]
+        if len(missing) < len(drs):
+            print(f"Reusing finishes of {len(drs) - len(missing)} DRs from {self.path}")
+        known: Dict[str, List[Step]] = {
+            step_key(dr): [_from_row(row, dr) for row in results[step_key(dr)]]
+            for dr in drs
+            if step_key(dr) in results
+        }
+        if top is None:
+            found, saved = meta.finish.finishes_of_drs(missing)
+            for dr, finishes in zip(missing, found):
+                results[step_key(dr)] = [_to_row(s) for s in finishes]
+            self.save()
+        else:
+            bound = FinishBound(top)
+            for finishes in known.values():
+                for f in finishes:
+                    bound.offer(f.cumulative_move_count)
+            found, saved = meta.finish.finishes_of_drs(missing, bound)
+        for dr, finishes in zip(missing, found):
+            known[step_key(dr)] = finishes
+        finishes = [f for dr in drs for f in known[step_key(dr)]]
+        finishes.sort(key=lambda s: s.cumulative_move_count)
+        record_stage(
+            "finish", start, found=len(finishes), kept=len(finishes), saved=saved
+        )
+        return finishes
+
+    def run(
+        self, meta: Meta, scramble: Step, top: Optional[int] = None
+    ) -> Tuple[List[Step], List[Step], List[Step]]:
+        eos = self.find_eos(meta, scramble)
+        print(f"Looking for DRs on {len(eos)} EOs: {MoveCountHistogram(steps=eos)}")
+        drs = self.find_drs(meta, scramble, eos)
+        print(
+            f"Looking for finishes on {len(drs)} DRs: {MoveCountHistogram(steps=drs)}"
+        )
+        finishes = self.drs_to_finishes(meta, scramble, drs, top)
+        return eos, drs, finishes
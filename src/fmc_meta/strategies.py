@@ -1,7 +1,6 @@
-import itertools
-from typing import List, Tuple, Optional
+import functools
+from typing import Callable, List, Tuple, Optional
 import random
-import hashlib
 
 from pydantic import BaseModel, Field
 
@@ -11,8 +10,39 @@ from fmc_meta import (
     DRStrategy,
     FinishStrategy,
     Meta,
-    nissy,
+    Search,
+    SearchPlan,
+    to_steps,
+    max_finish_length,
+    streaming,
 )
+from fmc_meta.candidates import CandidateBatch
+from fmc_meta.moves import MOVES, QUARTER_TURN_CODES
+from fmc_meta.selection import select, select_per_axis, sort_order
+
+# Axis of each quarter turn, as used by SingleAxisDR.is_findable
+_QT_AXES = {
+    c: m.replace("'", "").replace("L", "R").replace("D", "U").replace("B", "F")
+    for c, m in enumerate(MOVES)
+    if "2" not in m
+}
+
+
+def capped_length(length: int, max_length: Optional[int]) -> int:
+    return length if max_length is None else min(length, max_length)
+
+
+def niss_split_within(max_niss_split: int, codes: bytes, codes_on_inverse: bytes):
+    return min(len(codes), len(codes_on_inverse)) <= max_niss_split
+
+
+def _all_of(filters: List[Callable[[bytes, bytes], bool]], codes, codes_on_inverse):
+    return all(f(codes, codes_on_inverse) for f in filters)
+
+
+def all_of(*filters: Optional[Callable[[bytes, bytes], bool]]):
+    # A partial rather than a lambda, so that searches can be sent to workers
+    return functools.partial(_all_of, [f for f in filters if f is not None])
 
 
 class GeneralEO(EOStrategy, BaseModel):
@@ -29,16 +59,34 @@ class GeneralEO(EOStrategy, BaseModel):
         description="Try to check same number of DRs on each axis if possible",
     )
     seed: Optional[int] = Field(None, description="Random seed")
+    adaptive: bool = Field(
+        default=False,
+        description="Expand candidates best first in batches of retain, "
+        "while they can still improve the top finishes",
+    )
+    use_index: bool = Field(
+        default=False,
+        description="Look up EOs in a precomputed index instead of running nissy",
+    )
+    fan_out: bool = Field(
+        default=False,
+        description="Run the normal and inverse searches of each axis as separate tasks",
+    )
 
     def description(self) -> str:
         lines = [
             f"All EOs up to {self.max_eo_length} moves",
         ]
+        if self.use_index:
+            lines.append("Looked up in the EO index")
         if not self.check_inverse:
             lines.append("Dont check inverse")
         if self.max_niss_split > 0:
             lines.append(f"Allow up to {self.max_niss_split} pre-moves")
-        lines.append(f"Choose {self.retain} for DR attempt")
+        if self.adaptive:
+            lines.append(f"Attempt DR on batches of {self.retain} while they can help")
+        else:
+            lines.append(f"Choose {self.retain} for DR attempt")
         return ". ".join(lines)
 
     @property
@@ -49,59 +97,76 @@ class GeneralEO(EOStrategy, BaseModel):
             else ""
         )
 
-    def find_eos_on_axis(self, axis_step: str, scramble: Step) -> List[Step]:
+    def plan_eos_on_axis(
+        self, axis_step: str, scramble: Step
+    ) -> SearchPlan[List[Step]]:
         all_eos = []
         args = ["-M", self.max_eo_length]
         if self.check_inverse and self.max_niss_split > 0:
             args.append("-N")
-        eos = nissy(axis_step, scramble, *args)
         if self.check_inverse and self.max_niss_split > 0:
-            eos = [
-                s
-                for s in eos
-                if min(len(s.moves), len(s.moves_on_inverse)) <= self.max_niss_split
-            ]
-            all_eos.extend(eos)
+            solutions = yield from self._search(
+                Search(
+                    axis_step,
+                    scramble,
+                    tuple(args),
+                    accept=functools.partial(niss_split_within, self.max_niss_split),
+                )
+            )
+            all_eos.extend(to_steps(axis_step, scramble, solutions))
         elif self.check_inverse:
-            all_eos.extend(eos)
+            inverse = scramble.on_inverse()
+            solutions, i_solutions = yield from self._searches(
+                [
+                    Search(axis_step, scramble, tuple(args)),
+                    Search(axis_step, inverse, tuple(args)),
+                ]
+            )
+            all_eos.extend(to_steps(axis_step, scramble, solutions))
             found_eos = set(str(s) for s in all_eos)
-            i_eos = nissy(axis_step, scramble.on_inverse(), *args)
+            i_eos = to_steps(axis_step, inverse, i_solutions)
             i_eos = [
-                Step(name=s.name, previous=scramble, moves_on_inverse=s.moves)
+                Step.from_codes(s.name, b"", s.codes, previous=scramble)
                 for s in i_eos
                 if not str(s.on_inverse()) in found_eos
             ]
             all_eos.extend(i_eos)
         return all_eos
 
-    def sort_order(self, step: Step) -> Tuple:
-        return (
-            step.cumulative_move_count,
-            step.includes_niss,
-            step.requires_niss,
-            hashlib.sha1((str(step) + self.salt).encode("UTF8")).hexdigest(),
+    def _search(self, search: Search) -> SearchPlan[List[Tuple[bytes, bytes]]]:
+        """The search's solutions, looked up in the EO index if use_index is set"""
+        if not self.use_index:
+            return (yield search)
+        return self._look_up(search)
+
+    def _searches(
+        self, searches: List[Search]
+    ) -> SearchPlan[List[List[Tuple[bytes, bytes]]]]:
+        """Solutions of searches that don't depend on each other, as from _search"""
+        if not self.use_index:
+            return (yield searches)
+        return [self._look_up(search) for search in searches]
+
+    def _look_up(self, search: Search) -> List[Tuple[bytes, bytes]]:
+        from fmc_meta.eo_index import eo_solutions, load_index
+
+        solutions = eo_solutions(
+            load_index(self.max_eo_length),
+            search.step_name,
+            search.scramble,
+            self.max_eo_length,
+            self.max_niss_split if "-N" in search.args else None,
         )
+        return [s for s in solutions if search.accept is None or search.accept(*s)]
+
+    def sort_order(self, step: Step) -> Tuple:
+        return sort_order(step, self.salt)
 
     def select_eos(self, eos: List[Step]) -> List[Step]:
         if not self.prefer_axis_diversity:
-            return sorted(eos, key=self.sort_order)[: self.retain]
-        # Sort each axis individually and merge them
-        eos = sorted(eos, key=lambda s: s.name)
-        eos_by_axis = list(
-            itertools.zip_longest(
-                *(
-                    sorted(list(i), key=self.sort_order)
-                    for _, i in itertools.groupby(eos, lambda s: s.name)
-                )
-            )
-        )
-        eos = []
-        for t in eos_by_axis:
-            eos.extend(x for x in t if x is not None)
-            if len(eos) >= self.retain:
-                break
-        eos = eos[: self.retain]
-        return eos
+            return select(eos, self.retain, self.salt)
+        # Take the best of each axis in turn
+        return select_per_axis(eos, self.retain, self.salt)
 
 
 class DRHelper(BaseModel):
@@ -130,44 +195,54 @@ class DRHelper(BaseModel):
         )
 
     def sort_order(self, step: Step) -> Tuple:
-        return (
-            step.cumulative_move_count,
-            step.includes_niss,
-            step.requires_niss,
-            hashlib.sha1((str(step) + self.salt).encode("UTF8")).hexdigest(),
-        )
+        return sort_order(step, self.salt)
 
     def order_drs(self, drs: List[Step]) -> List[Step]:
         return sorted(drs, key=self.sort_order)
 
-    def find_drs_for_eo(self, eo: Step, budget: int) -> List[Step]:
-        all_drs = []
+    def plan_drs_for_eo(
+        self,
+        eo: Step,
+        budget: int,
+        accept: Optional[Callable[[bytes, bytes], bool]] = None,
+    ) -> SearchPlan[List[Step]]:
+        """
+        DRs within budget moves of the EO.
+        If accept is given, only DRs whose move codes on normal and inverse it
+        accepts are kept.
+        """
+        searches = []
+        inverse = eo.on_inverse()
         for next_step in self.eo_to_dr_stages[eo.name]:
             args = ["-M", budget + 1]  # Allow one extra in case of cancellation
 
             if self.check_inverse and self.max_niss_split > 0:
                 args.append("-N")
-            drs = nissy(next_step, eo, *args)
-            drs = [s for s in drs if s.move_count <= budget]
-            if self.check_inverse and self.max_niss_split > 0:
-                drs = [s for s in drs if s.move_count <= budget]
-                drs = [
-                    s
-                    for s in drs
-                    if min(len(s.moves), len(s.moves_on_inverse)) <= self.max_niss_split
-                ]
-                all_drs.extend(drs)
+                searches.append(
+                    Search(
+                        next_step,
+                        eo,
+                        tuple(args),
+                        accept=all_of(
+                            accept,
+                            functools.partial(niss_split_within, self.max_niss_split),
+                        ),
+                    )
+                )
             elif self.check_inverse:
                 # This is faster than running nissy -N
-                all_drs.extend(drs)
-                i_drs = nissy(next_step, eo.on_inverse(), *args)
-                i_drs = [s for s in i_drs if s.move_count <= budget]
-                i_drs = [
-                    Step(name=s.name, previous=eo, moves_on_inverse=s.moves)
-                    for s in i_drs
-                ]
-                all_drs.extend(i_drs)
+                searches.append(Search(next_step, eo, tuple(args), accept=accept))
+                searches.append(Search(next_step, inverse, tuple(args), accept=accept))
 
+        # The searches of both DR stages, on both sides, don't depend on each other
+        found = yield searches
+        all_drs = []
+        for search, solutions in zip(searches, found):
+            drs = CandidateBatch(search.step_name, search.scramble, solutions)
+            if search.scramble is eo:
+                all_drs.extend(drs.steps(drs.move_count <= budget))
+            else:
+                all_drs.extend(drs.steps_on_inverse(eo, drs.move_count <= budget))
         return all_drs
 
 
@@ -185,6 +260,15 @@ class OptimalDR(DRStrategy, BaseModel):
         description="Try to check same number of DRs on each axis if possible",
     )
     seed: Optional[int] = Field(default=None, description="Random seed")
+    adaptive: bool = Field(
+        default=False,
+        description="Expand candidates best first in batches of retain, "
+        "while they can still improve the top finishes",
+    )
+    fan_out: bool = Field(
+        default=False,
+        description="Run the searches of each DR stage and side as separate tasks",
+    )
 
     def description(self) -> str:
         lines = []
@@ -198,7 +282,12 @@ class OptimalDR(DRStrategy, BaseModel):
             )
         if not self.check_inverse:
             lines.append("Dont check inverse")
-        lines.append(f"Choose {self.retain} for finish attempt")
+        if self.adaptive:
+            lines.append(
+                f"Attempt finish on batches of {self.retain} while they can help"
+            )
+        else:
+            lines.append(f"Choose {self.retain} for finish attempt")
         return ". ".join(lines)
 
     @property
@@ -209,31 +298,17 @@ class OptimalDR(DRStrategy, BaseModel):
             seed=self.seed,
         )
 
-    def find_drs_for_eo(self, eo: Step) -> List[Step]:
+    def plan_drs_for_eo(self, eo: Step) -> SearchPlan[List[Step]]:
         budget = self.max_dr_length - (
             eo.move_count if self.include_eo_move_count else 0
         )
-        return self.helper.find_drs_for_eo(eo, budget)
+        return self.helper.plan_drs_for_eo(eo, budget)
 
     def select_drs(self, drs: List[Step]) -> List[Step]:
         if not self.prefer_axis_diversity:
-            return self.helper.order_drs(drs)[: self.retain]
-        # Sort each axis individually and merge them
-        drs = sorted(drs, key=lambda s: s.name)
-        drs_by_axis = list(
-            itertools.zip_longest(
-                *(
-                    self.helper.order_drs(list(i))
-                    for _, i in itertools.groupby(drs, lambda s: s.name)
-                )
-            )
-        )
-        drs = []
-        for t in drs_by_axis:
-            drs.extend(x for x in t if x is not None)
-            if len(drs) >= self.retain:
-                break
-        return drs[: self.retain]
+            return select(drs, self.retain, self.helper.salt)
+        # Take the best of each axis in turn
+        return select_per_axis(drs, self.retain, self.helper.salt)
 
 
 class SingleAxisDR(DRStrategy, BaseModel):
@@ -245,6 +320,15 @@ class SingleAxisDR(DRStrategy, BaseModel):
         default=True, description="Check both normal and inverse"
     )
     seed: Optional[int] = Field(default=None, description="Random seed")
+    adaptive: bool = Field(
+        default=False,
+        description="Expand candidates best first in batches of retain, "
+        "while they can still improve the top finishes",
+    )
+    fan_out: bool = Field(
+        default=False,
+        description="Run the searches of each DR stage and side as separate tasks",
+    )
 
     def description(self) -> str:
         lines = []
@@ -253,7 +337,12 @@ class SingleAxisDR(DRStrategy, BaseModel):
         )
         if not self.check_inverse:
             lines.append("Don't check inverse")
-        lines.append(f"Choose {self.retain} for finish attempt")
+        if self.adaptive:
+            lines.append(
+                f"Attempt finish on batches of {self.retain} while they can help"
+            )
+        else:
+            lines.append(f"Choose {self.retain} for finish attempt")
         return ". ".join(lines)
 
     @property
@@ -265,71 +354,221 @@ class SingleAxisDR(DRStrategy, BaseModel):
         )
 
     def is_findable(self, step: Step) -> bool:
-        moves = step.moves if step.moves else step.moves_on_inverse
+        return self.is_findable_codes(step.codes, step.codes_on_inverse)
+
+    def is_findable_codes(self, codes: bytes, codes_on_inverse: bytes) -> bool:
+        codes = codes if codes else codes_on_inverse
         # Count distinct axes having a quarter turn, up until the final quarter turn
-        moves = moves[:-1]
-        qts = set(
-            m.replace("'", "").replace("L", "R").replace("D", "U").replace("B", "F")
-            for m in moves
-            if "2" not in m
-        )
+        qts = set(_QT_AXES[c] for c in codes[:-1] if c in _QT_AXES)
         return len(qts) == 1
 
-    def find_drs_for_eo(self, eo: Step) -> List[Step]:
+    def plan_drs_for_eo(self, eo: Step) -> SearchPlan[List[Step]]:
         budget = self.max_dr_length - eo.move_count
-        drs = self.helper.find_drs_for_eo(eo, budget)
-        drs = list(filter(self.is_findable, drs))
-        return drs
+        return self.helper.plan_drs_for_eo(eo, budget, accept=self.is_findable_codes)
 
     def select_drs(self, drs: List[Step]) -> List[Step]:
-        return self.helper.order_drs(drs)[: self.retain]
+        return select(drs, self.retain, self.helper.salt)
+
+
+# Longest finish from DR: the diameter of the DR group in face turns
+MAX_FINISH_LENGTH = 18
+
+
+class FinishWindow:
+    """
+    A single-pass finish search, deciding solution by solution, as nissy
+    prints them from shortest to longest, which finishes to keep and when to
+    stop. The shortest finish sets how many moves longer the others can be:
+    extra(shortest), or None to keep only the shortest. The search stops at the
+    first finish longer than that, or too long to beat the best cumulative move
+    count kept so far or max_total.
+    -M is the longest finish that can beat max_total. Without max_total, the
+    shortest finish is searched for first, and sets -M to the end of the window,
+    so that no search goes to MAX_FINISH_LENGTH, whether or not nissy can be
+    stopped early.
+    """
+
+    def __init__(
+        self,
+        finish_step: str,
+        dr: Step,
+        extra: Callable[[Step], Optional[int]],
+        accept: Optional[Callable[[bytes, bytes], bool]] = None,
+        max_total: Optional[int] = None,
+    ):
+        self.finish_step = finish_step
+        self.dr = dr
+        self.extra = extra
+        self._accept = accept
+        self.best_total = max_total
+        self.max_length: Optional[int] = None
+        self.only_shortest = False
+
+    def plan(self) -> SearchPlan[List[Tuple[bytes, bytes]]]:
+        """Solutions of the finishes kept"""
+        max_length = max_finish_length(self.dr, self.best_total)
+        if max_length is None:
+            [shortest] = yield Search(self.finish_step, self.dr, limit=1)
+            self.until(*shortest)
+            if self.only_shortest:
+                return [shortest] if self.accept(*shortest) else []
+            max_length = self.max_length
+        return (
+            yield Search(
+                self.finish_step,
+                self.dr,
+                ("-M", capped_length(MAX_FINISH_LENGTH, max_length)),
+                accept=self.accept,
+                until=self.until,
+            )
+        )
+
+    def until(self, codes: bytes, codes_on_inverse: bytes) -> bool:
+        length = len(codes) + len(codes_on_inverse)
+        if self.max_length is None:
+            shortest = Step.from_codes(
+                self.finish_step, codes, codes_on_inverse, previous=self.dr
+            )
+            extra = self.extra(shortest)
+            self.only_shortest = extra is None
+            self.max_length = length + (extra or 0)
+            return False
+        if self.only_shortest:
+            return True
+        return length > capped_length(
+            self.max_length, max_finish_length(self.dr, self.best_total)
+        )
+
+    def accept(self, codes: bytes, codes_on_inverse: bytes) -> bool:
+        if self._accept is not None and not self._accept(codes, codes_on_inverse):
+            return False
+        total = Step.from_codes(
+            self.finish_step, codes, codes_on_inverse, previous=self.dr
+        ).cumulative_move_count
+        if self.best_total is None or total < self.best_total:
+            self.best_total = total
+        return True
 
 
 class OptimalFinish(FinishStrategy, BaseModel):
+    single_pass: bool = Field(
+        default=False,
+        description="Find the shortest finish and longer ones with one search",
+    )
 
     def description(self) -> str:
         lines = []
         lines.append(f"Optimal finish without breaking DR")
+        if self.single_pass:
+            lines.append("Found with a single search")
         return ". ".join(lines)
 
-    def dr_to_finish(self, dr: Step) -> List[Step]:
+    def plan_dr_to_finish(
+        self, dr: Step, max_total: Optional[int] = None
+    ) -> SearchPlan[List[Step]]:
         finish_step = f"{dr.name.split('-')[0]}fin"
-        shortest = nissy(finish_step, dr)[0]
+        if self.single_pass and streaming():
+            window = FinishWindow(
+                finish_step, dr, self.extra_length, max_total=max_total
+            )
+            solutions = yield from window.plan()
+            finishes = to_steps(finish_step, dr, solutions)
+            finishes.sort(key=lambda f: f.cumulative_move_count)
+            return finishes[:1]
+        shortest = to_steps(finish_step, dr, (yield Search(finish_step, dr, limit=1)))[
+            0
+        ]
         if shortest.move_count < len(shortest.moves):
             # Already have a cancellation
             return [shortest]
         else:
             # Search for equal/longer finishes that may have cancellations
-            finishes = nissy(finish_step, dr, "-M", len(shortest.moves) + 3)
+            max_length = capped_length(
+                len(shortest.moves) + 3, max_finish_length(dr, max_total)
+            )
+            if max_length < len(shortest.moves):
+                return []
+            solutions = yield Search(finish_step, dr, ("-M", max_length))
+            finishes = to_steps(finish_step, dr, solutions)
             finishes.sort(key=lambda f: f.cumulative_move_count)
             return finishes[:1]
 
+    def extra_length(self, shortest: Step) -> Optional[int]:
+        """How many moves longer than the shortest finish others can be"""
+        if shortest.move_count < len(shortest.moves):
+            # Already have a cancellation
+            return None
+        # Equal/longer finishes may have cancellations
+        return 3
+
 
 class EasyCornerOnlyFinish(FinishStrategy, BaseModel):
     max_qt_count: int = Field(
         default=3, description="Don't attempt DR cases with more than this many QTs"
     )
+    single_pass: bool = Field(
+        default=False,
+        description="Find the shortest finish and longer ones with one search",
+    )
 
     def description(self) -> str:
         lines = []
         lines.append(f"Optimal finish with <= {self.max_qt_count} QTs, not breaking DR")
+        if self.single_pass:
+            lines.append("Found with a single search")
         return ". ".join(lines)
 
-    def dr_to_finish(self, dr: Step) -> List[Step]:
+    def plan_dr_to_finish(
+        self, dr: Step, max_total: Optional[int] = None
+    ) -> SearchPlan[List[Step]]:
         finish_step = f"{dr.name.split('-')[0]}fin"
-        shortest = nissy(finish_step, dr)[0]
+        if self.single_pass and streaming():
+            window = FinishWindow(
+                finish_step,
+                dr,
+                self.extra_length,
+                accept=self.has_easy_corners,
+                max_total=max_total,
+            )
+            solutions = yield from window.plan()
+            finishes = to_steps(finish_step, dr, solutions)
+            finishes.sort(key=lambda f: f.cumulative_move_count)
+            return finishes[:1]
+        shortest = to_steps(finish_step, dr, (yield Search(finish_step, dr, limit=1)))[
+            0
+        ]
         if shortest.qt_count <= self.max_qt_count:
             if shortest.move_count < len(shortest.moves):
                 # Already have a cancellation
                 return [shortest]
             else:
                 # Search for equal/longer finishes that may have cancellations
-                finishes = nissy(finish_step, dr, "-M", len(shortest.moves) + 1)
-                finishes.sort(key=lambda f: f.cumulative_move_count)
-                return [f for f in finishes if f.qt_count <= self.max_qt_count][:1]
+                max_length = capped_length(
+                    len(shortest.moves) + 1, max_finish_length(dr, max_total)
+                )
         else:
             # Too many QTs. Search for solutions up to two moves longer
-            finishes = nissy(finish_step, dr, "-M", len(shortest.moves) + 2)
-            finishes.sort(key=lambda f: f.cumulative_move_count)
+            max_length = capped_length(
+                len(shortest.moves) + 2, max_finish_length(dr, max_total)
+            )
+        if max_length < len(shortest.moves):
+            return []
+        solutions = yield Search(
+            finish_step, dr, ("-M", max_length), accept=self.has_easy_corners
+        )
+        finishes = to_steps(finish_step, dr, solutions)
+        finishes.sort(key=lambda f: f.cumulative_move_count)
+        return finishes[:1]
+
+    def extra_length(self, shortest: Step) -> Optional[int]:
+        """How many moves longer than the shortest finish others can be"""
+        if shortest.qt_count > self.max_qt_count:
+            # Too many QTs. Search for solutions up to two moves longer
+            return 2
+        if shortest.move_count < len(shortest.moves):
+            # Already have a cancellation
+            return None
+        return 1
 
-            return [f for f in finishes if f.qt_count <= self.max_qt_count][:1]
+    def has_easy_corners(self, codes: bytes, codes_on_inverse: bytes) -> bool:
+        return sum(c in QUARTER_TURN_CODES for c in codes) <= self.max_qt_count
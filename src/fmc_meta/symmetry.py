@@ -0,0 +1,88 @@
+from typing import Dict, List, Optional, Tuple
+import functools
+import itertools
+
+import numpy as np
+
+from fmc_meta.cube import AXES, NORMALS, Cube
+from fmc_meta.moves import decode, encode
+
+# Face turns, the only moves relabeled by symmetries
+_FACE_MOVES = 18
+_FACES = "UDRLFB"
+
+
+def _symmetries() -> List[bytes]:
+    """
+    Each of the 48 symmetries of the cube, rotations and mirrors, as a table
+    relabeling the moves of a sequence into the moves of its conjugate: the
+    moves that reach the position the symmetry takes the sequence's position to.
+    Mirrors turn each face the other way. Moves other than face turns are left
+    as they are, so tables only apply to sequences of face turns.
+    """
+    tables = []
+    for order in itertools.permutations(range(3)):
+        for signs in itertools.product((1, -1), repeat=3):
+            swaps = sum(order[i] > order[j] for i in range(3) for j in range(i + 1, 3))
+            mirror = (-1) ** swaps * signs[0] * signs[1] * signs[2] < 0
+            table = bytearray(range(256))
+            for face, n in NORMALS.items():
+                image = tuple(signs[i] * n[order[i]] for i in range(3))
+                to = next(f for f, m in NORMALS.items() if m == image)
+                for turn in range(3):
+                    code = 3 * _FACES.index(face) + turn
+                    table[code] = 3 * _FACES.index(to) + (2 - turn if mirror else turn)
+            tables.append(bytes(table))
+    return tables
+
+
+SYMMETRIES = _symmetries()
+# Symmetries taking each axis's faces to U and D, and so a DR on that axis to DR
+# on the UD axis
+TO_UD: Dict[str, List[bytes]] = {
+    axis: [
+        t
+        for t in SYMMETRIES
+        if {t[3 * _FACES.index(f)] // 3 for f in axis.upper()} == {0, 1}
+    ]
+    for axis in AXES
+}
+
+
+def inverse_table(table: bytes) -> bytes:
+    inverse = bytearray(range(256))
+    for code in range(_FACE_MOVES):
+        inverse[table[code]] = code
+    return bytes(inverse)
+
+
+@functools.lru_cache(maxsize=1024)
+def canonical(codes: bytes, axis: str) -> Optional[Tuple[bytes, bytes]]:
+    """
+    A key of the position codes reach, the same for every position it takes to
+    by a symmetry that also takes the axis to the UD axis, and the symmetry
+    taking it to the position of the key. None if codes aren't all face turns.
+    Cached, as a search looks it up and then stores its output.
+    """
+    if any(c >= _FACE_MOVES for c in codes):
+        return None
+    tables = TO_UD[axis]
+    keys = Cube.from_codes([codes.translate(t) for t in tables]).keys()
+    i = int(np.argmin([int.from_bytes(k, "big") for k in keys]))
+    return keys[i], tables[i]
+
+
+def relabel_output(output: str, table: bytes) -> str:
+    """nissy output with the moves of each solution relabeled by a symmetry table"""
+    lines = []
+    for line in output.splitlines():
+        # Solutions are moves on normal, then moves on inverse in parentheses
+        normal, _, inverse = line.strip().rstrip(")").partition("(")
+        parts = [
+            " ".join(decode(encode(moves.split()).translate(table)))
+            for moves in (normal, inverse)
+        ]
+        if parts[1]:
+            parts[1] = f"({parts[1]})"
+        lines.append(" ".join(p for p in parts if p) + "\n")
+    return "".join(lines)
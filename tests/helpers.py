@@ -0,0 +1,50 @@
+from typing import Iterator, List
+import random
+
+from fmc_meta.backend import SearchRequest, SolverBackend
+
+FACES = ["U", "D", "R", "L", "F", "B"]
+
+
+def fake_moves(seed: str, n: int) -> List[str]:
+    rng = random.Random(seed)
+    return [rng.choice(FACES) + rng.choice(["", "2", "'"]) for _ in range(n)]
+
+
+class RandomBackend(SolverBackend):
+    """
+    Made-up solutions, counting round trips. Each position has the same
+    solutions for every search: those up to the length given by -M, or else the
+    shortest.
+    """
+
+    def __init__(self):
+        self.round_trips = 0
+
+    def stream(
+        self, step_name: str, moves: List[str], args: List[str]
+    ) -> Iterator[str]:
+        self.round_trips += 1
+        return iter(self.output(step_name, moves, args).splitlines(True))
+
+    def solve_many(self, searches: List[SearchRequest]) -> List[str]:
+        self.round_trips += 1
+        return [self.output(*search) for search in searches]
+
+    @staticmethod
+    def output(step_name: str, moves: List[str], args: List[str]) -> str:
+        args = [str(a) for a in args]
+        rng = random.Random(repr((step_name, list(moves), "-N" in args)))
+        lengths = sorted(rng.randint(1, 9) for _ in range(rng.randint(1, 8)))
+        if "-M" in args:
+            max_length = int(args[args.index("-M") + 1])
+            lengths = [n for n in lengths if n <= max_length]
+        else:
+            lengths = lengths[:1]
+        lines = []
+        for n in lengths:
+            solution = fake_moves(str(rng.random()), n)
+            if "-N" in args and rng.random() < 0.3:
+                solution[-1] = f"({solution[-1]})"
+            lines.append(" ".join(solution) + "\n")
+        return "".join(lines)
@@ -0,0 +1,104 @@
+from typing import List
+from unittest import TestCase
+import contextlib
+import io
+
+import fmc_meta
+from fmc_meta import Step
+from fmc_meta.adaptive import BUDGET_BATCH, AdaptiveAttempt
+from fmc_meta.benchmark import corpus
+from fmc_meta.execution import InlineContext
+from fmc_meta.main import attempt, load_meta
+
+from helpers import RandomBackend
+
+
+def totals(finishes: List[Step]) -> List[int]:
+    return [f.cumulative_move_count for f in finishes[:3]]
+
+
+class TestAdaptive(TestCase):
+    def setUp(self):
+        fmc_meta._backend = RandomBackend()
+        fmc_meta._pool = InlineContext()
+        self.scramble = Step(name="scramble", moves=["R", "U", "F", "L2", "D'"])
+
+    def tearDown(self):
+        fmc_meta._backend = None
+        fmc_meta._pool = None
+
+    def run_attempt(self, meta) -> AdaptiveAttempt:
+        adaptive = AdaptiveAttempt(meta, self.scramble, top=3)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.eos, self.drs, self.finishes = adaptive.run()
+        return adaptive
+
+    def test_same_as_staged(self):
+        meta = load_meta("near-optimal", {"eo.retain": 8, "dr.retain": 6})
+        with contextlib.redirect_stdout(io.StringIO()):
+            staged = attempt(meta, self.scramble.moves)
+        self.run_attempt(meta)
+        assert totals(self.finishes) == totals(staged.finishes)
+
+    def test_adaptive_eo_only(self):
+        options = {"eo.retain": 8, "dr.retain": 6}
+        for scramble in corpus(20):
+            self.scramble = Step(name="scramble", moves=scramble.split(" "))
+            with contextlib.redirect_stdout(io.StringIO()):
+                staged = attempt(
+                    load_meta("near-optimal", options), self.scramble.moves
+                )
+            self.run_attempt(load_meta("near-optimal", options | {"eo.adaptive": True}))
+            # Only DRs the DR strategy selects from those of every EO are finished
+            assert {str(dr) for dr in self.drs} <= {str(dr) for dr in staged.drs}
+            assert totals(self.finishes) == totals(staged.finishes)
+
+    def test_adaptive(self):
+        options = {"eo.retain": 8, "dr.retain": 6}
+        with contextlib.redirect_stdout(io.StringIO()):
+            staged = attempt(load_meta("near-optimal", options), self.scramble.moves)
+        options |= {"eo.adaptive": True, "dr.adaptive": True}
+        unbounded = self.run_attempt(load_meta("near-optimal", options))
+        # Expanding until nothing can improve finds at least as good solutions
+        for adaptive, best in zip(totals(self.finishes), totals(staged.finishes)):
+            assert adaptive <= best
+
+        limited = self.run_attempt(
+            load_meta("near-optimal", options | {"budget.total.searches": 20})
+        )
+        assert 20 <= limited.searches < unbounded.searches
+        assert self.finishes
+
+    def test_unused_budget(self):
+        budget = {"budget.dr.seconds": 1000, "budget.finish.searches": 100000}
+        for adaptive_dr in (False, True):
+            options = {"eo.retain": 8, "dr.retain": 6, "dr.adaptive": adaptive_dr}
+            for scramble in corpus(20):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    unlimited = attempt(
+                        load_meta("near-optimal", options), scramble.split(" "), top=3
+                    )
+                    limited = attempt(
+                        load_meta("near-optimal", options | budget),
+                        scramble.split(" "),
+                        top=3,
+                    )
+                # A budget that doesn't run out changes nothing
+                assert totals(limited.finishes) == totals(unlimited.finishes)
+                if not adaptive_dr:
+                    assert {str(dr) for dr in limited.drs} <= {
+                        str(dr) for dr in unlimited.drs
+                    }
+
+    def test_stage_budgets(self):
+        options = {"eo.retain": 30, "dr.retain": 10, "budget.dr.searches": 4}
+        limited = self.run_attempt(load_meta("near-optimal", options))
+        assert 4 <= limited.stage_searches["dr"] < 4 + 2 * BUDGET_BATCH
+        # DRs found before the DR budget ran out are still finished
+        assert 0 < len(self.drs) <= 10
+        assert self.finishes
+
+        options = {"eo.retain": 30, "dr.retain": 10, "budget.finish.searches": 1}
+        limited = self.run_attempt(load_meta("near-optimal", options))
+        assert 0 < len(self.drs) <= BUDGET_BATCH
+        assert limited.stage_searches["finish"] <= 2 * BUDGET_BATCH
@@ -0,0 +1,119 @@
+from unittest import TestCase
+from os import path
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import fmc_meta
+from fmc_meta import Search, Step
+from fmc_meta.aio import AsyncNissy, attempt as attempt_async
+from fmc_meta.backend import (
+    NissyArchive,
+    RecordingBackend,
+    ReplayBackend,
+    SubprocessBackend,
+)
+from fmc_meta.execution import InlineContext
+from fmc_meta.main import attempt, load_meta
+
+# Mimics nissy solve: prints made-up solutions, the same for the same search,
+# only the first unless -M is given, and with NISS only if -N is given
+FAKE_NISSY = f"""#!{sys.executable}
+import hashlib, random, sys
+args = sys.argv[2:]
+rng = random.Random(hashlib.sha1(" ".join(args).encode()).hexdigest())
+for _ in range(rng.randint(1, 10) if "-M" in args else 1):
+    moves = [rng.choice("UDRLFB") + rng.choice(["", "2", "'"]) for _ in range(rng.randint(1, 8))]
+    split = rng.randint(0, len(moves)) if "-N" in args else len(moves)
+    on_inverse = f" ({{' '.join(moves[split:])}})" if split < len(moves) else ""
+    print(" ".join(moves[:split]) + on_inverse)
+"""
+
+# Prints a solution after more on stderr than a pipe holds
+NOISY_NISSY = f"""#!{sys.executable}
+import sys
+sys.stderr.write("x" * 1000000)
+print("F R")
+"""
+
+SLOW_NISSY = f"""#!{sys.executable}
+import time
+time.sleep(60)
+"""
+
+
+def strs(steps):
+    return [" // ".join(str(s) for s in step.from_beginning()) for step in steps]
+
+
+class TestAio(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.nissy = path.join(self.tmp.name, "nissy")
+        self.slow_nissy = path.join(self.tmp.name, "slow-nissy")
+        self.noisy_nissy = path.join(self.tmp.name, "noisy-nissy")
+        for file, script in [
+            (self.nissy, FAKE_NISSY),
+            (self.slow_nissy, SLOW_NISSY),
+            (self.noisy_nissy, NOISY_NISSY),
+        ]:
+            with open(file, "w") as f:
+                f.write(script)
+            os.chmod(file, 0o755)
+
+    def tearDown(self):
+        fmc_meta._backend = None
+        fmc_meta._pool = None
+        self.tmp.cleanup()
+
+    def test_same_as_sync(self):
+        fmc_meta._backend = SubprocessBackend(self.nissy)
+        fmc_meta._pool = InlineContext()
+        nissy = AsyncNissy(processes=4, nissy_path=self.nissy)
+        for name in ["near-optimal", "easy-corners"]:
+            meta = load_meta(name, {"eo.retain": 4, "dr.retain": 4})
+            with contextlib.redirect_stdout(io.StringIO()):
+                expected = attempt(meta, ["R", "U", "F"])
+            for top in [None, 3]:
+                solutions = asyncio.run(
+                    attempt_async(meta, ["R", "U", "F"], nissy, top=top)
+                )
+                assert strs(solutions.eos) == strs(expected.eos)
+                assert strs(solutions.drs) == strs(expected.drs)
+                assert strs(solutions.finishes[:3]) == strs(expected.finishes[:3])
+
+    def test_timeout(self):
+        meta = load_meta("near-optimal")
+        nissy = AsyncNissy(processes=2, nissy_path=self.slow_nissy)
+        start = time.time()
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(attempt_async(meta, ["R", "U", "F"], nissy, timeout=0.5))
+        assert time.time() - start < 10
+
+    def test_adaptive(self):
+        meta = load_meta("near-optimal", {"budget.total.searches": 10})
+        nissy = AsyncNissy(processes=2, nissy_path=self.nissy)
+        with self.assertRaises(ValueError):
+            asyncio.run(attempt_async(meta, ["R", "U", "F"], nissy))
+
+    def test_replay(self):
+        meta = load_meta("near-optimal", {"eo.retain": 4, "dr.retain": 4})
+        archive = NissyArchive(path.join(self.tmp.name, "nissy.db"))
+        recording = AsyncNissy(
+            backend=RecordingBackend(SubprocessBackend(self.nissy), archive)
+        )
+        expected = asyncio.run(attempt_async(meta, ["R", "U", "F"], recording))
+        replaying = AsyncNissy(backend=ReplayBackend(archive))
+        solutions = asyncio.run(attempt_async(meta, ["R", "U", "F"], replaying))
+        assert strs(solutions.finishes) == strs(expected.finishes)
+
+    def test_stderr(self):
+        nissy = AsyncNissy(processes=1, nissy_path=self.noisy_nissy)
+        search = Search("drudfin", Step(name="scramble", moves=["R"]))
+        with self.assertRaises(Exception) as raised:
+            asyncio.run(asyncio.wait_for(nissy.solutions(search), 10))
+        assert len(str(raised.exception)) == 1000000
@@ -0,0 +1,90 @@
+from typing import Iterator, List
+from os import path
+from unittest import TestCase
+import os
+import subprocess
+import sys
+import tempfile
+
+import fmc_meta
+from fmc_meta import Step
+from fmc_meta.backend import (
+    NissyArchive,
+    RecordingBackend,
+    ReplayBackend,
+    SolverBackend,
+    SubprocessBackend,
+)
+from fmc_meta.cache import NissyCache
+
+OUTPUT = "F R\n(B)\nU2 F (L D)\n"
+
+
+class FixedBackend(SolverBackend):
+    """The same output for every search"""
+
+    def __init__(self):
+        self.searches = 0
+
+    def stream(
+        self, step_name: str, moves: List[str], args: List[str]
+    ) -> Iterator[str]:
+        self.searches += 1
+        return iter(OUTPUT.splitlines(keepends=True))
+
+
+class TestBackend(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.scramble = Step(name="scramble", moves=["R", "U", "F"])
+
+    def tearDown(self):
+        fmc_meta._backend = None
+        fmc_meta._cache = None
+        self.tmp.cleanup()
+
+    def test_record_and_replay(self):
+        archive = NissyArchive(path.join(self.tmp.name, "archive.db"))
+        fixed = FixedBackend()
+        fmc_meta._backend = RecordingBackend(fixed, archive)
+        fmc_meta._cache = NissyCache(path.join(self.tmp.name, "cache.db"))
+        found = fmc_meta.nissy("eofb", self.scramble, "-M", 5, limit=1)
+        assert [str(s) for s in found] == ["F R"]
+        # Answered from the cache, and recorded all the same
+        fmc_meta.nissy("eorl", self.scramble)
+        fmc_meta.nissy("eorl", self.scramble)
+        assert fixed.searches == 2
+        assert len(archive) == 2
+
+        fmc_meta._cache = None
+        fmc_meta._backend = ReplayBackend(archive)
+        replayed = fmc_meta.nissy("eofb", self.scramble, "-M", 5)
+        assert [str(s) for s in replayed] == ["F R", "(B)", "U2 F (L D)"]
+        with self.assertRaises(Exception):
+            fmc_meta.nissy("eoud", self.scramble)
+
+    def test_import_without_nissy(self):
+        env = dict(os.environ, PATH=self.tmp.name)
+        result = subprocess.run(
+            [sys.executable, "-c", "import fmc_meta.main"],
+            env=env,
+            capture_output=True,
+        )
+        assert result.returncode == 0, result.stderr
+
+    def test_large_stderr(self):
+        # More on stderr than fits in a pipe, before any output
+        nissy = path.join(self.tmp.name, "nissy")
+        with open(nissy, "w") as f:
+            f.write(
+                f"#!{sys.executable}\n"
+                "import sys\n"
+                "sys.stderr.write('x' * 1000000)\n"
+                "print('F R')\n"
+            )
+        os.chmod(nissy, 0o755)
+        lines = SubprocessBackend(nissy).stream("eofb", ["R"], [])
+        assert next(lines) == "F R\n"
+        with self.assertRaises(Exception) as raised:
+            next(lines)
+        assert len(str(raised.exception)) == 1000000
@@ -0,0 +1,103 @@
+from unittest import TestCase, mock
+from os import path
+import contextlib
+import io
+import tempfile
+
+import fmc_meta
+from fmc_meta import batch
+from fmc_meta.batch import (
+    Checkpoint,
+    Job,
+    run_batched,
+    solve_batched,
+    winners,
+    write_report,
+)
+from fmc_meta.execution import InlineContext
+from fmc_meta.main import attempt, load_meta
+
+from helpers import RandomBackend
+
+
+class TestBatch(TestCase):
+    def test_winners(self):
+        assert winners([20, 22], [21, 21], "a", "b") == ("a", None)
+        assert winners([22, 22], [22, 23], "a", "b") == (None, "a")
+        assert winners([], [25], "a", "b") == ("b", None)
+        assert winners([22], [22], "a", "b") == (None, None)
+
+    def test_worker_options(self):
+        meta = load_meta("near-optimal")
+        with (
+            mock.patch("sys.stdout"),
+            mock.patch.object(fmc_meta, "use_context"),
+            mock.patch("fmc_meta.main.attempt") as run_attempt,
+        ):
+            batch._init_worker({"near-optimal": meta}, 3, True)
+            batch._run_job(Job(index=0, scramble="R U F", meta="near-optimal"))
+        run_attempt.assert_called_once_with(meta, ["R", "U", "F"], True, top=3)
+
+    def test_resume(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            file = path.join(tmp, "report.jsonl")
+            checkpoint = Checkpoint(file)
+            checkpoint.record(Job(0, "R U F", "a"), [20, 21, 21])
+            checkpoint.record(Job(0, "R U F", "b"), [22])
+            checkpoint.record(Job(1, "L D B", "a"), [23])
+            with open(file, "a") as f:
+                f.write('{"index": 1, "scr')  # Interrupted write
+
+            resumed = Checkpoint(file)
+            assert resumed.is_done(Job(0, "R U F", "b"))
+            assert not resumed.is_done(Job(1, "L D B", "b"))
+            resumed.record(Job(1, "L D B", "b"), [24])
+            assert Checkpoint(file).is_done(Job(1, "L D B", "b"))
+            resumed.check_scrambles(["R U F", "L D B"])
+            with self.assertRaises(Exception):
+                resumed.check_scrambles(["R U F", "L D F"])
+
+            report = path.join(tmp, "report.md")
+            write_report(report, ["R U F", "L D B"], resumed, "a", "b")
+            with open(report) as f:
+                lines = f.readlines()
+            assert lines[2] == "|R U F|20/21/21|22|a|-|\n"
+            assert lines[3] == "|L D B|23|24|a|-|\n"
+
+    def test_solve_batched(self):
+        backend = RandomBackend()
+        fmc_meta._backend = backend
+        fmc_meta._pool = InlineContext()
+        scrambles = ["R U F", "L2 D' B R", "F2 U' L D2", "B R2 D L'"]
+        try:
+            for name in ["near-optimal", "easy-corners"]:
+                meta = load_meta(name)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    expected = [attempt(meta, s.split(" ")) for s in scrambles]
+                backend.round_trips = 0
+                jobs = [Job(i, s, name) for i, s in enumerate(scrambles)]
+                results = list(run_batched(jobs, {name: meta}, batch_size=50))
+                assert [job for job, _ in results] == jobs
+                for (_, scores), solutions in zip(results, expected):
+                    assert scores == [
+                        f.cumulative_move_count for f in solutions.finishes[:3]
+                    ]
+                # A round trip for every 50 searches of a stage, not every search
+                assert backend.round_trips < 20
+
+                batched = solve_batched(
+                    meta, [e.scramble for e in expected], batch_size=50
+                )
+                for (eos, drs, finishes), solutions in zip(batched, expected):
+                    assert [str(s) for s in eos] == [str(s) for s in solutions.eos]
+                    assert [str(s) for s in drs] == [str(s) for s in solutions.drs]
+                    assert [str(s) for s in finishes] == [
+                        str(s) for s in solutions.finishes
+                    ]
+                    # Each step follows its own scramble's candidates
+                    for f in finishes:
+                        assert f.previous in drs
+                        assert f.previous.previous in eos
+        finally:
+            fmc_meta._backend = None
+            fmc_meta._pool = None
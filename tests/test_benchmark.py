@@ -0,0 +1,73 @@
+from unittest import TestCase
+
+import fmc_meta
+from fmc_meta.benchmark import (
+    BenchmarkResult,
+    compare_to_baseline,
+    corpus,
+    run_benchmark,
+)
+from fmc_meta.main import load_meta
+
+from helpers import RandomBackend
+
+
+class TestBenchmark(TestCase):
+    def test_corpus(self):
+        assert corpus(5) == corpus(5)
+        assert corpus(3) == corpus(5)[:3]
+        for scramble in corpus(20):
+            faces = [m[0] for m in scramble.split(" ")]
+            assert len(faces) == 25
+            assert all(a != b for a, b in zip(faces, faces[1:]))
+            axis = dict(U=0, D=0, R=1, L=1, F=2, B=2)
+            axes = [axis[f] for f in faces]
+            assert all(
+                faces[i] != faces[i + 2] or axes[i] != axes[i + 1]
+                for i in range(len(faces) - 2)
+            )
+
+    def test_compare_to_baseline(self):
+        result = BenchmarkResult(
+            meta="near-optimal",
+            scrambles=2,
+            wall=10,
+            scrambles_per_minute=12,
+            stage_latency={"eo": 1, "dr": 2, "finish": 2},
+            nissy_calls_per_scramble=100,
+            scores=[[22, 23, 23], [24, 24, 25]],
+        )
+        baseline = dict(
+            results=[
+                dict(
+                    meta="near-optimal",
+                    scrambles_per_minute=12.5,
+                    stage_latency={"eo": 1, "dr": 1, "finish": 2},
+                    nissy_calls_per_scramble=100,
+                    scores=[[22, 23, 23], [24, 24, 25], [21, 22, 22]],
+                )
+            ]
+        )
+        regressions = compare_to_baseline([result], baseline, 0.1, peak_rss=500)
+        assert len(regressions) == 1
+        assert "dr takes" in regressions[0]
+        baseline["results"][0]["scores"][1] = [23, 24, 24]
+        assert len(compare_to_baseline([result], baseline, 0.1, peak_rss=500)) == 2
+        baseline["peak_rss_mb"] = 480
+        assert len(compare_to_baseline([result], baseline, 0.1, peak_rss=500)) == 2
+        baseline["peak_rss_mb"] = 400
+        regressions = compare_to_baseline([result], baseline, 0.1, peak_rss=500)
+        assert len(regressions) == 3
+        assert "peak RSS" in regressions[0]
+
+    def test_worker_events(self):
+        fmc_meta._backend = RandomBackend()
+        try:
+            meta = load_meta("near-optimal")
+            inline = run_benchmark("near-optimal", meta, corpus(2))
+            forked = run_benchmark("near-optimal", meta, corpus(2), processes=2)
+        finally:
+            fmc_meta._backend = None
+        assert inline.nissy_calls_per_scramble > 0
+        assert forked.nissy_calls_per_scramble == inline.nissy_calls_per_scramble
+        assert forked.scores == inline.scores
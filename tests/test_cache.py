@@ -0,0 +1,124 @@
+from unittest import TestCase
+from os import path
+import random
+import tempfile
+
+import fmc_meta
+from fmc_meta import Step
+from fmc_meta.backend import SolverBackend
+from fmc_meta.cache import FinishCache, NissyCache, normalize_args
+from fmc_meta.cube import Cube
+from fmc_meta.moves import MOVES, decode, encode, invert_codes
+from fmc_meta.symmetry import SYMMETRIES
+
+
+class InverseBackend(SolverBackend):
+    """Solves every position with the inverse of its scramble"""
+
+    def __init__(self):
+        self.searches = 0
+
+    def stream(self, step_name, moves, args):
+        self.searches += 1
+        return iter([" ".join(decode(invert_codes(encode(moves)))) + "\n"])
+
+
+class TestCache(TestCase):
+    def test_normalize_args(self):
+        assert normalize_args(["-M", 5, "-N"]) == normalize_args(["-N", "-M", "5"])
+        assert normalize_args(["-M", 5]) != normalize_args(["-M", 6])
+
+    def test_hits_and_misses(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = NissyCache(path.join(tmp, "cache.db"))
+            moves = "R U F".split(" ")
+            assert cache.get("eofb", ["-M", "5"], moves) is None
+            cache.put("eofb", ["-M", "5"], moves, "F\n")
+            assert cache.get("eofb", ["-M", "5"], moves) == "F\n"
+            assert cache.get("eofb", ["-M", "5"], ["R", "U"]) is None
+            stats = cache.stats()
+            assert stats.hits == 1
+            assert stats.misses == 2
+            assert stats.entries == 1
+
+    def test_eviction(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = NissyCache(path.join(tmp, "cache.db"), max_size=25)
+            for i in range(5):
+                cache.put("eofb", [], [str(i)], "0123456789")
+            stats = cache.stats()
+            assert stats.entries == 2
+            assert stats.size == 20
+            assert cache.get("eofb", [], ["0"]) is None
+            assert cache.get("eofb", [], ["4"]) is not None
+
+    def test_filtered_solutions(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            fmc_meta._cache = NissyCache(path.join(tmp, "cache.db"))
+            try:
+                scramble = Step(name="scramble", moves=["R", "U", "F"])
+                output = "F R\n(B)\nU (L2 D)\n"
+                fmc_meta._cache.put("eofb", ["-N"], scramble.all_moves, output)
+                steps = fmc_meta.nissy("eofb", scramble, "-N")
+                assert [str(s) for s in steps] == ["F R", "(B)", "U (L2 D)"]
+                steps = fmc_meta.nissy(
+                    "eofb", scramble, "-N", accept=lambda n, i: len(i) > 0
+                )
+                assert [str(s) for s in steps] == ["(B)", "U (L2 D)"]
+                steps = fmc_meta.nissy("eofb", scramble, "-N", limit=1)
+                assert [str(s) for s in steps] == ["F R"]
+            finally:
+                fmc_meta._cache = None
+
+    def test_finish_cache(self):
+        rng = random.Random(0)
+        codes = encode(rng.choice(MOVES[:18]) for _ in range(25))
+        axis_of_face = {
+            "U": "ud",
+            "D": "ud",
+            "R": "rl",
+            "L": "rl",
+            "F": "fb",
+            "B": "fb",
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = FinishCache(path.join(tmp, "finish.db"))
+            output = " ".join(decode(invert_codes(codes))) + "\n"
+            cache.put("drrlfin", ["-M", "12"], codes, output)
+            assert cache.get("drrlfin", ["-M", "12"], codes) == output
+            assert cache.get("drrlfin", ["-M", "11"], codes) is None
+            assert cache.get("eofb", ["-M", "12"], codes) is None
+            for table in SYMMETRIES:
+                # The same position, rotated or mirrored
+                symmetric = codes.translate(table)
+                axis = axis_of_face[MOVES[table[6]][0]]
+                found = cache.get(f"dr{axis}fin", ["-M", "12"], symmetric)
+                finish = encode(found.split())
+                assert Cube.solved().apply_codes(symmetric + finish).is_solved()[0]
+            assert cache.stats().hits == 49
+
+    def test_symmetric_finishes(self):
+        backend = InverseBackend()
+        with tempfile.TemporaryDirectory() as tmp:
+            fmc_meta._backend = backend
+            fmc_meta._finish_cache = FinishCache(path.join(tmp, "finish.db"))
+            try:
+                dr = Step(name="drud", moves="R2 U F2 D' L2 B2 U2".split(" "))
+                # Mirrored left to right, and then turned upside down
+                mirrored = Step(name="drud", moves="L2 U' F2 D R2 B2 U2".split(" "))
+                upside_down = Step(name="drud", moves="R2 D' F2 U L2 B2 D2".split(" "))
+                for step in [dr, mirrored, upside_down]:
+                    [(finish, _)] = fmc_meta.nissy_solutions("drudfin", step, "-M", 10)
+                    cube = Cube.solved().apply_codes(step.all_codes + finish)
+                    assert cube.is_solved()[0]
+                assert backend.searches == 1
+                # Which shortest finish is found can't depend on the search order
+                for step in [dr, mirrored, upside_down]:
+                    fmc_meta.nissy_solutions("drudfin", step, limit=1)
+                assert backend.searches == 4
+                fmc_meta.nissy_solutions("drud", dr)
+                fmc_meta.nissy_solutions("drud", dr)
+                assert backend.searches == 6
+            finally:
+                fmc_meta._backend = None
+                fmc_meta._finish_cache = None
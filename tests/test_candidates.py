@@ -0,0 +1,46 @@
+from unittest import TestCase
+import random
+
+from fmc_meta import Step
+from fmc_meta.moves import encode
+from fmc_meta.candidates import CandidateBatch
+
+
+def random_moves(rng: random.Random, n: int):
+    return [rng.choice("UDRLFB") + rng.choice(["", "2", "'"]) for _ in range(n)]
+
+
+class TestCandidates(TestCase):
+    def test_same_as_step(self):
+        rng = random.Random(0)
+        for _ in range(50):
+            previous = Step(name="scramble", moves=random_moves(rng, 20))
+            for _ in range(rng.randint(0, 2)):
+                previous = Step(
+                    name="eofb",
+                    moves=random_moves(rng, rng.randint(0, 3)),
+                    moves_on_inverse=random_moves(rng, rng.randint(0, 2)),
+                    previous=previous,
+                )
+            solutions = [
+                (
+                    encode(random_moves(rng, rng.randint(0, 4))),
+                    encode(random_moves(rng, rng.randint(0, 2))),
+                )
+                for _ in range(20)
+            ]
+            batch = CandidateBatch("drud-eofb", previous, solutions)
+            for i, step in enumerate(batch.steps()):
+                assert batch.move_count[i] == step.move_count
+                assert batch.cumulative_move_count[i] == step.cumulative_move_count
+                assert batch.qt_count[i] == step.qt_count
+                assert batch.includes_niss[i] == step.includes_niss
+                assert batch.requires_niss[i] == step.requires_niss
+
+    def test_filter(self):
+        previous = Step(name="scramble", moves=["R", "U", "F"])
+        solutions = [(encode(["R"]), b""), (encode(["U", "F"]), encode(["D"]))]
+        batch = CandidateBatch("eofb", previous, solutions)
+        assert [str(s) for s in batch.steps(batch.move_count <= 2)] == ["R"]
+        assert [str(s) for s in batch.steps_on_inverse(previous)] == ["(R)", "(U F)"]
+        assert len(CandidateBatch("eofb", previous, []).steps()) == 0
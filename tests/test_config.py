@@ -1,5 +1,10 @@
-from unittest import TestCase
+from unittest import TestCase, mock
 from os import path
+import json
+import os
+import subprocess
+import sys
+import tempfile
 
 from pyhocon import ConfigFactory
 
@@ -15,3 +20,62 @@ class TestConfig(TestCase):
         overrides = {"eo.max_eo_length": "1"}
         meta = main.load_meta("near-optimal", overrides)
         assert meta.eo.max_eo_length == 1
+
+    def test_load_meta_file(self):
+        cwd = os.getcwd()
+        with (
+            tempfile.TemporaryDirectory() as tmp,
+            mock.patch.dict(os.environ, {"XDG_CACHE_HOME": tmp}),
+        ):
+            cfg = main.compiled_config()["metas"]["near-optimal"]["config"]
+            cfg["eo"]["max_eo_length"] = 1
+            # A file is loaded even when it has the name of a pre-configured meta
+            with open(path.join(tmp, "near-optimal"), "w") as f:
+                json.dump(cfg, f)
+            os.chdir(tmp)
+            try:
+                meta = main.load_meta("near-optimal")
+            finally:
+                os.chdir(cwd)
+        assert meta.eo.max_eo_length == 1
+
+    def test_compiled_config(self):
+        with (
+            tempfile.TemporaryDirectory() as tmp,
+            mock.patch.dict(os.environ, {"XDG_CACHE_HOME": tmp}),
+        ):
+            compiled = main.compiled_config()
+            cfg = ConfigFactory.parse_file(main.META_CONF)
+            assert [*compiled["metas"]] == [*cfg["options"]]
+            assert path.exists(main.compiled_path())
+            # Reused until what it was compiled from changes
+            with mock.patch.object(
+                main, "_compile", return_value=compiled["metas"]
+            ) as compile:
+                assert main.compiled_config() == compiled
+                compile.assert_not_called()
+                version = [[0, 0]] + compiled["version"][1:]
+                with mock.patch.object(main, "_version", return_value=version):
+                    main.compiled_config()
+                compile.assert_called_once()
+
+            meta = main.load_meta("near-optimal")
+            assert isinstance(meta, Meta)
+            assert compiled["metas"]["near-optimal"]["description"][0] == [
+                "EO",
+                meta.eo.description(),
+            ]
+
+    def test_light_import(self):
+        modules = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, fmc_meta.main; print(' '.join(sys.modules))",
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.split()
+        for heavy in ("pydantic", "pyhocon", "numpy", "multiprocessing.pool"):
+            assert heavy not in modules
@@ -0,0 +1,85 @@
+from unittest import TestCase
+import random
+
+import numpy as np
+
+from fmc_meta.cube import Cube
+from fmc_meta.moves import MOVES, encode, invert_codes
+
+
+def cube(moves: str) -> Cube:
+    return Cube.from_codes([encode(moves.split())])
+
+
+def same(a: str, b: str) -> bool:
+    return cube(a).keys() == cube(b).keys()
+
+
+class TestCube(TestCase):
+    def test_moves(self):
+        for m in MOVES:
+            assert not cube(m).is_solved()[0]
+            assert cube(" ".join([m] * 4)).is_solved()[0]
+        assert cube("R U R' U' " * 6).is_solved()[0]
+        assert not cube("R U R' U' " * 3).is_solved()[0]
+        assert same("R L", "L R")
+        assert same("F B F2 B'", "F'")
+        assert not same("R U", "U R")
+        assert same("r", "L x")
+        assert same("M", "R L' x'")
+        assert same("E", "U D' y'")
+        assert same("S", "F' B z")
+
+    def test_batched(self):
+        rng = random.Random(0)
+        sequences = [
+            encode(rng.choice(MOVES) for _ in range(rng.randint(0, 30)))
+            for _ in range(200)
+        ]
+        cubes = Cube.from_codes(sequences)
+        for i, codes in enumerate(sequences):
+            assert cubes.keys()[i] == Cube.solved().apply_codes(codes).keys()[0]
+        undone = Cube.from_codes([c + invert_codes(c) for c in sequences])
+        assert undone.is_solved().all()
+
+    def test_then_and_inverse(self):
+        rng = random.Random(1)
+        sequences = [
+            encode(rng.choice(MOVES) for _ in range(rng.randint(0, 20)))
+            for _ in range(50)
+        ]
+        cubes = Cube.from_codes(sequences)
+        after = encode("R U F' x M".split())
+        assert (
+            cubes.then(cube("R U F' x M")).keys()
+            == Cube.from_codes([c + after for c in sequences]).keys()
+        )
+        assert cubes.then(cubes.inverse()).is_solved().all()
+        assert (
+            cubes.inverse().keys()
+            == Cube.from_codes([invert_codes(c) for c in sequences]).keys()
+        )
+
+    def test_orientation(self):
+        rng = random.Random(0)
+
+        def random_moves(moves: str) -> str:
+            return " ".join(rng.choice(moves.split()) for _ in range(20))
+
+        for _ in range(50):
+            assert cube(random_moves("U D R L F2 B2")).has_eo("fb")[0]
+            assert cube(random_moves("U D F B R2 L2")).has_eo("rl")[0]
+            assert cube(random_moves("R L F B U2 D2")).has_eo("ud")[0]
+            assert cube(random_moves("U D R2 L2 F2 B2")).has_dr("ud")[0]
+            assert cube(random_moves("R L U2 D2 F2 B2")).has_dr("rl")[0]
+        assert list(cube("F").has_eo("fb")) == [False]
+        assert list(cube("R").has_eo("rl")) == [False]
+        assert list(cube("U").has_eo("ud")) == [False]
+        assert list(cube("R").has_dr("ud")) == [False]
+        moves = ["U", "R", "F", "U2", "R2", "F2"]
+        drud = Cube.from_codes([encode([m]) for m in moves]).has_dr("ud")
+        assert list(drud) == [True, False, False, True, True, True]
+        assert np.array_equal(
+            cube("R").corner_orientation("ud")[0] != 0,
+            cube("R").corner_orientation("fb")[0] != 0,
+        )
@@ -0,0 +1,58 @@
+from typing import List
+from unittest import TestCase
+
+import fmc_meta
+from fmc_meta import Step
+from fmc_meta.execution import InlineContext
+from fmc_meta.dedupe import Deduplicated, dr_search_key, position_key
+from fmc_meta.strategies import OptimalDR
+
+from helpers import fake_moves
+
+searches: List[str] = []
+
+
+# Makes up DRs that only depend on the position of the EO, recording each search
+class FakeDR(OptimalDR):
+    def find_drs_for_eo(self, eo: Step) -> List[Step]:
+        searches.append(str(eo))
+        seed = position_key(eo).hex()
+        return [
+            Step(name="drud", moves=fake_moves(f"{seed}{i}", 5 + i % 4), previous=eo)
+            for i in range(6)
+        ]
+
+
+def strs(steps: List[Step]) -> List[str]:
+    return [" // ".join(str(s) for s in step.from_beginning()) for step in steps]
+
+
+class TestDedupe(TestCase):
+    def test_find_drs(self):
+        scramble = Step(name="scramble", moves=["R", "U", "F"])
+        eos = [
+            Step(name="eofb", moves=["R", "L", "D"], previous=scramble),
+            Step(name="eofb", moves=["L", "R", "D"], previous=scramble),
+            Step(name="eofb", moves=["R", "L'", "D"], previous=scramble),
+            Step(name="eofb", moves=["L'", "R", "D"], previous=scramble),
+            # Different moves on the inverse, so different DRs
+            Step(name="eofb", moves_on_inverse=["L", "R", "D"], previous=scramble),
+        ]
+        unique = Deduplicated(eos, dr_search_key)
+        assert unique.unique == [eos[0], eos[2], eos[4]]
+        assert unique.saved == 2
+
+        dr = FakeDR(retain=100)
+        expected = [s for eo in eos for s in dr.find_drs_for_eo(eo)]
+        searches.clear()
+        fmc_meta._pool = InlineContext()
+        try:
+            drs = dr.find_drs(eos)
+        finally:
+            fmc_meta._pool = None
+        assert searches == [str(eo) for eo in unique.unique]
+        assert strs(drs) == strs(dr.select_drs(expected))
+        for s in drs:
+            assert s.cumulative_move_count == s.previous.cumulative_move_count + (
+                s.move_count
+            )
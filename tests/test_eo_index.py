@@ -0,0 +1,113 @@
+from unittest import TestCase, mock
+import itertools
+import os
+import random
+import tempfile
+
+from fmc_meta import EO_AXES, Step
+from fmc_meta.cube import Cube
+from fmc_meta.eo_index import (
+    EOIndex,
+    eo_solutions,
+    load_index,
+)
+from fmc_meta.moves import MOVES, encode, invert_codes
+from fmc_meta.strategies import GeneralEO
+
+
+def scrambles(n: int):
+    rng = random.Random(0)
+    return [
+        Step(name="scramble", moves=[rng.choice(MOVES[:18]) for _ in range(20)])
+        for _ in range(n)
+    ]
+
+
+def printed_by_nissy(moves, axis_step: str) -> bool:
+    """
+    Whether nissy prints a sequence as an EO solution, if it is one: no two
+    turns of a face in a row, opposite faces in the order of "UDRLFB", and a
+    clockwise quarter turn of a face of the axis last, as is the move before
+    it if they are on the same axis
+    """
+    faces = [m[0] for m in moves]
+    for a, b in zip(faces, faces[1:]):
+        if a == b or (opposite(a, b) and "UDRLFB".index(a) > "UDRLFB".index(b)):
+            return False
+    if len(moves) > 1 and opposite(faces[-2], faces[-1]) and len(moves[-2]) > 1:
+        return False
+    return len(moves[-1]) == 1 and moves[-1] in axis_step[2:].upper()
+
+
+def opposite(a: str, b: str) -> bool:
+    return {a, b} in ({"U", "D"}, {"R", "L"}, {"F", "B"})
+
+
+class TestEOIndex(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.file = os.path.join(cls.tmp.name, "eo-index.npy")
+        EOIndex.build(4).save(cls.file)
+        cls.index = EOIndex.load(cls.file)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_same_as_searching(self):
+        sequences = [
+            list(moves)
+            for length in range(1, 5)
+            for moves in itertools.product(MOVES[:18], repeat=length)
+        ]
+        # Every sequence nissy would print if it orients the edges
+        printed = {
+            axis_step: [encode(m) for m in sequences if printed_by_nissy(m, axis_step)]
+            for axis_step in EO_AXES
+        }
+        for scramble in scrambles(5):
+            for axis_step in EO_AXES:
+                axis = axis_step[2:]
+                candidates = printed[axis_step]
+                cube = Cube.from_codes(
+                    [scramble.all_codes + codes for codes in candidates]
+                )
+                expected = {
+                    codes
+                    for codes, solved in zip(candidates, cube.has_eo(axis))
+                    if solved
+                }
+                found = eo_solutions(self.index, axis_step, scramble, 4)
+                assert {n for n, _ in found} == expected
+                assert all(i == b"" for _, i in found)
+
+                for normal, inverse in eo_solutions(
+                    self.index, axis_step, scramble, 4, max_niss_split=1
+                ):
+                    assert min(len(normal), len(inverse)) <= 1
+                    assert len(normal) + len(inverse) <= 4
+                    position = invert_codes(inverse) + scramble.all_codes + normal
+                    assert Cube.solved().apply_codes(position).has_eo(axis)[0]
+
+    def test_strategy(self):
+        with mock.patch.dict(os.environ, {"XDG_CACHE_HOME": self.tmp.name}):
+            for scramble in scrambles(3):
+                for check_inverse, split in [(True, 1), (True, 0), (False, 0)]:
+                    eo = GeneralEO(
+                        max_eo_length=4,
+                        check_inverse=check_inverse,
+                        max_niss_split=split,
+                        use_index=True,
+                    )
+                    plan = eo.plan_eos_on_axis("eofb", scramble)
+                    # No searches for nissy
+                    with self.assertRaises(StopIteration) as done:
+                        next(plan)
+                    for step in done.exception.value:
+                        assert step.previous is scramble
+                        assert check_inverse or not step.codes_on_inverse
+                        cube = Cube.solved().apply_codes(step.all_codes)
+                        assert cube.has_eo("fb")[0]
+            # Rebuilt for longer solutions
+            assert load_index(5, self.file).max_length == 5
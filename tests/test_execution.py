@@ -0,0 +1,104 @@
+from typing import List
+from unittest import TestCase
+import contextlib
+import io
+import pickle
+import queue
+
+import fmc_meta
+from fmc_meta import FinishBound, Step
+from fmc_meta.execution import KINDS, InlineContext, _Detached, create_context
+from fmc_meta.main import load_meta
+
+from helpers import RandomBackend
+
+
+class Found(list):
+    searches = 0
+
+
+def find(step: Step) -> Found:
+    found = Found(
+        Step(name="next", moves=["U", "R"][: i + 1], previous=step) for i in range(2)
+    )
+    found.searches = 2
+    return found
+
+
+def fail(step: Step) -> List[Step]:
+    raise ValueError(str(step))
+
+
+class CountingContext(InlineContext):
+    def __init__(self):
+        super().__init__()
+        self.tasks = 0
+
+    def map(self, fn, items):
+        items = list(items)
+        self.tasks += len(items)
+        return super().map(fn, items)
+
+
+class TestExecution(TestCase):
+    def setUp(self):
+        scramble = Step(name="scramble", moves=["R", "U", "F"])
+        self.steps = [
+            Step(name="eofb", moves=[m], previous=scramble) for m in ["F", "B", "L"]
+        ]
+
+    def test_contexts(self):
+        for kind in KINDS:
+            with fmc_meta.use_context(create_context(kind, 2)) as context:
+                assert fmc_meta.context() is context
+                found = context.map(find, self.steps)
+                assert [f.searches for f in found] == [2, 2, 2]
+                for step, step_found in zip(self.steps, found):
+                    assert [str(s) for s in step_found] == ["U", "U R"]
+                    assert all(s.previous is step for s in step_found)
+
+                results: queue.Queue = queue.Queue()
+                context.apply_async(find, (self.steps[0],), callback=results.put)
+                context.apply_async(fail, (self.steps[1],), error_callback=results.put)
+                got = [results.get(timeout=10), results.get(timeout=10)]
+                [found] = [r for r in got if isinstance(r, list)]
+                assert found[0].previous is self.steps[0]
+                assert any(isinstance(r, ValueError) for r in got)
+
+                bound = FinishBound(1)
+                bound.offer(30)
+                bound.offer(25)
+                assert bound.max_total() == 25
+            assert fmc_meta._pool is None
+
+    def test_payload(self):
+        # Found steps go back to the parent without the steps before them
+        detached = pickle.dumps(_Detached(find)(self.steps[0]))
+        assert b"scramble" not in detached
+        assert b"scramble" in pickle.dumps(find(self.steps[0]))
+
+    def test_fan_out(self):
+        fmc_meta._backend = RandomBackend()
+        scramble = Step(name="scramble", moves=["R", "U", "F", "L2", "D'"])
+        try:
+            for name in ["near-optimal", "easy-corners"]:
+                meta = load_meta(name)
+                fanned_out = load_meta(name, {"eo.fan_out": True, "dr.fan_out": True})
+                with contextlib.redirect_stdout(io.StringIO()):
+                    with fmc_meta.use_context(InlineContext()):
+                        eos = meta.eo.find_eos(scramble)
+                        drs = meta.dr.find_drs(eos)
+                    for kind in KINDS:
+                        with fmc_meta.use_context(create_context(kind, 2)):
+                            assert [
+                                str(s) for s in fanned_out.eo.find_eos(scramble)
+                            ] == [str(s) for s in eos]
+                            found = fanned_out.dr.find_drs(eos)
+                            assert [str(s) for s in found] == [str(s) for s in drs]
+                            assert all(s.previous in eos for s in found)
+                    # Each DR stage and side of each EO is a task of its own
+                    with fmc_meta.use_context(CountingContext()) as counting:
+                        fanned_out.dr.find_drs(eos[:3])
+                    assert counting.tasks == 4 * 3
+        finally:
+            fmc_meta._backend = None
@@ -0,0 +1,173 @@
+from typing import Iterator, List
+from unittest import TestCase
+from os import path
+import random
+import tempfile
+
+import fmc_meta
+from fmc_meta import Step
+from fmc_meta.backend import (
+    NissyArchive,
+    RecordingBackend,
+    ReplayBackend,
+    SolverBackend,
+)
+from fmc_meta.cache import NissyCache
+from fmc_meta.strategies import (
+    MAX_FINISH_LENGTH,
+    EasyCornerOnlyFinish,
+    OptimalFinish,
+)
+
+FACES = ["U", "D", "R", "L", "F", "B"]
+
+
+class OrderedBackend(SolverBackend):
+    """
+    Made-up finishes, printed from shortest to longest as nissy does, and only
+    the shortest without -M
+    """
+
+    def __init__(self):
+        self.searches = 0
+        self.lines = 0
+        self.longest = 0
+
+    def stream(
+        self, step_name: str, moves: List[str], args: List[str]
+    ) -> Iterator[str]:
+        self.searches += 1
+        rng = random.Random(repr((step_name, moves)))
+        shortest = rng.randint(6, 12)
+        lengths = sorted(shortest + rng.randint(0, 6) for _ in range(40))
+        max_length = int(args[args.index("-M") + 1]) if "-M" in args else shortest
+        self.longest = max(self.longest, max_length)
+        for i, length in enumerate(lengths):
+            if length > max_length or (i > 0 and "-M" not in args):
+                return
+            self.lines += 1
+            yield " ".join(
+                rng.choice(FACES) + rng.choice(["", "2", "'"]) for _ in range(length)
+            ) + "\n"
+
+
+class WholeOutputBackend(OrderedBackend):
+    """Returns the whole output of each search at once, as nissy sessions do"""
+
+    streams = False
+
+    def stream(
+        self, step_name: str, moves: List[str], args: List[str]
+    ) -> Iterator[str]:
+        return iter(list(super().stream(step_name, moves, args)))
+
+
+class TestFinish(TestCase):
+    def setUp(self):
+        self.backend = OrderedBackend()
+        fmc_meta._backend = self.backend
+        rng = random.Random(0)
+        scramble = Step(name="scramble", moves=["R", "U", "F"])
+        self.drs = [
+            Step(
+                name="drud-eofb",
+                moves=[
+                    rng.choice(FACES) + rng.choice(["", "2", "'"]) for _ in range(8)
+                ],
+                previous=scramble,
+            )
+            for _ in range(60)
+        ]
+
+    def tearDown(self):
+        fmc_meta._backend = None
+
+    def test_single_pass(self):
+        for strategy in [
+            OptimalFinish(),
+            EasyCornerOnlyFinish(),
+            EasyCornerOnlyFinish(max_qt_count=0),
+        ]:
+            for max_total in [None, 30, 22]:
+                self.backend.searches = 0
+                two_pass = [strategy.dr_to_finish(dr, max_total) for dr in self.drs]
+                searches = self.backend.searches
+
+                strategy.single_pass = True
+                self.backend.searches = 0
+                single = [strategy.dr_to_finish(dr, max_total) for dr in self.drs]
+                strategy.single_pass = False
+                if max_total is None:
+                    # The shortest finish is searched for first, to set -M
+                    assert self.backend.searches <= searches
+                else:
+                    assert self.backend.searches == len(self.drs) < searches
+                for found, expected in zip(single, two_pass):
+                    if max_total is None:
+                        assert [str(f) for f in found] == [str(f) for f in expected]
+                    else:
+                        # Finishes over max_total don't need to be found
+                        assert [str(f) for f in found] == [
+                            str(f)
+                            for f in expected
+                            if f.cumulative_move_count <= max_total
+                        ]
+
+    def test_stops_early(self):
+        self.backend.lines = 0
+        for dr in self.drs:
+            OptimalFinish(single_pass=True).dr_to_finish(dr)
+        # The search stops at the first finish that can't be kept
+        assert self.backend.lines < 40 * len(self.drs) / 2
+        # and never searches to the longest finish possible
+        assert self.backend.longest < MAX_FINISH_LENGTH
+
+    def test_whole_output(self):
+        strategy = EasyCornerOnlyFinish(single_pass=True)
+        expected = [strategy.dr_to_finish(dr, 30) for dr in self.drs]
+        # Searches that can't be stopped only go as far as two-pass ones
+        fmc_meta._backend = backend = WholeOutputBackend()
+        found = [strategy.dr_to_finish(dr, 30) for dr in self.drs]
+        assert backend.searches > len(self.drs)
+        assert backend.lines < 40 * len(self.drs) / 2
+        for f, e in zip(found, expected):
+            assert [str(s) for s in f] == [str(s) for s in e]
+
+    def test_stored(self):
+        strategies = [OptimalFinish(), EasyCornerOnlyFinish(max_qt_count=0)]
+        # With the same max_total, both run the same searches
+        expected = [
+            [
+                [f for f in s.dr_to_finish(dr, 28) if f.cumulative_move_count <= 28]
+                for dr in self.drs
+            ]
+            for s in strategies
+        ]
+        for strategy in strategies:
+            strategy.single_pass = True
+        with tempfile.TemporaryDirectory() as tmp:
+            fmc_meta._backend = RecordingBackend(
+                self.backend, NissyArchive(path.join(tmp, "nissy.db"))
+            )
+            fmc_meta._cache = NissyCache(path.join(tmp, "cache.db"))
+            try:
+                for _ in range(2):
+                    # stopping at different finishes
+                    for strategy, finishes in zip(strategies, expected):
+                        self.backend.searches = 0
+                        for dr, e in zip(self.drs, finishes):
+                            found = strategy.dr_to_finish(dr, 28)
+                            assert [str(f) for f in found] == [str(f) for f in e]
+                    # The second time, only the searches that stopped too early
+                    # for the other strategy run
+                    assert self.backend.searches < len(self.drs)
+                fmc_meta._cache = None
+
+                fmc_meta._backend = ReplayBackend(
+                    NissyArchive(path.join(tmp, "nissy.db"))
+                )
+                for dr, e in zip(self.drs, expected[1]):
+                    found = strategies[1].dr_to_finish(dr, 28)
+                    assert [str(f) for f in found] == [str(f) for f in e]
+            finally:
+                fmc_meta._cache = None
@@ -0,0 +1,123 @@
+from typing import List, Optional
+from unittest import TestCase
+import itertools
+import random
+import time
+
+import fmc_meta
+from fmc_meta import Meta, Step
+from fmc_meta.execution import create_context
+from fmc_meta.pipeline import Pipeline
+from fmc_meta.strategies import GeneralEO, OptimalDR, OptimalFinish
+
+from helpers import fake_moves
+
+
+def delay(seed: str):
+    time.sleep(random.Random(seed).random() * 0.01)
+
+
+# Strategies that make up their search results instead of calling nissy
+class FakeEO(GeneralEO):
+    def find_eos_on_axis(self, axis_step: str, scramble: Step) -> List[Step]:
+        delay(axis_step)
+        return [
+            Step(
+                name=axis_step,
+                moves=fake_moves(f"{axis_step}{i}", 3 + i % 3),
+                previous=scramble,
+            )
+            for i in range(12)
+        ]
+
+
+class FakeDR(OptimalDR):
+    def find_drs_for_eo(self, eo: Step) -> List[Step]:
+        delay(str(eo))
+        return [
+            Step(
+                name=f"drud-{eo.name}",
+                moves=fake_moves(f"{eo}{i}", 5 + i % 4),
+                previous=eo,
+            )
+            for i in range(6)
+        ]
+
+
+class FakeFinish(OptimalFinish):
+    def dr_to_finish(self, dr: Step, max_total: Optional[int] = None) -> List[Step]:
+        delay(str(dr))
+        n = random.Random(str(dr)).randint(8, 12)
+        finish = Step(name="drudfin", moves=fake_moves(str(dr), n), previous=dr)
+        if max_total is not None and finish.cumulative_move_count > max_total:
+            return []
+        return [finish]
+
+
+# EOs found twice each, and the searches of each stage
+class TwiceEO(FakeEO):
+    def find_eos_on_axis(self, axis_step: str, scramble: Step) -> List[Step]:
+        eos = super().find_eos_on_axis(axis_step, scramble)
+        return eos + [Step(name=s.name, moves=s.moves, previous=scramble) for s in eos]
+
+
+searched: List[str] = []
+
+
+class CountingDR(FakeDR):
+    def find_drs_for_eo(self, eo: Step) -> List[Step]:
+        searched.append(str(eo))
+        return super().find_drs_for_eo(eo)
+
+
+class CountingFinish(FakeFinish):
+    def dr_to_finish(self, dr: Step, max_total: Optional[int] = None) -> List[Step]:
+        searched.append(" // ".join(str(s) for s in dr.from_beginning()))
+        return super().dr_to_finish(dr, max_total)
+
+
+class TestPipeline(TestCase):
+    def test_same_as_staged(self):
+        for kind, diversity in itertools.product(["process", "thread"], [False, True]):
+            with fmc_meta.use_context(create_context(kind, 4)):
+                meta = Meta(
+                    eo=FakeEO(retain=8, prefer_axis_diversity=diversity),
+                    dr=FakeDR(retain=5, prefer_axis_diversity=diversity),
+                    finish=FakeFinish(),
+                )
+                scramble = Step(name="scramble", moves=["R", "U", "F"])
+                eos = meta.eo.find_eos(scramble)
+                drs = meta.dr.find_drs(eos)
+                finishes = meta.finish.drs_to_finishes(drs)
+                p_eos, p_drs, p_finishes = Pipeline(meta, scramble, slots=4).run()
+                assert [str(s) for s in p_eos] == [str(s) for s in eos]
+                assert [str(s) for s in p_drs] == [str(s) for s in drs]
+                assert [str(s) for s in p_finishes] == [str(s) for s in finishes]
+
+                bounded = meta.finish.drs_to_finishes(drs, top=3)
+                assert [str(s) for s in bounded[:3]] == [str(s) for s in finishes[:3]]
+                _, _, p_bounded = Pipeline(meta, scramble, slots=4, top=3).run()
+                assert [str(s) for s in p_bounded[:3]] == [str(s) for s in finishes[:3]]
+                # Following the DRs themselves, not copies of them
+                assert all(any(f.previous is dr for dr in drs) for f in finishes)
+
+    def test_equivalent(self):
+        with fmc_meta.use_context(create_context("thread", 4)):
+            meta = Meta(
+                eo=TwiceEO(retain=16),
+                dr=CountingDR(retain=10),
+                finish=CountingFinish(),
+            )
+            scramble = Step(name="scramble", moves=["R", "U", "F"])
+            eos = meta.eo.find_eos(scramble)
+            drs = meta.dr.find_drs(eos)
+            finishes = meta.finish.drs_to_finishes(drs)
+            searched.clear()
+            p_eos, p_drs, p_finishes = Pipeline(meta, scramble, slots=4).run()
+            assert [str(s) for s in p_drs] == [str(s) for s in drs]
+            assert [str(s) for s in p_finishes] == [str(s) for s in finishes]
+            # Each EO and DR found twice is searched once
+            assert len(set(searched)) == len(searched)
+            assert len({str(eo) for eo in p_eos}) < len(p_eos)
+            _, _, p_bounded = Pipeline(meta, scramble, slots=4, top=3).run()
+            assert [str(s) for s in p_bounded[:3]] == [str(s) for s in finishes[:3]]
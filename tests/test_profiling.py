@@ -0,0 +1,51 @@
+from os import path
+from unittest import TestCase
+import tempfile
+
+import fmc_meta
+from fmc_meta import Step
+from fmc_meta.execution import InlineContext
+from fmc_meta.cache import NissyCache
+from fmc_meta.profiling import Profiler, format_summary, summarize
+from fmc_meta.strategies import GeneralEO
+
+
+class TestProfiling(TestCase):
+    def test_eo_stage(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            fmc_meta._pool = InlineContext()
+            fmc_meta._cache = NissyCache(path.join(tmp, "cache.db"))
+            fmc_meta._profiler = Profiler(path.join(tmp, "profile.jsonl"))
+            try:
+                scramble = Step(name="scramble", moves=["R", "U", "F"])
+                for axis in ["eofb", "eorl", "eoud"]:
+                    fmc_meta._cache.put(
+                        axis,
+                        ["-M", "5", "-N"],
+                        scramble.all_moves,
+                        "F R\n(B)\nU2 F (L D)\n",
+                    )
+                eos = GeneralEO(retain=4).find_eos(scramble)
+                assert len(eos) == 4
+
+                events = fmc_meta._profiler.events()
+                nissy_calls = [e for e in events if e["type"] == "nissy"]
+                assert len(nissy_calls) == 3
+                assert all(e["stage"] == "eo" and e["cached"] for e in nissy_calls)
+                assert [e["accepted"] for e in nissy_calls] == [
+                    2,
+                    2,
+                    2,
+                ]  # The last has 2 moves before NISS
+
+                [summary] = summarize(events)
+                assert summary.stage == "eo"
+                assert summary.tasks == 3
+                assert summary.found == 6
+                assert summary.kept == 4
+                assert summary.returned == 9
+                assert "|eo|" in format_summary([summary])
+            finally:
+                fmc_meta._pool = None
+                fmc_meta._cache = None
+                fmc_meta._profiler = None
@@ -0,0 +1,57 @@
+from typing import List
+from unittest import TestCase
+import itertools
+import random
+
+from fmc_meta import Step
+from fmc_meta.selection import select, select_per_axis, sort_order
+from fmc_meta.strategies import GeneralEO
+
+FACES = ["U", "D", "R", "L", "F", "B"]
+
+
+def random_steps(rng: random.Random, n: int) -> List[Step]:
+    scramble = Step(name="scramble", moves=["R", "U", "F"])
+    steps = []
+    for _ in range(n):
+        moves = [rng.choice(FACES) for _ in range(rng.randint(0, 3))]
+        on_inverse = [rng.choice(FACES) for _ in range(rng.randint(0, 2))]
+        steps.append(
+            Step(
+                name=rng.choice(["eofb", "eorl", "eoud"]),
+                moves=moves,
+                moves_on_inverse=on_inverse,
+                previous=scramble,
+            )
+        )
+    return steps
+
+
+class TestSelection(TestCase):
+    def test_same_as_sorted(self):
+        rng = random.Random(0)
+        for salt in ["", "0x1234"]:
+            for _ in range(50):
+                steps = random_steps(rng, rng.randint(0, 200))
+                n = rng.randint(0, 40)
+                expected = sorted(steps, key=lambda s: sort_order(s, salt))[:n]
+                assert [id(s) for s in select(steps, n, salt)] == [
+                    id(s) for s in expected
+                ]
+
+    def test_per_axis_same_as_merged_sort(self):
+        rng = random.Random(1)
+        for _ in range(50):
+            steps = random_steps(rng, rng.randint(0, 200))
+            strategy = GeneralEO(retain=rng.randint(1, 40), seed=7)
+            by_axis = [
+                sorted((s for s in steps if s.name == axis), key=strategy.sort_order)
+                for axis in ["eofb", "eorl", "eoud"]
+            ]
+            rows = itertools.zip_longest(*by_axis)
+            expected = [s for row in rows for s in row if s is not None]
+            expected = expected[: strategy.retain]
+            strategy.prefer_axis_diversity = True
+            assert [id(s) for s in strategy.select_eos(steps)] == [
+                id(s) for s in expected
+            ]
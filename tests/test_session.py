@@ -0,0 +1,101 @@
+from unittest import TestCase
+from os import path
+import os
+import sys
+import tempfile
+import threading
+
+from fmc_meta.backend import SubprocessBackend
+from fmc_meta.session import NissySessionPool
+
+# Mimics the nissy shell: prints a prompt, echoes the moves of each solve
+# command back as its solution, and exits on a scramble of "X"
+FAKE_SHELL = f"""#!{sys.executable}
+import sys
+while True:
+    sys.stdout.write("nissy-# ")
+    sys.stdout.flush()
+    line = sys.stdin.readline()
+    if not line:
+        break
+    words = line.split()
+    if words[-1] == "X":
+        sys.exit(1)
+    if words[1] == "bad":
+        sys.stdout.write("Error: unknown step\\n")
+    else:
+        sys.stdout.write(" ".join(words[-2:]) + "\\n")
+"""
+
+
+class TestSession(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.shell = path.join(self.tmp.name, "nissy")
+        with open(self.shell, "w") as f:
+            f.write(FAKE_SHELL)
+        os.chmod(self.shell, 0o755)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_solve(self):
+        pool = NissySessionPool(self.shell)
+        assert pool.solve("eofb", ["R", "U"], ["-M", "5"]) == "R U\n"
+        assert pool.solve("eofb", ["F", "D"], []) == "F D\n"
+        assert pool._started == 1
+        pool.close()
+
+    def test_error(self):
+        pool = NissySessionPool(self.shell)
+        with self.assertRaises(Exception):
+            pool.solve("bad", ["R", "U"], [])
+        assert pool.solve("eofb", ["R", "U"], []) == "R U\n"
+        pool.close()
+
+    def test_restart_after_crash(self):
+        pool = NissySessionPool(self.shell)
+        assert pool.solve("eofb", ["R", "U"], []) == "R U\n"
+        with self.assertRaises(Exception):
+            pool.solve("eofb", ["X"], [])
+        assert pool.solve("eofb", ["R", "U"], []) == "R U\n"
+        pool.close()
+
+    def test_solve_many(self):
+        pool = NissySessionPool(self.shell)
+        # More commands and output than fit in the pipes
+        moves = [[a, b] for a in ["R", "U2", "F'"] for b in ["L", "D2", "B'"]]
+        searches = [("eofb", moves[i % 9], ["-M", "5"]) for i in range(5000)]
+        outputs = pool.solve_many(searches)
+        assert outputs == [" ".join(moves[i % 9]) + "\n" for i in range(5000)]
+        assert pool.solve("eofb", ["F", "D"], []) == "F D\n"
+        with self.assertRaises(Exception):
+            pool.solve_many([("eofb", ["R", "U"], []), ("bad", ["R", "U"], [])])
+        # The session was killed, so it isn't reused
+        assert pool._idle == [] and pool._started == 0
+        assert pool.solve_many([("eofb", ["R", "U"], [])]) == ["R U\n"]
+        pool.close()
+
+        backend = SubprocessBackend(self.shell)
+        assert backend.solve_many(searches[:2]) == ["R L\n", "R D2\n"]
+
+    def test_failed_restart(self):
+        pool = NissySessionPool(self.shell)
+        session = pool._acquire()
+        errors = []
+
+        def solve():
+            try:
+                pool.solve("eofb", ["R", "U"], [])
+            except Exception as e:
+                errors.append(e)
+
+        waiting = threading.Thread(target=solve)
+        waiting.start()
+        # The only session crashes, and nissy can no longer be started
+        session.kill()
+        os.remove(self.shell)
+        pool._release(session)
+        waiting.join(timeout=10)
+        assert not waiting.is_alive()
+        assert len(errors) == 1 and pool._started == 0
@@ -0,0 +1,103 @@
+from typing import List, Optional
+from os import path
+from unittest import TestCase
+import random
+import tempfile
+
+import fmc_meta
+from fmc_meta import Meta, Step
+from fmc_meta.execution import InlineContext
+from fmc_meta.snapshot import Snapshot
+from fmc_meta.strategies import GeneralEO, OptimalDR, OptimalFinish
+
+from helpers import fake_moves
+
+searches: List[str] = []
+
+
+# Strategies that make up their search results and record each search
+class FakeEO(GeneralEO):
+    def find_eos_on_axis(self, axis_step: str, scramble: Step) -> List[Step]:
+        searches.append(axis_step)
+        return [
+            Step(
+                name=axis_step,
+                moves=fake_moves(f"{axis_step}{i}", 3 + i % 3),
+                previous=scramble,
+            )
+            for i in range(12)
+        ]
+
+
+class FakeDR(OptimalDR):
+    def find_drs_for_eo(self, eo: Step) -> List[Step]:
+        searches.append(str(eo))
+        return [
+            Step(name="drud", moves=fake_moves(f"{eo}{i}", 5 + i % 4), previous=eo)
+            for i in range(6)
+        ]
+
+
+class FakeFinish(OptimalFinish):
+    def dr_to_finish(self, dr: Step, max_total: Optional[int] = None) -> List[Step]:
+        searches.append(str(dr))
+        n = random.Random(str(dr)).randint(8, 12)
+        return [Step(name="drudfin", moves=fake_moves(str(dr), n), previous=dr)]
+
+
+def strs(steps: List[Step]) -> List[str]:
+    return [" // ".join(str(s) for s in step.from_beginning()) for step in steps]
+
+
+class TestSnapshot(TestCase):
+    def test_reselect(self):
+        fmc_meta._pool = InlineContext()
+        scramble = Step(name="scramble", moves=["R", "U", "F"])
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                snapshot = path.join(tmp, "snapshot.json")
+                # Number of searches expected with each retain, in order
+                for retain, new_searches in [(5, 3 + 8 + 5), (10, 5), (10, 0)]:
+                    meta = Meta(
+                        eo=FakeEO(retain=8),
+                        dr=FakeDR(retain=retain),
+                        finish=FakeFinish(),
+                    )
+                    eos = meta.eo.find_eos(scramble)
+                    drs = meta.dr.find_drs(eos)
+                    finishes = meta.finish.drs_to_finishes(drs)
+                    searches.clear()
+                    s_eos, s_drs, s_finishes = Snapshot(snapshot).run(meta, scramble)
+                    assert strs(s_eos) == strs(eos)
+                    assert strs(s_drs) == strs(drs)
+                    assert strs(s_finishes) == strs(finishes)
+                    assert len(searches) == new_searches
+                # Settings that only change how the searches run keep the results
+                meta = Meta(
+                    eo=FakeEO(retain=8, fan_out=True, use_index=True),
+                    dr=FakeDR(retain=10, fan_out=True),
+                    finish=FakeFinish(single_pass=True),
+                )
+                searches.clear()
+                assert strs(Snapshot(snapshot).run(meta, scramble)[2]) == strs(finishes)
+                assert searches == []
+        finally:
+            fmc_meta._pool = None
+
+    def test_equivalent(self):
+        fmc_meta._pool = InlineContext()
+        scramble = Step(name="scramble", moves=["R", "U", "F"])
+        eos = [
+            Step(name="eofb", moves=["F", "R"], previous=scramble),
+            Step(name="eofb", moves=["F", "R"], previous=scramble),
+        ]
+        meta = Meta(eo=FakeEO(), dr=FakeDR(retain=12), finish=FakeFinish())
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                snapshot = Snapshot(path.join(tmp, "snapshot.json"))
+                searches.clear()
+                drs = snapshot.find_drs(meta, scramble, eos)
+                assert searches == [str(eos[0])]
+                assert len(drs) == 12
+        finally:
+            fmc_meta._pool = None
@@ -1,4 +1,6 @@
-from fmc_meta import Step
+import pickle
+
+from fmc_meta import Step, MoveCountHistogram
 
 from unittest import TestCase
 
@@ -40,3 +42,13 @@ class TestStep(TestCase):
         )
         assert s5.move_count == 2
         assert s5.cumulative_move_count == 10
+
+    def test_serialization(self):
+        scramble = Step(name="scramble", moves="R U F".split(" "))
+        eo = Step(name="eofb", moves=["F"], moves_on_inverse=["R"], previous=scramble)
+        solutions = MoveCountHistogram(steps=[eo])
+        restored = MoveCountHistogram.model_validate_json(solutions.model_dump_json())
+        assert restored.steps[0] == eo
+        assert restored.steps[0].cumulative_move_count == 2
+        assert pickle.loads(pickle.dumps(eo)) == eo
+        assert eo.all_moves == "R' R U F F".split(" ")